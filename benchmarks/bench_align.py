@@ -0,0 +1,67 @@
+"""Time and peak memory of `graph.align` against the per-character `CharIdPair` path.
+
+Run with `python benchmarks/bench_align.py`.
+"""
+
+import itertools
+import time
+import tracemalloc
+from typing import Callable
+
+from synthetic import perturb, text
+
+from parallel_corpus import graph
+from parallel_corpus.shared import diffs, union_find
+
+SIZES = (1_000, 10_000, 30_000)
+
+
+def align_per_char(g: graph.Graph) -> graph.Graph:
+    """Align characters as it was done before, with one `CharIdPair` per character."""
+    uf = union_find.poly_union_find(lambda u: u)
+    em = graph.edge_map(g)
+    chars = [
+        list(
+            itertools.chain.from_iterable(
+                graph.to_char_ids(t) for t in tokens if not em[t.id].manual
+            )
+        )
+        for tokens in (g.source, g.target)
+    ]
+    for c in diffs.hdiff(chars[0], chars[1], lambda u: u.char, lambda u: u.char):
+        if c.change == diffs.ChangeType.CONSTANT and c.a.id is not None and c.b.id is not None:  # type: ignore [union-attr]
+            uf.union(c.a.id, c.b.id)  # type: ignore [union-attr]
+    proto_edges: dict[str, graph.Edge] = {k: e for k, e in g.edges.items() if e.manual}
+    for tok in itertools.chain(g.source, g.target):
+        e_repr = em[tok.id]
+        if not e_repr.manual:
+            key = uf.find(tok.id)
+            e_token = graph.edge([tok.id], e_repr.labels, comment=e_repr.comment)
+            proto_edges[key] = graph.merge_edges(proto_edges.get(key, graph.zero_edge), e_token)  # type: ignore [index]
+    return g.copy_with_edges(graph.edge_record(proto_edges.values()))
+
+
+def measure(f: Callable[[graph.Graph], graph.Graph], g: graph.Graph) -> tuple[float, int]:
+    """Seconds and peak bytes allocated by `f(g)`, measured in separate runs."""
+    start = time.perf_counter()
+    f(g)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    f(g)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    print(f"{'tokens':>8} {'path':>10} {'time (ms)':>10} {'peak (MiB)':>11}")
+    for n in SIZES:
+        source = text(n, seed=n)
+        g = graph.init_with_source_and_target(source, perturb(source, n // 20, seed=n))
+        for name, f in (("per-char", align_per_char), ("arrays", graph.align)):
+            elapsed, peak = measure(f, g)
+            print(f"{n:>8} {name:>10} {elapsed * 1000:>10.1f} {peak / 2**20:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Throughput of `graph.init_many` with a growing number of worker processes.
+
+Run with `python benchmarks/bench_align_many.py`.
+"""
+
+import os
+import time
+
+from synthetic import perturb, text
+
+from parallel_corpus import graph
+
+N_PAIRS = 2_000
+TOKENS_PER_PAIR = 25
+
+
+def main() -> None:
+    sources = [text(TOKENS_PER_PAIR, seed=i) for i in range(N_PAIRS)]
+    pairs = [(s, perturb(s, 3, seed=i)) for i, s in enumerate(sources)]
+    workers = [1]
+    while workers[-1] * 2 <= (os.cpu_count() or 1):
+        workers.append(workers[-1] * 2)
+    baseline = None
+    print(f"{'workers':>8} {'pairs/s':>10} {'speedup':>8}")
+    for n in workers:
+        start = time.perf_counter()
+        for _ in graph.init_many(pairs, max_workers=n, chunksize=64):
+            pass
+        rate = N_PAIRS / (time.perf_counter() - start)
+        baseline = baseline or rate
+        print(f"{n:>8} {rate:>10.0f} {rate / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
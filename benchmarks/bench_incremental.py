@@ -0,0 +1,42 @@
+"""Per-edit latency of `graph.modify` with full and incremental alignment.
+
+Run with `python benchmarks/bench_incremental.py`.
+"""
+
+import random
+import time
+
+from synthetic import perturb, text
+
+from parallel_corpus import graph
+
+SIZES = (100, 1_000, 5_000, 20_000)
+EDITS = 20
+
+
+def per_edit_latency(n_tokens: int, *, incremental: bool) -> float:
+    """Mean seconds per `modify` on a graph with `n_tokens` tokens."""
+    source = text(n_tokens, seed=n_tokens)
+    g = graph.init_with_source_and_target(source, perturb(source, n_tokens // 50, seed=1))
+    rng = random.Random(n_tokens)
+    elapsed = 0.0
+    for _ in range(EDITS):
+        length = len(graph.target_text(g))  # type: ignore [arg-type]
+        from_ = rng.randrange(length)
+        to = min(length, from_ + rng.randint(0, 5))
+        start = time.perf_counter()
+        g = graph.modify(g, from_, to, "ny ", incremental=incremental)
+        elapsed += time.perf_counter() - start
+    return elapsed / EDITS
+
+
+def main() -> None:
+    print(f"{'tokens':>8} {'full (ms)':>12} {'incremental (ms)':>18}")
+    for n in SIZES:
+        full = per_edit_latency(n, incremental=False)
+        incremental = per_edit_latency(n, incremental=True)
+        print(f"{n:>8} {full * 1000:>12.2f} {incremental * 1000:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
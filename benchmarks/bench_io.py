@@ -0,0 +1,50 @@
+"""Load time of a whole JSON Lines corpus against one graph from a binary corpus.
+
+Run with `python benchmarks/bench_io.py`.
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import perturb, text
+
+from parallel_corpus import graph, io
+
+N_GRAPHS = 5_000
+
+
+def main() -> None:
+    sources = [text(25, seed=i) for i in range(N_GRAPHS)]
+    graphs = list(
+        graph.init_many(
+            ((s, perturb(s, 3, seed=i)) for i, s in enumerate(sources)), max_workers=1
+        )
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl = Path(tmp) / "corpus.jsonl"
+        binary = Path(tmp) / "corpus.bin"
+        io.write_graphs(jsonl, graphs)
+        io.write_binary(binary, graphs, keys=(f"doc-{i}" for i in range(N_GRAPHS)))
+        mib = {path.name: path.stat().st_size / 2**20 for path in (jsonl, binary)}
+        print(f"size: jsonl {mib[jsonl.name]:.1f} MiB, binary {mib[binary.name]:.1f} MiB")
+
+        start = time.perf_counter()
+        loaded = list(io.iter_graphs(jsonl))
+        print(f"load all from jsonl: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        with io.BinaryCorpus(binary) as corpus:
+            decoded = list(corpus)
+        print(f"load all from binary: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        with io.BinaryCorpus(binary) as corpus:
+            one = corpus.get(f"doc-{N_GRAPHS // 2}")
+        print(f"open binary and get one graph: {(time.perf_counter() - start) * 1000:.2f} ms")
+        assert decoded == loaded
+        assert one == graphs[N_GRAPHS // 2]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Bytes per token and per edge, with slotted types against types with a `__dict__`.
+
+Run with `python benchmarks/bench_memory.py`.
+"""
+
+import dataclasses
+import tracemalloc
+from typing import Callable, Optional
+
+from synthetic import perturb, text
+
+from parallel_corpus import graph
+from parallel_corpus.text_token import Token
+
+N_GRAPHS = 500
+TOKENS_PER_GRAPH = 40
+
+
+@dataclasses.dataclass
+class DictToken:
+    """A token as it was before, with a `__dict__`."""
+
+    text: str
+    id: str
+
+
+@dataclasses.dataclass
+class DictEdge:
+    """An edge as it was before, with a `__dict__`."""
+
+    id: str
+    ids: list[str]
+    labels: list[str]
+    manual: bool
+    comment: Optional[str] = None
+
+
+def allocated(f: Callable[[], object]) -> tuple[int, object]:
+    """Bytes still allocated after `f()` and its result (which keeps them alive)."""
+    tracemalloc.start()
+    result = f()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, result
+
+
+def main() -> None:
+    sources = [text(TOKENS_PER_GRAPH, seed=i) for i in range(N_GRAPHS)]
+    graphs = list(
+        graph.init_many(
+            ((s, perturb(s, 5, seed=i)) for i, s in enumerate(sources)), max_workers=1
+        )
+    )
+    tokens = [t for g in graphs for t in (*g.source, *g.target)]
+    edges = [e for g in graphs for e in g.edges.values()]
+
+    def copy_tokens(cls: type) -> Callable[[], list]:
+        return lambda: [cls(t.text, t.id) for t in tokens]
+
+    def copy_edges(cls: type) -> Callable[[], list]:
+        return lambda: [
+            cls(e.id, list(e.ids), list(e.labels), e.manual, e.comment) for e in edges
+        ]
+
+    print(f"{len(tokens)} tokens, {len(edges)} edges (strings shared)")
+    for name, cls in (("dict", DictToken), ("slots", Token)):
+        size, _ = allocated(copy_tokens(cls))
+        print(f"{name:>6}: {size / len(tokens):6.1f} bytes per token")
+    for name, cls in (("dict", DictEdge), ("slots", graph.Edge)):
+        size, _ = allocated(copy_edges(cls))
+        print(f"{name:>6}: {size / len(edges):6.1f} bytes per edge")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Time and peak memory of the `graph` API on synthetic inputs of growing size.
+
+Run with `python benchmarks/suite.py` or `make bench`. Results can be saved with
+`--save results.json` and later runs compared against them with
+`--compare results.json`, which exits with status 1 if any case got slower than
+`--threshold` times the baseline.
+
+For each case the table shows the best time of `--repeat` runs, the peak memory
+allocated during one run and the scaling exponent against the previous size,
+that is the `k` in `time ~ size**k`.
+"""
+
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Optional
+
+from synthetic import perturb, text
+
+from parallel_corpus import graph, text_token
+from parallel_corpus.shared import diffs
+
+SIZES = (10, 100, 1_000, 10_000, 100_000)
+# larger sizes of a case are skipped once a run takes longer than this
+MAX_SECONDS = 10.0
+THRESHOLD = 1.25
+
+Results = dict[str, dict[str, dict[str, float]]]
+
+
+def texts(n: int) -> tuple[str, str]:
+    """Make a source text with `n` tokens and a target with some spelling changes."""
+    source = text(n, seed=n)
+    return source, perturb(source, max(1, n // 50), seed=1)
+
+
+def aligned(n: int) -> graph.Graph:
+    return graph.init_with_source_and_target(*texts(n))
+
+
+def unaligned(n: int) -> graph.Graph:
+    """Make a graph of `n` tokens where every token is on its own edge."""
+    source, target = texts(n)
+    source_tokens = text_token.identify(text_token.tokenize(source), "s")
+    target_tokens = text_token.identify(text_token.tokenize(target), "t")
+    return graph.Graph(
+        source=source_tokens,
+        target=target_tokens,
+        edges=graph.edge_record(
+            graph.edge([t.id], []) for t in [*source_tokens, *target_tokens]
+        ),
+    )
+
+
+def bench_init(n: int) -> Callable[[], object]:
+    source, _ = texts(n)
+    return lambda: graph.init(source)
+
+
+def bench_init_with_source_and_target(n: int) -> Callable[[], object]:
+    source, target = texts(n)
+    return lambda: graph.init_with_source_and_target(source, target)
+
+
+def bench_align(n: int) -> Callable[[], object]:
+    g = unaligned(n)
+    return lambda: graph.align(g)
+
+
+def bench_align_chunked(n: int) -> Callable[[], object]:
+    g = unaligned(n)
+    return lambda: graph.align_chunked(g)
+
+
+def bench_modify(n: int) -> Callable[[], object]:
+    g = aligned(n)
+    middle = len(graph.target_text(g)) // 2  # type: ignore [arg-type]
+    return lambda: graph.modify(g, middle, middle + 3, "ny ")
+
+
+def bench_set_target(n: int) -> Callable[[], object]:
+    g = aligned(n)
+    target = perturb(graph.target_text(g), 3, seed=2)  # type: ignore [arg-type]
+    return lambda: graph.set_target(g, target)
+
+
+def bench_rearrange(n: int) -> Callable[[], object]:
+    g = aligned(n)
+    begin = len(g.target) // 4
+    end = min(begin + 5, len(g.target) - 1)
+    return lambda: graph.rearrange(g, begin, end, len(g.target) // 2)
+
+
+def bench_connect_isolated(n: int) -> Callable[[], object]:
+    g = unaligned(n)
+    return lambda: graph.connect_isolated_tokens_based_on_index(g)
+
+
+def bench_hdiff(n: int) -> Callable[[], object]:
+    source, target = texts(n)
+    xs, ys = source.split(), target.split()
+    return lambda: diffs.hdiff(xs, ys)
+
+
+CASES: dict[str, Callable[[int], Callable[[], object]]] = {
+    "init": bench_init,
+    "init_with_source_and_target": bench_init_with_source_and_target,
+    "align": bench_align,
+    "align_chunked": bench_align_chunked,
+    "modify": bench_modify,
+    "set_target": bench_set_target,
+    "rearrange": bench_rearrange,
+    "connect_isolated": bench_connect_isolated,
+    "hdiff": bench_hdiff,
+}
+
+
+def measure(f: Callable[[], object], repeat: int) -> tuple[float, int]:
+    """Best seconds of `repeat` runs of `f` and the peak bytes allocated in another run."""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    f()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def run(cases: list[str], sizes: list[int], *, repeat: int, max_seconds: float) -> Results:
+    """Run the cases, printing a table as the results come in."""
+    results: Results = {}
+    print(f"{'case':<28} {'tokens':>8} {'time (ms)':>11} {'peak (MB)':>10} {'scaling':>8}")
+    for case in cases:
+        results[case] = {}
+        previous: Optional[tuple[int, float]] = None
+        for n in sizes:
+            seconds, peak = measure(CASES[case](n), repeat)
+            results[case][str(n)] = {"seconds": seconds, "peak_bytes": peak}
+            scaling = ""
+            if previous is not None and previous[1] > 0:
+                scaling = f"{math.log(seconds / previous[1]) / math.log(n / previous[0]):.2f}"
+            print(f"{case:<28} {n:>8} {seconds * 1000:>11.2f} {peak / 1e6:>10.2f} {scaling:>8}")
+            previous = (n, seconds)
+            if seconds > max_seconds:
+                print(f"{case:<28} skipping larger sizes")
+                break
+    return results
+
+
+def compare(results: Results, baseline: Results, threshold: float) -> list[str]:
+    """Print the time of each result relative to the baseline and return the regressions."""
+    regressions = []
+    print(f"\n{'case':<28} {'tokens':>8} {'baseline (ms)':>14} {'now (ms)':>10} {'ratio':>7}")
+    for case, by_size in results.items():
+        for n, result in by_size.items():
+            before = baseline.get(case, {}).get(n)
+            if before is None:
+                continue
+            ratio = result["seconds"] / before["seconds"]
+            flag = "  slower" if ratio > threshold else ""
+            print(
+                f"{case:<28} {n:>8} {before['seconds'] * 1000:>14.2f}"
+                f" {result['seconds'] * 1000:>10.2f} {ratio:>7.2f}{flag}"
+            )
+            if ratio > threshold:
+                regressions.append(f"{case} {n}")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-seconds", type=float, default=MAX_SECONDS)
+    parser.add_argument("--save", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="compare against results saved earlier")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = run(args.cases, args.sizes, repeat=args.repeat, max_seconds=args.max_seconds)
+    if args.save:
+        meta = {"python": sys.version.split()[0], "machine": platform.machine()}
+        args.save.write_text(json.dumps({"meta": meta, "results": results}, indent=2))
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nslower than {args.threshold} times the baseline: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""Seeded synthetic input for the benchmarks."""
+
+import random
+from typing import Optional
+
+ALPHABET = "abcdefghijklmnopqrstuvwxyzåäö"
+# number of words per sentence, the last of which is a full stop
+SENTENCE_LENGTH = 20
+
+
+def vocabulary(size: int = 2000, *, seed: int = 0) -> list[str]:
+    """Make a vocabulary of random words."""
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 10))) for _ in range(size)
+    ]
+
+
+def text(n_tokens: int, *, seed: int = 0, vocab: Optional[list[str]] = None) -> str:
+    """Make a text of `n_tokens` words, with a full stop every `SENTENCE_LENGTH` words."""
+    rng = random.Random(seed)
+    vocab = vocab or vocabulary(seed=seed)
+    return " ".join(
+        "." if i % SENTENCE_LENGTH == SENTENCE_LENGTH - 1 else rng.choice(vocab)
+        for i in range(n_tokens)
+    )
+
+
+def perturb(s: str, n_edits: int, *, seed: int = 0) -> str:
+    """Make `n_edits` small character edits in `s`, like spelling corrections."""
+    rng = random.Random(seed)
+    chars = list(s)
+    for _ in range(n_edits):
+        i = rng.randrange(len(chars) + 1)
+        op = rng.choice(("insert", "delete", "replace"))
+        if op == "insert" or i == len(chars):
+            chars.insert(i, rng.choice(ALPHABET))
+        elif op == "delete":
+            del chars[i]
+        else:
+            chars[i] = rng.choice(ALPHABET)
+    return "".join(chars)
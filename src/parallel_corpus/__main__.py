@@ -0,0 +1,7 @@
+"""Run the command line interface, see `parallel_corpus.cli`."""
+
+import sys
+
+from parallel_corpus.cli import main
+
+sys.exit(main())
@@ -0,0 +1,291 @@
+"""Asyncio counterparts of the graph operations.
+
+The functions run their `graph` counterpart on an executor, by default the
+event loop's thread pool, so that aligning does not block the event loop. Pass a
+`concurrent.futures.ProcessPoolExecutor` to use several CPUs.
+
+`Session` is for a graph that receives concurrent edits: the edits are applied
+at once, and the alignment of a state that has been edited again before it got
+to run is dropped, so that only the latest state is aligned.
+
+>>> import asyncio
+>>> g = asyncio.run(set_target(graph.init('a bc d'), 'a b c d'))
+>>> graph.target_text(g)
+'a b c d '
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+from typing import Callable, Optional, TypeVar
+
+from parallel_corpus import graph
+from parallel_corpus.graph import Graph, is_plain
+from parallel_corpus.source_target import Side
+
+__all__ = ["Session", "align", "modify", "rearrange", "set_source", "set_target"]
+
+A = TypeVar("A")
+
+
+async def _run(executor: Optional[concurrent.futures.Executor], f: Callable[[], A]) -> A:
+    return await asyncio.get_running_loop().run_in_executor(executor, f)
+
+
+async def align(
+    g: Graph,
+    *,
+    timeout: Optional[float] = None,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> Graph:
+    """See `graph.align`."""
+    return await _run(executor, functools.partial(graph.align, g, timeout=timeout))
+
+
+async def modify(
+    g: Graph,
+    from_: int,
+    to: int,
+    text: str,
+    side: Side = Side.target,
+    *,
+    incremental: bool = False,
+    timeout: Optional[float] = None,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> Graph:
+    """See `graph.modify`."""
+    f = functools.partial(
+        graph.modify, g, from_, to, text, side, incremental=incremental, timeout=timeout
+    )
+    return await _run(executor, f)
+
+
+async def set_source(
+    g: Graph,
+    text: str,
+    *,
+    incremental: bool = False,
+    timeout: Optional[float] = None,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> Graph:
+    """See `graph.set_source`."""
+    f = functools.partial(graph.set_source, g, text, incremental=incremental, timeout=timeout)
+    return await _run(executor, f)
+
+
+async def set_target(
+    g: Graph,
+    text: str,
+    *,
+    incremental: bool = False,
+    timeout: Optional[float] = None,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> Graph:
+    """See `graph.set_target`."""
+    f = functools.partial(graph.set_target, g, text, incremental=incremental, timeout=timeout)
+    return await _run(executor, f)
+
+
+async def rearrange(
+    g: Graph,
+    begin: int,
+    end: int,
+    dest: int,
+    *,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> Graph:
+    """See `graph.rearrange`."""
+    return await _run(executor, functools.partial(graph.rearrange, g, begin, end, dest))
+
+
+class Session:
+    """A graph that is edited by concurrent requests and aligned in the background.
+
+    Each edit is applied to the latest state of the graph right away, with the
+    `unaligned_*` operations, and then waits until the latest state is aligned.
+    At most one alignment runs at a time. An alignment that has not started when
+    a newer edit arrives is cancelled, and the result of one that was already
+    running is dropped, so every caller that waits at the same time gets the same
+    graph: the latest state with all edits so far, aligned once.
+
+    Edits that depend on the current alignment, as in `graph.Edit`, first wait for
+    the pending edits to be aligned. `set_source` and `set_target` find the changed
+    text on the executor, and the edits that arrive meanwhile wait for them, so the
+    edits are applied in the order they arrive.
+
+    Without an `executor` the session aligns on a thread of its own, which is shut
+    down by `close` or at the end of a `with` block. Closing the session cancels
+    the callers that wait for an alignment, and edits after that raise RuntimeError.
+
+    >>> import asyncio
+    >>> async def main() -> list[str]:
+    ...     with Session(graph.init('a b c')) as s:
+    ...         gs = await asyncio.gather(s.modify(0, 1, 'x'), s.modify(4, 5, 'y'))
+    ...         return [graph.target_text(g) for g in gs]
+    >>> asyncio.run(main())
+    ['x b y ', 'x b y ']
+    """
+
+    def __init__(  # noqa: D107
+        self,
+        g: Graph,
+        *,
+        incremental: bool = False,
+        timeout: Optional[float] = None,
+        executor: Optional[concurrent.futures.Executor] = None,
+    ) -> None:
+        self._incremental = incremental
+        self._timeout = timeout
+        self._own_executor = executor is None
+        self._executor = executor or concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # the latest aligned state
+        self._aligned = g
+        # the latest state, equal to `_aligned` when nothing is pending
+        self._graph = g
+        self._job: Optional[concurrent.futures.Future[Graph]] = None
+        self._waiters: list[asyncio.Future[Graph]] = []
+        self._closed = False
+        # held while an edit is applied, made in the event loop on first use
+        self._lock: Optional[asyncio.Lock] = None
+
+    def __enter__(self) -> "Session":  # noqa: D105
+        return self
+
+    def __exit__(self, *_exc: object) -> None:  # noqa: D105
+        self.close()
+
+    def close(self) -> None:
+        """Cancel the pending alignment and shut down the executor if the session made it.
+
+        The callers that wait for the alignment get `asyncio.CancelledError`.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            waiter.cancel()
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+    @property
+    def closed(self) -> bool:
+        """Whether `close` has been called."""
+        return self._closed
+
+    @property
+    def graph(self) -> Graph:
+        """The latest state, which may have edits that are not aligned yet."""
+        return self._graph
+
+    @property
+    def pending(self) -> bool:
+        """Whether the latest state has edits that are not aligned yet."""
+        return self._graph is not self._aligned
+
+    async def aligned(self) -> Graph:
+        """Wait until the latest state is aligned and return it."""
+        if not self.pending:
+            return self._graph
+        self._check_open()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if self._job is None:
+            self._start()
+        return await waiter
+
+    async def modify(self, from_: int, to: int, text: str, side: Side = Side.target) -> Graph:
+        """Replace the text between character offsets, see `graph.modify`."""
+        return await self._edit(lambda g: graph.unaligned_modify(g, from_, to, text, side))
+
+    async def set_source(self, text: str) -> Graph:
+        """Replace the source text, see `graph.set_source`."""
+        return await self._set_side(Side.source, text)
+
+    async def set_target(self, text: str) -> Graph:
+        """Replace the target text, see `graph.set_target`."""
+        return await self._set_side(Side.target, text)
+
+    async def rearrange(self, begin: int, end: int, dest: int) -> Graph:
+        """Move target tokens, see `graph.rearrange`."""
+        return await self._edit(
+            lambda g: graph.unaligned_rearrange(g, begin, end, dest), plain=False
+        )
+
+    async def _set_side(self, side: Side, text: str) -> Graph:
+        self._check_open()
+        async with self._edit_lock():
+            await self._ready(plain=True)
+            # the diff can take as long as the timeout, keep it off the event loop
+            f = functools.partial(
+                graph.changed_range,
+                graph.get_side_text(self._graph, side),
+                text,
+                timeout=self._timeout,
+            )
+            from_, to, new_text = await _run(self._executor, f)
+            self._check_open()
+            self._apply(lambda g: graph.unaligned_modify(g, from_, to, new_text, side))
+        return await self.aligned()
+
+    async def _edit(self, f: Callable[[Graph], Graph], *, plain: bool = True) -> Graph:
+        self._check_open()
+        async with self._edit_lock():
+            await self._ready(plain=plain)
+            self._apply(f)
+        return await self.aligned()
+
+    def _edit_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _ready(self, *, plain: bool) -> None:
+        while self.pending and not (plain and is_plain(self._graph)):
+            await self.aligned()
+
+    def _apply(self, f: Callable[[Graph], Graph]) -> None:
+        self._graph = f(self._graph)
+        if self._job is not None and self._job.cancel():
+            # it had not started, start over with the latest state
+            self._job = None
+
+    def _check_open(self) -> None:
+        if self._closed:
+            raise RuntimeError("the session is closed")
+
+    def _start(self) -> None:
+        before, after = self._aligned, self._graph
+        if self._incremental:
+            f = functools.partial(graph.align_changes, before, after, timeout=self._timeout)
+        else:
+            f = functools.partial(graph.align, after, timeout=self._timeout)
+        job = self._executor.submit(f)
+        self._job = job
+        loop = asyncio.get_running_loop()
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._finished, job, after))
+
+    def _finished(self, job: "concurrent.futures.Future[Graph]", after: Graph) -> None:
+        if job is not self._job:
+            # cancelled before it started
+            return
+        self._job = None
+        if after is not self._graph:
+            # edited while it ran
+            if self._waiters:
+                self._start()
+            return
+        waiters, self._waiters = self._waiters, []
+        error = job.exception()
+        if error is None:
+            self._aligned = self._graph = job.result()
+        for waiter in waiters:
+            if waiter.done():
+                continue
+            if error is None:
+                waiter.set_result(self._graph)
+            else:
+                waiter.set_exception(error)
@@ -0,0 +1,144 @@
+"""Align corpora from the command line.
+
+Run with `python -m parallel_corpus` or `parallel-corpus`.
+
+`align` reads sentence pairs, one `source<TAB>target` per line, and writes the
+aligned graphs as JSON Lines. `realign` reads graphs as JSON Lines and writes them
+aligned again, and `connect-isolated` writes them with the tokens connected by
+`graph.connect_isolated_tokens_based_on_index`.
+
+Files ending with `.gz` are gzipped and `-` is standard input or output. The
+graphs are processed on `--jobs` processes, `--chunk-size` at a time, and at most
+two chunks per process are in memory.
+"""
+
+import argparse
+import contextlib
+import functools
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from typing import IO, Optional
+
+from parallel_corpus import graph
+from parallel_corpus.graph import Graph
+from parallel_corpus.io import jsonl
+from parallel_corpus.shared import pool
+
+__all__ = ["main"]
+
+# seconds between progress reports
+PROGRESS_EVERY = 2.0
+
+
+def main(argv: Optional[list[str]] = None) -> int:  # noqa: D103
+    args = _parser().parse_args(argv)
+    try:
+        with _open(args.input, "r") as fp_in, _open(args.output, "w") as fp_out:
+            graphs = _processed_graphs(args, fp_in)
+            jsonl.write_lines(fp_out, graphs if args.quiet else progress(graphs, sys.stderr))
+    except ValueError as e:
+        sys.stderr.write(f"parallel-corpus: error: {e}\n")
+        return 1
+    return 0
+
+
+def _processed_graphs(args: argparse.Namespace, lines: Iterable[str]) -> Iterator[Graph]:
+    if args.command == "align":
+        return graph.init_many(
+            read_pairs(lines),
+            manual=args.manual,
+            max_workers=args.jobs,
+            chunksize=args.chunk_size,
+        )
+    if args.command == "connect-isolated":
+        return graph.connect_isolated_many(
+            jsonl.read_lines(lines), max_workers=args.jobs, chunksize=args.chunk_size
+        )
+    return pool.ordered_map(
+        functools.partial(graph.align, timeout=args.timeout),
+        jsonl.read_lines(lines),
+        max_workers=args.jobs,
+        chunksize=args.chunk_size,
+    )
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="parallel-corpus", description=__doc__.splitlines()[0] if __doc__ else None
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    align = commands.add_parser("align", help="align sentence pairs read as TSV")
+    align.add_argument(
+        "--manual", action="store_true", help="mark the edges of the new graphs as manual"
+    )
+    realign = commands.add_parser("realign", help="align graphs read as JSON Lines again")
+    realign.add_argument(
+        "--timeout", type=float, help="seconds to spend on the diff of each graph"
+    )
+    connect = commands.add_parser(
+        "connect-isolated",
+        help="connect unaligned tokens with the same index in graphs read as JSON Lines",
+    )
+    for command in (align, realign, connect):
+        command.add_argument("input", nargs="?", default="-", help="default: standard input")
+        command.add_argument("-o", "--output", default="-", help="default: standard output")
+        command.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            help="number of processes, by default one per CPU, 1 aligns in this process",
+        )
+        command.add_argument(
+            "--chunk-size",
+            type=int,
+            default=pool.DEFAULT_CHUNKSIZE,
+            help="number of graphs sent to a process at a time (default: %(default)s)",
+        )
+        command.add_argument("-q", "--quiet", action="store_true", help="do not report progress")
+    return parser
+
+
+@contextlib.contextmanager
+def _open(path: str, mode: str) -> Iterator[IO[str]]:
+    if path != "-":
+        with jsonl.open_text(path, mode) as fp:
+            yield fp
+        return
+    stream = sys.stdin if mode == "r" else sys.stdout
+    # leave the standard streams open
+    with open(stream.fileno(), mode, encoding="utf-8", closefd=False) as fp:
+        yield fp
+
+
+def read_pairs(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    r"""Read `source<TAB>target` lines, skipping blank lines.
+
+    >>> list(read_pairs(['a b\tc\n', '\n']))
+    [('a b', 'c')]
+    """
+    for i, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")  # noqa: PLW2901
+        if not line.strip():
+            continue
+        source, tab, target = line.partition("\t")
+        if not tab or "\t" in target:
+            raise ValueError(f"line {i}: expected source and target separated by one tab")
+        yield source, target
+
+
+def progress(
+    graphs: Iterable[Graph], out: IO[str], *, every: float = PROGRESS_EVERY
+) -> Iterator[Graph]:
+    """Pass on `graphs`, reporting the count and rate to `out` every `every` seconds."""
+    start = last = time.perf_counter()
+    n = 0
+    for g in graphs:
+        n += 1
+        yield g
+        now = time.perf_counter()
+        if now - last >= every:
+            last = now
+            out.write(f"{n} graphs, {n / (now - start):.0f} graphs/s\n")
+    seconds = time.perf_counter() - start
+    out.write(f"{n} graphs in {seconds:.1f} s, {n / max(seconds, 1e-9):.0f} graphs/s\n")
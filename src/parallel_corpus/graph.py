@@ -1,18 +1,24 @@
 """Parallel corpus as a graph."""
 
-import copy
+import array
+import concurrent.futures
+import functools
+import hashlib
 import itertools
 import logging
 import re
-from collections.abc import Iterable
-from dataclasses import dataclass
-from typing import Optional, TypedDict, TypeVar
+import sys
+import time
+import weakref
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field, replace
+from typing import Callable, Optional, TypedDict, TypeVar, Union
 
 import parallel_corpus.shared.ranges
 import parallel_corpus.shared.str_map
 import parallel_corpus.shared.union_find
 from parallel_corpus import shared, text_token
-from parallel_corpus.shared import dicts, diffs, ids, lists
+from parallel_corpus.shared import diffs, ids, lists, lru, pool, profiling
 from parallel_corpus.shared.unique_check import UniqueCheck
 from parallel_corpus.source_target import Side, SourceTarget, map_sides
 from parallel_corpus.text_token import Token
@@ -28,8 +34,19 @@ NO_WHITESPACE_AT_END = re.compile(r"\S$")
 
 logger = logging.getLogger(__name__)
 
+# number of tokens around an edit that are re-aligned by `align_incremental`
+ALIGN_CONTEXT = 8
+# least number of tokens in a segment of `align_chunked`
+CHUNK_TOKENS = 512
+# number of edits that a graph remembers it was made by, see `edit_steps`
+MAX_EDIT_STEPS = 16
+# most tokens and edges an edit can change and still be remembered, see `edit_steps`
+MAX_EDIT_STEP_SIZE = 1024
+# number of equal tokens on each side of a change that `token_diff` diffs with it
+TOKEN_DIFF_CONTEXT = 2
 
-@dataclass
+
+@dataclass(frozen=True, **shared.DATACLASS_SLOTS)
 class Edge:
     # a copy of the identifier used in the edges object of the graph
     id: str
@@ -46,23 +63,311 @@ Edges = dict[str, Edge]
 
 
 @dataclass
-class Graph(SourceTarget[list[Token]]):  # noqa: D101
+class Graph(SourceTarget[Sequence[Token]]):  # noqa: D101
     edges: Edges
     comment: Optional[str] = None
+    # at least the high-water mark of the numbers in the token ids, see `next_id`
+    next_free_id: Optional[int] = field(default=None, compare=False, repr=False)
+    # whether the alignment was cut short by a time budget, see `align`
+    approximate: bool = field(default=False, compare=False, repr=False)
+    # The fields below are derived from the tokens and edges. They are not arguments
+    # of the constructor, so `dataclasses.replace` starts them afresh, and they are
+    # checked against what they were derived from before they are used.
+    # map from token ids to edges, see `edge_index`
+    token_edges: Optional[dict[str, Edge]] = field(
+        default=None, init=False, compare=False, repr=False
+    )
+    # the edges that `token_edges` was made for
+    _indexed_edges: Optional[Edges] = field(default=None, init=False, compare=False, repr=False)
+    # whether `next_free_id` is known to be above the numbers in the token ids
+    _ids_checked: bool = field(default=False, init=False, compare=False, repr=False)
+    # the tokens of each side with their character offsets, see `side_offsets`
+    char_offsets: dict[Side, tuple[Sequence[Token], array.array]] = field(
+        default_factory=dict, init=False, compare=False, repr=False
+    )
+    # the edit that made this graph with the sides and edges it made, see `edit_steps`
+    _edit_step: Optional[tuple["EditStep", Sequence[Token], Sequence[Token], Edges]] = field(
+        default=None, init=False, compare=False, repr=False
+    )
+
+    def __getstate__(self) -> dict:  # noqa: D105
+        # the edit steps refer to other graphs by weak references, which do not pickle
+        state = self.__dict__.copy()
+        state["_edit_step"] = None
+        return state
 
     def copy_with_updated_side_and_edges(  # noqa: D102
-        self, side: Side, new_tokens: list[Token], edges: Edges
+        self,
+        side: Side,
+        new_tokens: Sequence[Token],
+        edges: Edges,
+        *,
+        next_free_id: Optional[int] = None,
+        token_edges: Optional[dict[str, Edge]] = None,
     ) -> "Graph":
         source = self.source if side == Side.target else new_tokens
         target = new_tokens if side == Side.target else self.target
-        return Graph(source=source, target=target, edges=edges, comment=self.comment)
+        g = Graph(
+            source=source,
+            target=target,
+            edges=edges,
+            comment=self.comment,
+            next_free_id=self.next_free_id if next_free_id is None else next_free_id,
+            approximate=self.approximate,
+        )
+        g._ids_checked = self._ids_checked or next_free_id is not None
+        g.char_offsets = {k: v for k, v in self.char_offsets.items() if k != side}
+        return with_derived(g, token_edges=token_edges)
+
+    def copy_with_edges(  # noqa: D102
+        self,
+        edges: Edges,
+        *,
+        token_edges: Optional[dict[str, Edge]] = None,
+        approximate: Optional[bool] = None,
+    ) -> "Graph":
+        g = Graph(
+            source=self.source,
+            target=self.target,
+            edges=edges,
+            comment=self.comment,
+            next_free_id=self.next_free_id,
+            approximate=self.approximate if approximate is None else approximate,
+        )
+        g._ids_checked = self._ids_checked
+        g.char_offsets = self.char_offsets.copy()
+        return with_derived(g, token_edges=token_edges)
+
+
+def with_derived(
+    g: Graph,
+    *,
+    next_free_id: Optional[int] = None,
+    token_edges: Optional[dict[str, Edge]] = None,
+) -> Graph:
+    """Give `g` data that is derived from its tokens and edges, and return it.
+
+    Neither is checked: `next_free_id` must be above the numbers in the token ids,
+    see `next_id`, and `token_edges` must agree with `g.edges`, see `edge_index`.
+    """
+    if next_free_id is not None:
+        g.next_free_id = next_free_id
+        g._ids_checked = True
+    if token_edges is not None:
+        g.token_edges = token_edges
+        g._indexed_edges = g.edges
+    return g
+
 
-    def copy_with_edges(self, edges: Edges) -> "Graph":  # noqa: D102
-        return Graph(source=self.source, target=self.target, edges=edges, comment=self.comment)
+@dataclass(frozen=True, **shared.DATACLASS_SLOTS)
+class EditStep:
+    """An edit that made a graph from an earlier graph, see `edit_steps`.
+
+    The tokens `removed` at `start` of `side` were replaced by `inserted`, and the
+    edges in `edges_removed` by those in `edges_added`, by their keys in `Graph.edges`.
+    """
+
+    origin: "weakref.ReferenceType[Graph]"
+    side: Side
+    start: int
+    removed: tuple[Token, ...]
+    inserted: tuple[Token, ...]
+    edges_removed: Edges
+    edges_added: Edges
+    # the step that made the origin, if it is remembered
+    previous: Optional["EditStep"]
+    depth: int
+
+
+def edit_steps(g: Graph, origin: Graph) -> Optional[list[EditStep]]:
+    """Return the edits that made `g` from `origin`, oldest first, if they are known.
+
+    The edits in this module remember on the graph they make what they changed,
+    unless it is more than `MAX_EDIT_STEP_SIZE` tokens and edges, back to at least
+    `MAX_EDIT_STEPS` edits. The graphs themselves are not kept alive by this.
+    Returns None for graphs that were not made from `origin` like that.
+
+    >>> g = init('a b c')
+    >>> [(len(s.removed), len(s.inserted)) for s in edit_steps(modify(g, 0, 1, 'x'), g)]
+    [(1, 1), (0, 0)]
+    >>> edit_steps(g, init('a b c')) is None
+    True
+    """
+    if g is origin:
+        return []
+    steps = []
+    step = _last_step(g)
+    while step is not None:
+        steps.append(step)
+        if step.origin() is origin:
+            return steps[::-1]
+        step = step.previous
+    return None
+
+
+def _last_step(g: Graph) -> Optional[EditStep]:
+    if g._edit_step is None:
+        return None
+    step, source, target, edges = g._edit_step
+    if g.source is not source or g.target is not target or g.edges is not edges:
+        return None
+    return step
+
+
+def _last_steps(step: EditStep, n: int) -> EditStep:
+    """Copy the last `n` steps up to `step`, forgetting the ones before them."""
+    steps: list[EditStep] = []
+    older: Optional[EditStep] = step
+    while older is not None and len(steps) < n:
+        steps.append(older)
+        older = older.previous
+    previous: Optional[EditStep] = None
+    for s in reversed(steps):
+        depth = 1 if previous is None else previous.depth + 1
+        previous = replace(s, previous=previous, depth=depth)
+    return previous  # type: ignore [return-value]
+
+
+def _with_step(
+    g: Graph,
+    before: Graph,
+    edges_removed: Edges,
+    edges_added: Edges,
+    side: Side = Side.target,
+    start: int = 0,
+    removed: Sequence[Token] = (),
+    inserted: Sequence[Token] = (),
+) -> Graph:
+    """Remember on `g` that it was made from `before` by the given edit, and return it."""
+    size = len(removed) + len(inserted) + len(edges_removed) + len(edges_added)
+    if size <= MAX_EDIT_STEP_SIZE:
+        previous = _last_step(before)
+        if previous is not None and previous.depth >= 2 * MAX_EDIT_STEPS:
+            previous = _last_steps(previous, MAX_EDIT_STEPS - 1)
+        step = EditStep(
+            origin=weakref.ref(before),
+            side=side,
+            start=start,
+            removed=tuple(removed),
+            inserted=tuple(inserted),
+            edges_removed=edges_removed,
+            edges_added=edges_added,
+            previous=previous,
+            depth=1 if previous is None else previous.depth + 1,
+        )
+        g._edit_step = (step, g.source, g.target, g.edges)
+    return g
 
 
 def next_id(g: Graph) -> int:
-    return ids.next_id(itertools.chain((t.id for t in g.target), (s.id for s in g.source)))
+    """Return the next free number for token ids in the graph.
+
+    Graphs made by this module keep track of it in `Graph.next_free_id`. For other
+    graphs the ids are scanned once, and a `next_free_id` that was given to the
+    constructor is used if it is higher, so that ids of removed tokens are not reused.
+
+    >>> next_id(init('a b c'))
+    3
+    >>> next_id(Graph(source=[Token('a ', 's7')], target=[Token('a ', 't2')], edges={}))
+    8
+    >>> next_id(Graph(source=[Token('a ', 's1')], target=[], edges={}, next_free_id=5))
+    5
+    """
+    if not g._ids_checked or g.next_free_id is None:
+        found = ids.next_id(itertools.chain((t.id for t in g.target), (s.id for s in g.source)))
+        with_derived(
+            g, next_free_id=found if g.next_free_id is None else max(found, g.next_free_id)
+        )
+    return g.next_free_id  # type: ignore [return-value]
+
+
+def edge_index(g: Graph) -> dict[str, Edge]:
+    """Return the map from token ids to edges of the graph.
+
+    The functions in this module keep `Graph.token_edges` up to date as they edit
+    the graph, so that an edit only touches the edges of the tokens it changes.
+    For other graphs, and graphs whose `edges` have been replaced, the map is built
+    once by `edge_map` and then remembered. The edits check the entries they use
+    against `g.edges` and make the map again if an edge was replaced in place.
+
+    The map is shared between graphs and must not be modified, use `edge_map`
+    to get a fresh copy.
+
+    >>> g = init('a b')
+    >>> edge_index(g)['t1'].ids
+    ['s1', 't1']
+    >>> edge_index(g) is edge_index(g)
+    True
+    """
+    if g.token_edges is None or g._indexed_edges is not g.edges:
+        with_derived(g, token_edges=edge_map(g))
+    return g.token_edges  # type: ignore [return-value]
+
+
+def _checked_edge_index(g: Graph, ids: Iterable[str]) -> dict[str, Edge]:
+    """Return `edge_index(g)`, made afresh if the edges of the given tokens are not in `g.edges`.
+
+    An index is only made again when `g.edges` is replaced, so this catches edges
+    that were replaced in place after it was made, at the cost of a lookup per token.
+    """
+    em = edge_index(g)
+    values: Optional[set[int]] = None
+    for id_ in ids:
+        e = em.get(id_)
+        if e is not None and g.edges.get(e.id) is e:
+            continue
+        if values is None:
+            # the edges of graphs made elsewhere may be under other keys than their ids
+            values = {id(v) for v in g.edges.values()}
+        if e is None or id(e) not in values:
+            return with_derived(g, token_edges=edge_map(g)).token_edges  # type: ignore [return-value]
+    return em
+
+
+def side_offsets(g: Graph, side: Side) -> array.array:
+    """Return the character offset of each token on a side, followed by the length of its text.
+
+    Computed once per side and kept on the graph, and on the graphs made from it
+    that keep the side.
+
+    >>> side_offsets(init('a bc'), Side.target)
+    array('l', [0, 2, 5])
+    """
+    tokens = g.get_side(side)
+    if isinstance(tokens, text_token.TokenSequence):
+        return tokens.offsets
+    kept = g.char_offsets.get(side)
+    if kept is not None and kept[0] is tokens:
+        return kept[1]
+    offsets = text_token.offsets(text_token.texts(tokens))
+    g.char_offsets[side] = (tokens, offsets)
+    return offsets
+
+
+def compact(g: Graph) -> Graph:
+    """Store the tokens of both sides as `text_token.TokenSequence`s.
+
+    The edits in this module keep sides that are stored like this, so the text of a
+    side and its character offsets are at hand without visiting its tokens.
+
+    >>> g = compact(init('a b'))
+    >>> g == init('a b'), get_side_text(g, Side.target)
+    (True, 'a b ')
+    >>> type(modify(g, 0, 1, 'c').target).__name__
+    'TokenSequence'
+    """
+    c = Graph(
+        source=text_token.TokenSequence.from_tokens(g.source),
+        target=text_token.TokenSequence.from_tokens(g.target),
+        edges=g.edges,
+        comment=g.comment,
+        next_free_id=g.next_free_id,
+        approximate=g.approximate,
+    )
+    c._ids_checked = g._ids_checked
+    if g._indexed_edges is g.edges:
+        with_derived(c, token_edges=g.token_edges)
+    return c
 
 
 def edge(
@@ -73,7 +378,7 @@ def edge(
     manual: bool = False,
 ) -> Edge:
     ids_sorted = sorted(ids)
-    labels_nub = shared.uniq(labels)
+    labels_nub = [sys.intern(label) for label in shared.uniq(labels)]
     return Edge(
         id=f"e-{'-'.join(ids_sorted)}",
         ids=ids_sorted,
@@ -91,43 +396,94 @@ def init(s: str, *, manual: bool = False) -> Graph:
     return init_from(text_token.tokenize(s), manual=manual)
 
 
-def init_with_source_and_target(source: str, target: str, *, manual: bool = False) -> Graph:
+def init_with_source_and_target(
+    source: str,
+    target: str,
+    *,
+    manual: bool = False,
+    cache: Optional["AlignmentCache"] = None,
+) -> Graph:
     return init_from_source_and_target(
-        source=text_token.tokenize(source), target=text_token.tokenize(target), manual=manual
+        source=text_token.tokenize(source),
+        target=text_token.tokenize(target),
+        manual=manual,
+        cache=cache,
     )
 
 
 def init_from(tokens: list[str], *, manual: bool = False) -> Graph:
     return align(
-        Graph(
-            source=text_token.identify(tokens, "s"),
-            target=text_token.identify(tokens, "t"),
-            edges=edge_record(
-                (edge([f"s{i}", f"t{i}"], [], manual=manual) for i, _ in enumerate(tokens))
+        with_derived(
+            Graph(
+                source=text_token.identify(tokens, "s"),
+                target=text_token.identify(tokens, "t"),
+                edges=edge_record(
+                    (edge([f"s{i}", f"t{i}"], [], manual=manual) for i, _ in enumerate(tokens))
+                ),
             ),
+            next_free_id=len(tokens),
         )
     )
 
 
 def init_from_source_and_target(
-    source: list[str], target: list[str], *, manual: bool = False
+    source: list[str],
+    target: list[str],
+    *,
+    manual: bool = False,
+    cache: Optional["AlignmentCache"] = None,
 ) -> Graph:
     source_tokens = text_token.identify(source, "s")
     target_tokens = text_token.identify(target, "t")
     return align(
-        Graph(
-            source=source_tokens,
-            target=target_tokens,
-            edges=edge_record(
-                itertools.chain(
-                    (edge([s.id], [], manual=manual) for s in source_tokens),
-                    (edge([t.id], [], manual=manual) for t in target_tokens),
-                )
+        with_derived(
+            Graph(
+                source=source_tokens,
+                target=target_tokens,
+                edges=edge_record(
+                    itertools.chain(
+                        (edge([s.id], [], manual=manual) for s in source_tokens),
+                        (edge([t.id], [], manual=manual) for t in target_tokens),
+                    )
+                ),
             ),
-        )
+            next_free_id=max(len(source), len(target)),
+        ),
+        cache=cache,
     )
 
 
+def init_many(
+    pairs: Iterable[tuple[str, str]],
+    *,
+    manual: bool = False,
+    max_workers: Optional[int] = None,
+    chunksize: int = pool.DEFAULT_CHUNKSIZE,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> Iterator[Graph]:
+    """Initialize graphs from (source, target) pairs on a pool of processes.
+
+    The graphs are yielded in the order of `pairs`. See `shared.pool.ordered_map`
+    for the meaning of `max_workers`, `chunksize` and `executor`; `max_workers=1`
+    initializes the graphs in this process.
+
+    >>> [target_text(g) for g in init_many([('a', 'b'), ('c', 'd')], max_workers=1)]
+    ['b ', 'd ']
+    """
+    return pool.ordered_map(
+        functools.partial(_init_pair, manual=manual),
+        pairs,
+        max_workers=max_workers,
+        chunksize=chunksize,
+        executor=executor,
+    )
+
+
+def _init_pair(pair: tuple[str, str], *, manual: bool) -> Graph:
+    source, target = pair
+    return init_with_source_and_target(source, target, manual=manual)
+
+
 class TextLabels(TypedDict):
     text: str
     labels: list[str]
@@ -138,7 +494,7 @@ def from_unaligned(st: SourceTarget[list[TextLabels]]) -> Graph:
     edges: dict[str, Edge] = {}
 
     def proto_token_to_token(tok: TextLabels, i: int, prefix: str) -> Token:
-        id_ = f"{prefix}{i}"
+        id_ = sys.intern(f"{prefix}{i}")
         e = edge([id_], tok["labels"], manual=False)
         edges[id_] = e
         return Token(tok["text"], id_)
@@ -151,19 +507,235 @@ def from_unaligned(st: SourceTarget[list[TextLabels]]) -> Graph:
 
     g = map_sides(st, proto_tokens_to_tokens)
 
-    return align(Graph(source=g.source, target=g.target, edges=edges))
+    return align(
+        with_derived(
+            Graph(source=g.source, target=g.target, edges=edges),
+            next_free_id=max(len(st.source), len(st.target)),
+        )
+    )
+
+
+def modify(
+    g: Graph,
+    from_: int,
+    to: int,
+    text: str,
+    side: Side = Side.target,
+    *,
+    incremental: bool = False,
+    timeout: Optional[float] = None,
+    cache: Optional["AlignmentCache"] = None,
+) -> Graph:
+    """Replace the text from `from_` to `to` of `side` with `text` and align.
+
+    With `incremental`, only the tokens around the edit are aligned again, see
+    `align_incremental`. This is much faster than `align` on long texts, but the
+    tokens are not always grouped as `align` would group them when the sides differ
+    in other places too. The time of an edit still grows with the length of the
+    texts, although much more slowly, since the edges and the map from tokens to
+    edges are copied.
+
+    See `align` for `timeout` and `cache`.
+    """
+    after = unaligned_modify(g, from_, to, text, side)
+    return _align_after_edit(g, after, incremental, timeout, cache)
+
+
+def set_source(
+    g: Graph,
+    text: str,
+    *,
+    incremental: bool = False,
+    timeout: Optional[float] = None,
+    cache: Optional["AlignmentCache"] = None,
+) -> Graph:
+    """Replace the source text and align, see `set_target`."""
+    deadline = _deadline(timeout)
+    after = unaligned_set_side(g, Side.source, text, timeout=timeout)
+    return _align_after_edit(g, after, incremental, _remaining(deadline), cache)
+
+
+def set_target(
+    g: Graph,
+    text: str,
+    *,
+    incremental: bool = False,
+    timeout: Optional[float] = None,
+    cache: Optional["AlignmentCache"] = None,
+) -> Graph:
+    """Replace the target text and align.
+
+    See `align` for `cache`, and `modify` for `incremental`, which aligns only the
+    tokens around the changed text and can group them otherwise than `align`. The
+    `timeout` is for the diff that finds the changed text and the alignment together.
+    """
+    deadline = _deadline(timeout)
+    after = unaligned_set_side(g, Side.target, text, timeout=timeout)
+    return _align_after_edit(g, after, incremental, _remaining(deadline), cache)
+
+
+def _deadline(timeout: Optional[float]) -> Optional[float]:
+    return None if timeout is None else time.time() + timeout
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else max(0.0, deadline - time.time())
+
+
+def _align_after_edit(
+    before: Graph,
+    after: Graph,
+    incremental: bool,
+    timeout: Optional[float] = None,
+    cache: Optional["AlignmentCache"] = None,
+) -> Graph:
+    if incremental:
+        return align_changes(before, after, timeout=timeout, cache=cache)
+    return align(after, timeout=timeout, cache=cache)
+
 
+class Edit:
+    """A batch of edits to a graph that is aligned once, when it is committed.
 
-def modify(g: Graph, from_: int, to: int, text: str, side: Side = Side.target) -> Graph:
-    return align(unaligned_modify(g, from_, to, text, side))
+    The operations are applied with their `unaligned_*` counterparts and the result
+    is the same as applying `modify`, `set_source`, `set_target` and `rearrange` one
+    at a time. Operations that depend on the current alignment align the pending
+    edits first: `rearrange` always, and the text edits when the graph has edges
+    with labels, comments or manual alignment.
 
+    >>> g = init('a b c')
+    >>> with edit(g) as e:
+    ...     _ = e.modify(0, 2, 'x ').set_source('a b d').modify(2, 4, 'y ')
+    >>> e.graph == modify(set_source(modify(g, 0, 2, 'x '), 'a b d'), 2, 4, 'y ')
+    True
+    """
+
+    def __init__(
+        self, g: Graph, *, incremental: bool = False, timeout: Optional[float] = None
+    ) -> None:
+        self._incremental = incremental
+        self._timeout = timeout
+        self._aligned = g
+        self._graph = g
+        self._pending = False
+        self._plain = is_plain(g)
+
+    def __enter__(self) -> "Edit":
+        return self
+
+    def __exit__(self, exc_type: Optional[type], *_exc: object) -> None:
+        if exc_type is None:
+            self.commit()
+
+    @property
+    def graph(self) -> Graph:
+        """The graph with all edits applied and aligned."""
+        return self.commit()
+
+    def commit(self) -> Graph:
+        """Align the pending edits and return the graph."""
+        if self._pending:
+            self._aligned = self._graph = _align_after_edit(
+                self._aligned, self._graph, self._incremental, self._timeout
+            )
+            self._pending = False
+            self._plain = is_plain(self._graph)
+        return self._graph
+
+    def modify(self, from_: int, to: int, text: str, side: Side = Side.target) -> "Edit":
+        """Replace the text between character offsets, see `modify`."""
+        return self._apply(lambda g: unaligned_modify(g, from_, to, text, side))
+
+    def set_source(self, text: str) -> "Edit":
+        """Replace the source text, see `set_source`."""
+        return self._apply(
+            lambda g: unaligned_set_side(g, Side.source, text, timeout=self._timeout)
+        )
+
+    def set_target(self, text: str) -> "Edit":
+        """Replace the target text, see `set_target`."""
+        return self._apply(
+            lambda g: unaligned_set_side(g, Side.target, text, timeout=self._timeout)
+        )
+
+    def rearrange(self, begin: int, end: int, dest: int) -> "Edit":
+        """Move target tokens, see `rearrange`."""
+        self.commit()
+        self._graph = unaligned_rearrange(self._graph, begin, end, dest)
+        self._pending = True
+        self._plain = False
+        return self
 
-def set_source(g: Graph, text: str) -> Graph:
-    return align(unaligned_set_side(g, Side.source, text))
+    def _apply(self, f: Callable[[Graph], Graph]) -> "Edit":
+        if not self._plain:
+            self.commit()
+        self._graph = f(self._graph)
+        self._pending = True
+        return self
 
 
-def set_target(g: Graph, text: str) -> Graph:
-    return align(unaligned_set_side(g, Side.target, text))
+def edit(g: Graph, *, incremental: bool = False, timeout: Optional[float] = None) -> Edit:
+    """Start a batch of edits to `g`, see `Edit`."""
+    return Edit(g, incremental=incremental, timeout=timeout)
+
+
+def is_plain(g: Graph) -> bool:
+    """Whether the alignment of `g` carries nothing besides the grouping of its tokens.
+
+    Edits to such a graph can be applied one after another and aligned once, see `Edit`.
+
+    >>> is_plain(init('a b')), is_plain(init('a b', manual=True))
+    (True, False)
+    """
+    return not any(e.labels or e.manual or e.comment is not None for e in g.edges.values())
+
+
+def align_changes(
+    before: Graph,
+    after: Graph,
+    *,
+    timeout: Optional[float] = None,
+    cache: Optional["AlignmentCache"] = None,
+) -> Graph:
+    """Align `after`, re-diffing only around the edges that are not in `before`.
+
+    When `after` was made from `before` by the edits in this module, the changed
+    edges and where they are come from `edit_steps`, otherwise all edges are
+    compared. See `align_incremental`.
+    """
+    steps = edit_steps(after, before)
+    if steps is None:
+        changed = [after.edges[k] for k in after.edges.keys() - before.edges.keys()]
+        near = None
+    else:
+        added: Edges = {}
+        starts: dict[Side, int] = {}
+        for step in steps:
+            for k in step.edges_removed:
+                added.pop(k, None)
+            added.update(step.edges_added)
+            if step.removed or step.inserted:
+                starts[step.side] = step.start
+        changed = list(added.values())
+        near = _near(after, starts)
+    return align_incremental(
+        after,
+        itertools.chain.from_iterable(e.ids for e in changed),
+        timeout=timeout,
+        cache=cache,
+        near=near,
+    )
+
+
+def _near(g: Graph, starts: dict[Side, int]) -> Optional[SourceTarget[int]]:
+    """Positions on both sides near the given ones, at the same relative position if missing."""
+    if not starts:
+        return None
+    (side, start), *_ = starts.items()
+    other = Side.target if side == Side.source else Side.source
+    ratio = len(g.get_side(other)) / max(1, len(g.get_side(side)))
+    starts.setdefault(other, round(start * ratio))
+    return SourceTarget(source=starts[Side.source], target=starts[Side.target])
 
 
 def merge_edges(*es) -> Edge:  # noqa: ANN002
@@ -188,45 +760,701 @@ def merge_edges(*es) -> Edge:  # noqa: ANN002
 zero_edge = merge_edges()
 
 
-def align(g: Graph) -> Graph:
-    # Use a union-find to group characters into edges.
-    uf = parallel_corpus.shared.union_find.poly_union_find(lambda u: u)
-    em = edge_map(g)
-    chars = map_sides(
+class AlignmentCache(lru.LRUCache[bytes, bytes]):
+    """Remembers how recently aligned texts were grouped into edges.
+
+    Pass one as `cache` to `align` and the functions that call it to skip the
+    character diff for texts that were aligned before. The key is a hash of the
+    texts of the tokens that are not in manual edges, which are all that the diff
+    sees, and the value is the grouping of those tokens by their position, packed
+    into bytes. The edges are built anew from it for each graph, so nothing is
+    shared between the graphs, and the ids, labels and comments come from the
+    graph being aligned. Alignments cut short by a `timeout` are not cached.
+
+    >>> cache = AlignmentCache(maxsize=100)
+    >>> g = init_with_source_and_target('a bc d', 'a b c d', cache=cache)
+    >>> g == init_with_source_and_target('a bc d', 'a b c d', cache=cache)
+    True
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+
+
+def _alignment_key(source: Sequence[Token], target: Sequence[Token], token_diff: bool) -> bytes:
+    key = hashlib.blake2b(digest_size=16, person=b"tokens" if token_diff else b"chars")
+    for tokens in (source, target):
+        lengths = array.array("q", (len(t.text) for t in tokens))
+        key.update(len(lengths).to_bytes(8, "little"))
+        key.update(lengths.tobytes())
+        key.update(text_token.text(tokens).encode("utf-8", "surrogatepass"))
+    return key.digest()
+
+
+def align(
+    g: Graph,
+    *,
+    timeout: Optional[float] = None,
+    cache: Optional[AlignmentCache] = None,
+    token_diff: bool = False,
+) -> Graph:
+    """Align the source and target tokens that have characters in common.
+
+    With a `timeout` in seconds, the character diff stops when the time is up and
+    the parts it has not resolved are aligned on words that occur once in both,
+    see `aligned_pairs`. Such graphs have `approximate` set. Without a
+    `timeout`, the one second timeout of diff-match-patch applies.
+
+    With a `cache`, texts that were aligned before are grouped the same way without
+    a new diff, see `AlignmentCache`.
+
+    With `token_diff`, only the tokens that are not equal on both sides and the
+    tokens next to them are diffed character by character, see
+    `aligned_pairs`. This is much faster when the sides differ in a few
+    words, but the tokens around a change can be grouped differently.
+
+    >>> g = align(unaligned_set_side(init('a bc c de'), Side.target, 'a cb c ed'), timeout=0)
+    >>> g.approximate, target_text(g)
+    (True, 'a cb c ed ')
+    >>> sorted(e.id for e in g.edges.values())
+    ['e-s0-t0', 'e-s1', 'e-s2-t5', 'e-s3', 'e-t4', 'e-t6']
+    """
+    return _align_window(
         g,
-        lambda tokens, _side: list(
-            itertools.chain(
-                *map(to_char_ids, filter(lambda token: not em[token.id].manual, tokens))
+        range(len(g.source)),
+        range(len(g.target)),
+        timeout=timeout,
+        cache=cache,
+        token_diff=token_diff,
+    )
+
+
+def align_many(
+    graphs: Iterable[Graph],
+    *,
+    max_workers: Optional[int] = None,
+    chunksize: int = pool.DEFAULT_CHUNKSIZE,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> Iterator[Graph]:
+    """Align graphs on a pool of processes, yielding them in the order of `graphs`.
+
+    See `init_many`.
+    """
+    return pool.ordered_map(
+        align, graphs, max_workers=max_workers, chunksize=chunksize, executor=executor
+    )
+
+
+def align_chunked(
+    g: Graph,
+    *,
+    chunk_tokens: int = CHUNK_TOKENS,
+    timeout: Optional[float] = None,
+    max_workers: Optional[int] = 1,
+    executor: Optional[concurrent.futures.Executor] = None,
+    token_diff: bool = False,
+) -> Graph:
+    """Align a long graph in segments that are diffed one at a time.
+
+    The segments are cut at anchors: words that occur exactly once on each side,
+    in the same order, as found by `diffs.unique_anchors`. Each segment ends with
+    an anchor and has at least `chunk_tokens` tokens on both sides together, so
+    every diff stays short. Each segment is grouped as `align` groups it on its
+    own, so the anchors are aligned with each other and no group spans two
+    segments. The diff of the whole graph in `align` is not bound by the anchors,
+    so where it can place a change in more than one way, the tokens around the
+    change can be grouped differently, as with `token_diff`.
+
+    With `max_workers` other than 1, or an `executor`, the segments are aligned on
+    a pool of processes, see `shared.pool.ordered_map`. The `timeout` is for the
+    whole graph, and `token_diff` is as for `align`.
+
+    >>> g = unaligned_set_side(init('a bc d e fg h'), Side.target, 'a b c d e f g h')
+    >>> align_chunked(g, chunk_tokens=4) == align(g)
+    True
+    """
+    if chunk_tokens < 1:
+        raise ValueError(f"chunk_tokens must be positive, got {chunk_tokens}")
+    deadline = _deadline(timeout)
+    em = _checked_edge_index(g, _window_ids(g, range(len(g.source)), range(len(g.target))))
+    tokens = map_sides(g, lambda toks, _side: [t for t in toks if not em[t.id].manual])
+    segments = list(_anchored_segments(tokens.source, tokens.target, chunk_tokens))
+    # collected before the unions, so that align.union does not time the diffs
+    results = list(
+        pool.ordered_map(
+            functools.partial(_segment_pairs, deadline=deadline, token_diff=token_diff),
+            ((tokens.source[s], tokens.target[t]) for s, t in segments),
+            max_workers=max_workers,
+            chunksize=1,
+            executor=executor,
+        )
+    )
+    n_source = len(tokens.source)
+    approximate = False
+    with profiling.stage("align.union") as stage:
+        uf = parallel_corpus.shared.union_find.UnionFind(size=n_source + len(tokens.target))
+        for (s, t), (a_idx, b_idx, segment_approximate) in zip(segments, results):
+            # the pairs are numbered within the segment, as in `aligned_pairs`
+            b_shift = n_source + t.start - (s.stop - s.start)
+            uf.unions_from_pairs((a + s.start for a in a_idx), (b + b_shift for b in b_idx))
+            stage.count("unions", len(a_idx))
+            approximate = approximate or segment_approximate
+        groups = uf.components()
+    return _with_groups(g, tokens, groups, approximate=approximate, full=True)
+
+
+def _anchored_segments(
+    source: list[Token], target: list[Token], chunk_tokens: int
+) -> Iterator[tuple[slice, slice]]:
+    s_start = t_start = 0
+    for i, j in _anchors(source, target, chunk_tokens):
+        if i + j + 2 - s_start - t_start >= chunk_tokens:
+            yield slice(s_start, i + 1), slice(t_start, j + 1)
+            s_start, t_start = i + 1, j + 1
+    if s_start < len(source) or t_start < len(target):
+        yield slice(s_start, len(source)), slice(t_start, len(target))
+
+
+def _anchors(
+    source: list[Token], target: list[Token], chunk_tokens: int
+) -> list[tuple[int, int]]:
+    """Find anchors at most about `chunk_tokens` apart, where the words allow it.
+
+    As in patience diff, the gaps between the anchors of the whole text that are
+    too long are searched for words that occur once within the gap. Where there
+    are no such words, sequences of two and then three words are tried.
+    """
+    xs = [t.text.strip() for t in source]
+    ys = [t.text.strip() for t in target]
+    found = []
+    gaps = [(0, len(xs), 0, len(ys))]
+    while gaps:
+        x_start, x_end, y_start, y_end = gaps.pop()
+        if x_end - x_start + y_end - y_start <= chunk_tokens:
+            continue
+        anchors = []
+        for n in (1, 2, 3):
+            anchors = [
+                (x_start + i, y_start + j)
+                for i, j in diffs.unique_anchors(
+                    _ngrams(xs, x_start, x_end, n), _ngrams(ys, y_start, y_end, n)
+                )
+                if xs[x_start + i]
+            ]
+            if anchors:
+                break
+        found.extend(anchors)
+        x_prev, y_prev = x_start - 1, y_start - 1
+        for i, j in [*anchors, (x_end, y_end)] if anchors else []:
+            gaps.append((x_prev + 1, i, y_prev + 1, j))
+            x_prev, y_prev = i, j
+    return sorted(found)
+
+
+def _ngrams(
+    words: list[str], start: int, end: int, n: int
+) -> Sequence[Union[str, tuple[str, ...]]]:
+    if n == 1:
+        return words[start:end]
+    return [tuple(words[i : i + n]) for i in range(start, end - n + 1)]
+
+
+def _segment_pairs(
+    segment: tuple[list[Token], list[Token]], *, deadline: Optional[float], token_diff: bool
+) -> tuple[array.array, array.array, bool]:
+    return aligned_pairs(*segment, deadline=deadline, token_diff=token_diff)
+
+
+def align_incremental(
+    g: Graph,
+    ids: Iterable[str],
+    *,
+    context: int = ALIGN_CONTEXT,
+    timeout: Optional[float] = None,
+    cache: Optional[AlignmentCache] = None,
+    token_diff: bool = False,
+    near: Optional[SourceTarget[int]] = None,
+) -> Graph:
+    """Align only the neighbourhood of the tokens with the given ids.
+
+    The window is found by `alignment_window`, the edges outside of it are kept
+    as they are. Falls back to a full `align` if no window can be found on both sides.
+
+    The window is diffed on its own and the edges outside of it are kept, so the
+    result is not always the same as `align`. It is when the sides are equal
+    outside the window: the character diff of the whole texts then skips their
+    common beginning and end and diffs the same text as the window. Where the sides
+    differ elsewhere too, the diff of the whole texts is split up at other places,
+    and `align` can group the tokens in another way, in the window or far from it.
+    For 400 edits one after the other to the synthetic text of the benchmarks, one
+    edit in a hundred was grouped differently in the window, and about a third of
+    the edits made `align` change the grouping elsewhere.
+
+    The edit copies the edges and the map from tokens to edges, which takes
+    linear time, but in C. The rest takes time in proportion to the window when
+    `near` is given, see `alignment_window`.
+
+    >>> g = unaligned_modify(init('a bc d'), 0, 4, 'ab c')
+    >>> align_incremental(g, ['s0', 's1', 't3', 't4']) == align(g)
+    True
+    """
+    window = alignment_window(g, ids, context=context, near=near)
+    if window is None:
+        return align(g, timeout=timeout, cache=cache, token_diff=token_diff)
+    return _align_window(
+        g, window.source, window.target, timeout=timeout, cache=cache, token_diff=token_diff
+    )
+
+
+def alignment_window(
+    g: Graph,
+    ids: Iterable[str],
+    *,
+    context: int = ALIGN_CONTEXT,
+    near: Optional[SourceTarget[int]] = None,
+) -> Optional[SourceTarget[range]]:
+    """Find the token ranges that need to be re-aligned when the given tokens have changed.
+
+    The window is grown until it is closed under the edges and both its ends are
+    anchored, either at the ends of the graph or at `context` consecutive pairs of
+    identical tokens that are aligned one-to-one.
+
+    The tokens are looked for at growing distances from the positions `near` on
+    each side, so finding them takes time in proportion to how far they are from
+    there. Without `near` all tokens are looked at.
+
+    Returns None if the given tokens do not give a window on both sides.
+    """
+    ids = list(ids)
+    em = edge_index(g)
+    window = _alignment_window(g, ids, context, near, em)
+    if window is not None:
+        # edges changed in place since the index was made may have moved the window
+        checked = _checked_edge_index(g, _window_ids(g, window.source, window.target))
+        if checked is not em:
+            window = _alignment_window(g, ids, context, near, checked)
+    return window
+
+
+def _window_ids(g: Graph, source_window: range, target_window: range) -> Iterator[str]:
+    return (
+        t.id
+        for t in itertools.chain(
+            g.source[source_window.start : source_window.stop],
+            g.target[target_window.start : target_window.stop],
+        )
+    )
+
+
+def _alignment_window(
+    g: Graph,
+    ids: list[str],
+    context: int,
+    near: Optional[SourceTarget[int]],
+    em: dict[str, Edge],
+) -> Optional[SourceTarget[range]]:
+    sides = (Side.source, Side.target)
+    positions: dict[Side, dict[str, int]] = {side: {} for side in sides}
+    # the tokens of each side that are in positions
+    searched = dict.fromkeys(sides, (0, 0))
+    lo = {side: len(g.get_side(side)) for side in sides}
+    hi = dict.fromkeys(sides, 0)
+
+    def search(side: Side, start: int, end: int) -> None:
+        tokens = g.get_side(side)
+        start, end = max(0, start), min(len(tokens), end)
+        done_start, done_end = searched[side]
+        if done_start == done_end:
+            done_start = done_end = start
+        start, end = min(start, done_start), max(end, done_end)
+        side_positions = positions[side]
+        for i in itertools.chain(range(start, done_start), range(done_end, end)):
+            side_positions[tokens[i].id] = i
+        searched[side] = (start, end)
+
+    for side in sides:
+        if near is None:
+            search(side, 0, len(g.get_side(side)))
+        else:
+            i = near.get_side(side)
+            search(side, i - context, i + context)
+
+    def include(id_: str) -> bool:
+        while True:
+            for side in sides:
+                i = positions[side].get(id_)
+                if i is not None:
+                    lo[side] = min(lo[side], i)
+                    hi[side] = max(hi[side], i + 1)
+                    return True
+            if all(searched[side] == (0, len(g.get_side(side))) for side in sides):
+                return False
+            for side in sides:
+                start, end = searched[side]
+                # double the searched tokens, so that a token far away is found in linear time
+                width = max(end - start, context, 1)
+                search(side, start - width, end + width)
+
+    def close() -> None:
+        done = {side: (lo[side], lo[side]) for side in sides}
+        while any(done[side] != (lo[side], hi[side]) for side in sides):
+            todo: list[str] = []
+            for side in sides:
+                done_lo, done_hi = done[side]
+                tokens = g.get_side(side)
+                todo.extend(tokens[i].id for i in range(lo[side], done_lo))
+                todo.extend(tokens[i].id for i in range(done_hi, hi[side]))
+                done[side] = (lo[side], hi[side])
+            for tok_id in todo:
+                for id_ in em[tok_id].ids:
+                    include(id_)
+
+    def is_anchor(i: int, j: int) -> bool:
+        s, t = g.source[i], g.target[j]
+        e = em[s.id]
+        return e is em[t.id] and len(e.ids) == 2 and not e.manual and s.text == t.text  # noqa: PLR2004
+
+    def anchored_begin() -> bool:
+        if lo[Side.source] == 0 and lo[Side.target] == 0:
+            return True
+        if min(hi[side] - lo[side] for side in sides) < context:
+            return False
+        return all(is_anchor(lo[Side.source] + k, lo[Side.target] + k) for k in range(context))
+
+    def anchored_end() -> bool:
+        if all(hi[side] == len(g.get_side(side)) for side in sides):
+            return True
+        if min(hi[side] - lo[side] for side in sides) < context:
+            return False
+        return all(
+            is_anchor(hi[Side.source] - k, hi[Side.target] - k) for k in range(1, context + 1)
+        )
+
+    for id_ in ids:
+        if not include(id_):
+            return None
+    if all(lo[side] >= hi[side] for side in sides):
+        return None
+    close()
+    while True:
+        begin, end = anchored_begin(), anchored_end()
+        if begin and end:
+            break
+        for side in sides:
+            if lo[side] >= hi[side]:
+                # nothing on this side yet, start from the same relative position
+                other = Side.target if side == Side.source else Side.source
+                ratio = len(g.get_side(side)) / max(1, len(g.get_side(other)))
+                lo[side] = hi[side] = round(lo[other] * ratio)
+            if not begin:
+                lo[side] = max(0, lo[side] - context)
+            if not end:
+                hi[side] = min(len(g.get_side(side)), hi[side] + context)
+        close()
+
+    if any(lo[side] >= hi[side] for side in sides):
+        return None
+    return SourceTarget(
+        source=range(lo[Side.source], hi[Side.source]),
+        target=range(lo[Side.target], hi[Side.target]),
+    )
+
+
+def _align_window(
+    g: Graph,
+    source_window: range,
+    target_window: range,
+    *,
+    timeout: Optional[float] = None,
+    cache: Optional[AlignmentCache] = None,
+    token_diff: bool = False,
+) -> Graph:
+    """Align the tokens in the given windows, keeping the edges outside them."""
+    deadline = _deadline(timeout)
+    em = _checked_edge_index(g, _window_ids(g, source_window, target_window))
+    window = SourceTarget(
+        source=g.source[source_window.start : source_window.stop],
+        target=g.target[target_window.start : target_window.stop],
+    )
+    tokens = map_sides(window, lambda toks, _side: [t for t in toks if not em[t.id].manual])
+    key = b"" if cache is None else _alignment_key(tokens.source, tokens.target, token_diff)
+    packed = None if cache is None else cache.get(key)
+    if packed is None:
+        # Use a union-find to group the tokens into edges, source tokens are numbered
+        # from 0 and target tokens after them.
+        a_idx, b_idx, approximate = aligned_pairs(
+            tokens.source, tokens.target, deadline=deadline, token_diff=token_diff
+        )
+        with profiling.stage("align.union") as stage:
+            uf = parallel_corpus.shared.union_find.UnionFind(
+                size=len(tokens.source) + len(tokens.target)
+            )
+            uf.unions_from_pairs(a_idx, b_idx)
+            stage.count("unions", len(a_idx))
+            groups = uf.components()
+        if cache is not None and not approximate:
+            cache.put(key, groups.tobytes())
+    else:
+        groups = array.array("l")
+        groups.frombytes(packed)
+        approximate = False
+    full = len(window.source) == len(g.source) and len(window.target) == len(g.target)
+    return _with_groups(g, tokens, groups, approximate=approximate, full=full)
+
+
+def _with_groups(
+    g: Graph,
+    tokens: SourceTarget[list[Token]],
+    groups: array.array,
+    *,
+    approximate: bool,
+    full: bool,
+) -> Graph:
+    """Replace the edges of `tokens` with one edge per group.
+
+    Token `i` of `tokens.source` is in group `groups[i]` and token `j` of
+    `tokens.target` in group `groups[len(tokens.source) + j]`. With `full`, the
+    tokens are all tokens that are not in manual edges.
+    """
+    em = edge_index(g)
+    with profiling.stage("align.edges") as stage:
+        if full:
+            kept = edge_record(e for e in g.edges.values() if e.manual)
+        else:
+            # only the edges in the window are replaced, the others stay where they are
+            replaced = _keyed(
+                g, (em[tok.id] for tok in itertools.chain(tokens.source, tokens.target))
+            )
+            kept = g.edges.copy()
+            for k in replaced:
+                del kept[k]
+        # Collect the ids, labels and comments of each group and make each edge once,
+        # which gives the same edge as merging one token at a time with `merge_edges`.
+        # Groups are numbered densely, see `UnionFind.components`.
+        group_ids: list[list[str]] = [[] for _ in range(max(groups, default=-1) + 1)]
+        group_labels: dict[int, list[str]] = {}
+        group_comments: dict[int, list[str]] = {}
+        first: UniqueCheck[str] = UniqueCheck()
+        for tok, group in zip(itertools.chain(tokens.source, tokens.target), groups):
+            e_repr = em[tok.id]
+            group_ids[group].append(tok.id)
+            if e_repr.labels and first(e_repr.id):
+                group_labels.setdefault(group, []).extend(e_repr.labels)
+            if e_repr.comment is not None:
+                group_comments.setdefault(group, []).append(e_repr.comment)
+        proto_edges = []
+        for group, ids in enumerate(group_ids):
+            e = edge(
+                ids,
+                group_labels.get(group, []),
+                comment="\n\n".join(group_comments[group]) if group in group_comments else None,
             )
+            # keep the edge that was there if nothing changed, see `edit_steps`
+            old = em[ids[0]]
+            proto_edges.append(old if old == e else e)
+        stage.count("edges", len(proto_edges))
+
+    edges = kept
+    edges.update(edge_record(proto_edges))
+    if full:
+        edges_removed = {k: e for k, e in g.edges.items() if edges.get(k) is not e}
+        edges_added = {k: e for k, e in edges.items() if g.edges.get(k) is not e}
+        return _with_step(
+            g.copy_with_edges(edges, approximate=approximate), g, edges_removed, edges_added
+        )
+    token_edges = em.copy()
+    for e in proto_edges:
+        for id_ in e.ids:
+            token_edges[id_] = e
+    return _with_step(
+        g.copy_with_edges(
+            edges, token_edges=token_edges, approximate=approximate or g.approximate
         ),
+        g,
+        {k: e for k, e in replaced.items() if edges.get(k) is not e},
+        {e.id: e for e in proto_edges if replaced.get(e.id) is not e},
     )
-    char_diff = diffs.hdiff(chars.source, chars.target, lambda u: u.char, lambda u: u.char)
-    for c in char_diff:
-        # these undefined makes the alignment skip spaces.
-        # they originate from to_char_ids
-        if c.change == diffs.ChangeType.CONSTANT and (
-            c.a is not None and c.b is not None and c.a.id is not None and c.b.id is not None
+
+
+def aligned_pairs(
+    source: list[Token],
+    target: list[Token],
+    *,
+    deadline: Optional[float] = None,
+    token_diff: bool = False,
+) -> tuple[array.array, array.array, bool]:
+    """Pair the source and target tokens that have characters in common according to the diff.
+
+    Source token `i` is numbered `i` and target token `j` is numbered `len(source) + j`.
+    Spaces do not align tokens. `align` groups the tokens by unioning the pairs.
+
+    If `deadline` (in the sense of `time.time`) passes during the diff, the tokens
+    in each unresolved region are aligned with `diffs.unique_anchors` on their
+    words instead.
+
+    With `token_diff`, the texts of the tokens are diffed first and equal tokens
+    are aligned with each other directly. Only the runs of changed tokens, with
+    `TOKEN_DIFF_CONTEXT` equal tokens on each side, are diffed character by
+    character, so the time grows with the size of the changes rather than of the
+    texts. The result can differ from that of the character diff of the whole
+    texts where that diff can place a change in more than one way, for instance
+    an inserted word next to a word with the same letters, or a word that occurs
+    several times: both diffs are shortest, but they group the tokens around the
+    change differently.
+
+    Returns:
+        the numbers of the source and the target token of each pair, as two arrays,
+        and whether the deadline passed.
+    """
+    if not token_diff:
+        return _aligned_char_pairs(source, target, 0, len(source), deadline)
+    n_source = len(source)
+    with profiling.stage("align.tokens") as stage:
+        ops = diffs.int_diff(
+            [t.text for t in source], [t.text for t in target], deadline=deadline
+        )
+        stage.count("tokens", n_source + len(target))
+        stage.count("opcodes", len(ops))
+    a_idx = array.array("l")
+    b_idx = array.array("l")
+    approximate = False
+    a_done = b_done = 0
+    for a_start, a_end, b_start, b_end in _changed_runs(ops, TOKEN_DIFF_CONTEXT):
+        for i, j in zip(range(a_done, a_start), range(b_done, b_start)):
+            if source[i].text.strip(" "):
+                a_idx.append(i)
+                b_idx.append(n_source + j)
+        if a_start < a_end and b_start < b_end:
+            run_a, run_b, run_approximate = _aligned_char_pairs(
+                source[a_start:a_end],
+                target[b_start:b_end],
+                a_start,
+                n_source + b_start,
+                deadline,
+            )
+            a_idx.extend(run_a)
+            b_idx.extend(run_b)
+            approximate = approximate or run_approximate
+        a_done, b_done = a_end, b_end
+    for i, j in zip(range(a_done, n_source), range(b_done, len(target))):
+        if source[i].text.strip(" "):
+            a_idx.append(i)
+            b_idx.append(n_source + j)
+    return a_idx, b_idx, approximate
+
+
+def _changed_runs(ops: list[diffs.Opcode], context: int) -> list[tuple[int, int, int, int]]:
+    """Find the runs of changed tokens of a token diff, each widened by `context` equal tokens.
+
+    The runs are in order as `(a_start, a_end, b_start, b_end)`, and runs that
+    overlap once widened are merged.
+    """
+    runs: list[list[int]] = []
+    for op in ops:
+        if op.change == diffs.ChangeType.CONSTANT:
+            continue
+        # the tokens between runs are equal, so they are as many on both sides
+        if runs and op.a_start - runs[-1][1] <= 2 * context:
+            runs[-1][1], runs[-1][3] = op.a_end, op.b_end
+        else:
+            runs.append([op.a_start, op.a_end, op.b_start, op.b_end])
+    if not ops:
+        return []
+    a_len, b_len = ops[-1].a_end, ops[-1].b_end
+    out = []
+    for a_start, a_end, b_start, b_end in runs:
+        before = min(context, a_start, b_start)
+        after = min(context, a_len - a_end, b_len - b_end)
+        out.append((a_start - before, a_end + after, b_start - before, b_end + after))
+    return out
+
+
+def _aligned_char_pairs(
+    source: list[Token],
+    target: list[Token],
+    source_offset: int,
+    target_offset: int,
+    deadline: Optional[float],
+) -> tuple[array.array, array.array, bool]:
+    """Pair the tokens, numbered from the offsets, that the character diff aligns."""
+    with profiling.stage("align.chars") as stage:
+        source_text, source_owners = char_owners(source, offset=source_offset)
+        target_text, target_owners = char_owners(target, offset=target_offset)
+        stage.count("characters", len(source_text) + len(target_text))
+    with profiling.stage("align.diff") as stage:
+        ops, cut_off = diffs.timed_char_diff(source_text, target_text, deadline=deadline)
+        approximate = deadline is not None and cut_off
+        stage.count("characters", len(source_text) + len(target_text))
+        stage.count("opcodes", len(ops))
+    with profiling.stage("align.pairs") as stage:
+        a_idx = array.array("l")
+        b_idx = array.array("l")
+        for op in ops:
+            if op.change != diffs.ChangeType.CONSTANT:
+                continue
+            last_a = last_b = -1
+            for a, b in zip(
+                source_owners[op.a_start : op.a_end], target_owners[op.b_start : op.b_end]
+            ):
+                if a >= 0 and b >= 0 and (a != last_a or b != last_b):
+                    a_idx.append(a)
+                    b_idx.append(b)
+                    last_a, last_b = a, b
+        if approximate:
+            for a, b in _unresolved_anchors(
+                ops,
+                [t.text.strip() for t in source],
+                [t.text.strip() for t in target],
+                (source_owners, source_offset),
+                (target_owners, target_offset),
+            ):
+                a_idx.append(a)
+                b_idx.append(b)
+        stage.count("pairs", len(a_idx))
+    return a_idx, b_idx, approximate
+
+
+def _unresolved_anchors(
+    ops: list[diffs.Opcode],
+    source_words: list[str],
+    target_words: list[str],
+    source_owners: tuple[array.array, int],
+    target_owners: tuple[array.array, int],
+) -> Iterator[tuple[int, int]]:
+    """Pair the tokens with the same word that occur once in a region that is not constant.
+
+    The owners are given with the number of the first token of the words.
+    """
+    (a_owners, a_offset), (b_owners, b_offset) = source_owners, target_owners
+    for is_constant, run in itertools.groupby(
+        ops, lambda op: op.change == diffs.ChangeType.CONSTANT
+    ):
+        if is_constant:
+            continue
+        region = list(run)
+        xs = _owners_in(a_owners, region[0].a_start, region[-1].a_end)
+        ys = _owners_in(b_owners, region[0].b_start, region[-1].b_end)
+        for i, j in diffs.unique_anchors(
+            [source_words[x - a_offset] for x in xs], [target_words[y - b_offset] for y in ys]
         ):
-            uf.union(c.a.id, c.b.id)
-    proto_edges: dict[str, Edge] = {k: e for k, e in g.edges.items() if e.manual}
-    first: UniqueCheck[str] = UniqueCheck()
+            yield xs[i], ys[j]
+
+
+def _owners_in(owners: array.array, start: int, end: int) -> list[int]:
+    return [k for k in dict.fromkeys(owners[start:end]) if k >= 0]
 
-    def update_edges(tokens, _side) -> None:  # noqa: ANN001
-        for tok in tokens:
-            e_repr = em[tok.id]
-            if not e_repr.manual:
-                labels = e_repr.labels if first(e_repr.id) else []
-                e_token = edge([tok.id], labels, manual=False, comment=e_repr.comment)
-                dicts.modify(
-                    proto_edges,  # type: ignore[misc]
-                    uf.find(tok.id),
-                    zero_edge,
-                    lambda e: merge_edges(e, e_token),  # noqa: B023
-                )
 
-    map_sides(g, update_edges)
-    edges = edge_record(dicts.traverse(proto_edges, lambda e, _: e))
-    return g.copy_with_edges(edges)
+def char_owners(tokens: list[Token], *, offset: int = 0) -> tuple[str, array.array]:
+    """Text of the tokens and the number of the token each character belongs to.
+
+    Tokens are numbered from `offset`, spaces belong to no token and get -1.
+
+    >>> char_owners([Token('a ', 's0'), Token('bc ', 's1')], offset=2)
+    ('a bc ', array('l', [2, -1, 3, 3, -1]))
+    """
+    owners = array.array("l")
+    for i, tok in enumerate(tokens, start=offset):
+        owners.extend(-1 if char == " " else i for char in tok.text)
+    return text_token.text(tokens), owners
 
 
 def rearrange(g: Graph, begin: int, end: int, dest: int) -> Graph:
@@ -238,27 +1466,60 @@ def target_text(g: SourceTarget[list[text_token.Text]]) -> str:
 
 
 def connect_isolated_tokens_based_on_index(g: Graph) -> Graph:
-    g_new = copy.deepcopy(g)
-    isolated_source_edges = [
-        e for e in g_new.edges.values() if len(e.ids) == 1 and e.ids[0].startswith("s")
-    ]
-    isolated_target_edges = [
-        e for e in g_new.edges.values() if len(e.ids) == 1 and e.ids[0].startswith("t")
-    ]
-    for s_edge in isolated_source_edges:
-        needle = s_edge.ids[0].replace("s", "t")
-        t_edge = next(filter(lambda t: t.ids[0] == needle, isolated_target_edges), None)
-        if t_edge:
-            del g_new.edges[s_edge.id]
-            del g_new.edges[t_edge.id]
-
-            new_edge = merge_edges(s_edge, t_edge)
-            g_new.edges[new_edge.id] = new_edge
-
-    return g_new
+    """Connect the source and target tokens with the same index that are alone on their edges.
 
+    The index is the number in the token id. Takes time linear in the number of edges.
 
-@dataclass
+    >>> g = connect_isolated_tokens_based_on_index(init_with_source_and_target('a b c', 'x y c'))
+    >>> sorted(g.edges)
+    ['e-s0-t0', 'e-s1-t1', 'e-s2-t2']
+    """
+    isolated_targets = {
+        e.ids[0]: (k, e)
+        for k, e in g.edges.items()
+        if len(e.ids) == 1 and e.ids[0].startswith("t")
+    }
+    merged = []
+    for s_key, s_edge in g.edges.items():
+        if len(s_edge.ids) == 1 and s_edge.ids[0].startswith("s"):
+            t = isolated_targets.get(s_edge.ids[0].replace("s", "t"))
+            if t:
+                merged.append((s_key, s_edge, *t))
+    if not merged:
+        return g
+    edges = g.edges.copy()
+    token_edges = None if g._indexed_edges is not g.edges else edge_index(g).copy()
+    for s_key, s_edge, t_key, t_edge in merged:
+        del edges[s_key]
+        del edges[t_key]
+        new_edge = merge_edges(s_edge, t_edge)
+        edges[new_edge.id] = new_edge
+        if token_edges is not None:
+            token_edges[s_edge.ids[0]] = token_edges[t_edge.ids[0]] = new_edge
+    return g.copy_with_edges(edges, token_edges=token_edges)
+
+
+def connect_isolated_many(
+    graphs: Iterable[Graph],
+    *,
+    max_workers: Optional[int] = None,
+    chunksize: int = pool.DEFAULT_CHUNKSIZE,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> Iterator[Graph]:
+    """Run `connect_isolated_tokens_based_on_index` on graphs on a pool of processes.
+
+    The graphs are yielded in the order of `graphs`, see `init_many`.
+    """
+    return pool.ordered_map(
+        connect_isolated_tokens_based_on_index,
+        graphs,
+        max_workers=max_workers,
+        chunksize=chunksize,
+        executor=executor,
+    )
+
+
+@dataclass(**shared.DATACLASS_SLOTS)
 class CharIdPair:
     char: str
     id: Optional[str] = None
@@ -271,6 +1532,24 @@ def to_char_ids(token: Token) -> list[CharIdPair]:
     )
 
 
+def _keyed(g: Graph, es: Iterable[Edge]) -> Edges:
+    """Map the keys in `g.edges` of the given edges to them.
+
+    The keys are the edge ids, except in graphs made elsewhere, whose keys are then
+    looked up once.
+    """
+    out: Edges = {}
+    keys: Optional[dict[int, str]] = None
+    for e in es:
+        if g.edges.get(e.id) is e:
+            out[e.id] = e
+            continue
+        if keys is None:
+            keys = {id(v): k for k, v in g.edges.items()}
+        out[keys[id(e)]] = e
+    return out
+
+
 def edge_map(g: Graph) -> dict[str, Edge]:
     """Map from token ids to edges.
 
@@ -287,15 +1566,34 @@ def edge_map(g: Graph) -> dict[str, Edge]:
     return edges
 
 
-def unaligned_set_side(g: Graph, side: Side, text: str) -> Graph:
-    text0 = get_side_text(g, side)
-    edits = parallel_corpus.shared.ranges.edit_range(text0, text)
+def unaligned_set_side(
+    g: Graph, side: Side, text: str, *, timeout: Optional[float] = None
+) -> Graph:
+    """Replace the text of a side, re-tokenizing only the part that changed.
 
-    from_, to = edits["from"], edits["to"]
-    new_text = text[from_ : (len(text) - (len(text0) - to))]
+    The changed part is found by `changed_range`, whose diff takes at most
+    `timeout` seconds.
+    """
+    from_, to, new_text = changed_range(get_side_text(g, side), text, timeout=timeout)
     return unaligned_modify(g, from_, to, new_text, side)
 
 
+def changed_range(
+    text0: str, text: str, *, timeout: Optional[float] = None
+) -> tuple[int, int, str]:
+    """Find the characters of `text0` that `text` replaces and the text they are replaced by.
+
+    The range is found by `shared.ranges.edit_range`, whose diff takes at most
+    `timeout` seconds.
+
+    >>> changed_range('a b c ', 'a x c ')
+    (2, 3, 'x')
+    """
+    edits = parallel_corpus.shared.ranges.edit_range(text0, text, deadline=_deadline(timeout))
+    from_, to = edits["from"], edits["to"]
+    return from_, to, text[from_ : (len(text) - (len(text0) - to))]
+
+
 def unaligned_modify(
     g: Graph, from_: int, to: int, text: str, side: Side = Side.target
 ) -> Graph:
@@ -338,15 +1636,16 @@ def unaligned_modify(
 
     Indexes are character offsets (use CodeMirror's doc.posFromIndex and doc.indexFromPos to convert)
     """  # noqa: E501
-    tokens = get_side_texts(g, side)
-    token_at = text_token.token_at(tokens, from_)
+    tokens = g.get_side(side)
+    offsets = side_offsets(g, side)
+    token_at = text_token.locate(offsets, from_)
     from_token, from_ix = token_at["token"], token_at["offset"]
-    pre = (tokens[from_token] if from_token < len(tokens) else "")[:from_ix]
-    if to == len(get_side_text(g, side)):
-        return unaligned_modify_tokens(g, from_token, len(g.get_side(side)), pre + text, side)
-    to_token_at = text_token.token_at(tokens, to)
+    pre = (tokens[from_token].text if from_token < len(tokens) else "")[:from_ix]
+    if to == offsets[-1]:
+        return unaligned_modify_tokens(g, from_token, len(tokens), pre + text, side)
+    to_token_at = text_token.locate(offsets, to)
     to_token, to_ix = to_token_at["token"], to_token_at["offset"]
-    post = (tokens[to_token] or "")[to_ix:]
+    post = tokens[to_token].text[to_ix:]
     return unaligned_modify_tokens(g, from_token, to_token + 1, pre + text + post, side)
 
 
@@ -424,36 +1723,67 @@ def unaligned_modify_tokens(
             g, from_ - 1, to, g.get_side(side)[from_ - 1].text + text, side
         )
 
-    id_offset = next_id(g)
-
-    tokens = [
-        Token(t, f"{side[0]}{(id_offset + i)}") for i, t in enumerate(text_token.tokenize(text))
-    ]
-
-    new_tokens, removed = lists.splice(g.get_side(side), from_, to - from_, *tokens)
+    with profiling.stage("unaligned_modify_tokens") as stage:
+        id_offset = next_id(g)
 
-    ids_removed = {t.id for t in removed}
-
-    new_edge_ids = {t.id for t in tokens}
-    new_edge_labels = set()
-    new_edge_manual = False
+        tokens = [
+            Token(t, sys.intern(f"{side[0]}{(id_offset + i)}"))
+            for i, t in enumerate(text_token.tokenize(text))
+        ]
 
-    def fun(e: Edge, _id: str) -> bool:
-        if any(id_ in ids_removed for id_ in e.ids):
+        side_tokens = g.get_side(side)
+        new_tokens: Sequence[Token]
+        if isinstance(side_tokens, text_token.TokenSequence):
+            new_tokens, removed = side_tokens.splice(from_, to - from_, tokens)
+        else:
+            new_tokens, removed = lists.splice(side_tokens, from_, to - from_, *tokens)
+
+        ids_removed = {t.id for t in removed}
+
+        new_edge_ids = {t.id for t in tokens}
+        new_edge_labels = set()
+        new_edge_manual = False
+
+        em = _checked_edge_index(g, ids_removed)
+        # unlike dict(), dict.copy does not rehash the keys of dicts that had keys deleted
+        edges = g.edges.copy()
+        token_edges = em.copy()
+        edges_removed = _keyed(g, (em[id_] for id_ in ids_removed))
+        for k, e in edges_removed.items():
             for id_ in e.ids:
                 if id_ not in ids_removed:
                     new_edge_ids.add(id_)
+                del token_edges[id_]
             new_edge_labels.update(e.labels)
-            return False
-        return True
+            del edges[k]
 
-    edges = dicts.filter_dict(g.edges, fun)
-
-    if new_edge_ids:
-        e = edge(list(new_edge_ids), list(new_edge_labels), manual=new_edge_manual)
-        edges[e.id] = e
-
-    return g.copy_with_updated_side_and_edges(side, new_tokens, edges)
+        edges_added = {}
+        if new_edge_ids:
+            e = edge(list(new_edge_ids), list(new_edge_labels), manual=new_edge_manual)
+            edges[e.id] = edges_added[e.id] = e
+            for id_ in e.ids:
+                token_edges[id_] = e
+
+        stage.count("tokens_removed", len(removed))
+        stage.count("tokens_inserted", len(tokens))
+        stage.count("edges_removed", len(edges_removed))
+
+    return _with_step(
+        g.copy_with_updated_side_and_edges(
+            side,
+            new_tokens,
+            edges,
+            next_free_id=id_offset + len(tokens),
+            token_edges=token_edges,
+        ),
+        g,
+        edges_removed,
+        edges_added,
+        side,
+        from_,
+        removed,
+        tokens,
+    )
 
 
 def unaligned_rearrange(g: Graph, begin: int, end: int, dest: int) -> Graph:
@@ -463,12 +1793,20 @@ def unaligned_rearrange(g: Graph, begin: int, end: int, dest: int) -> Graph:
 
     Indexes are token offsets
     """  # noqa: E501
-    em = edge_map(g)
-    edge_ids_to_update = {em[t.id].id for t in g.target[begin : (end + 1)]}
-    new_edges = {}
-    new_edges.update(g.edges)
-    for id_ in edge_ids_to_update:
-        new_edges[id_] = merge_edges(g.edges[id_], edge([], [], manual=True))
+    em = _checked_edge_index(g, (t.id for t in g.target[begin : (end + 1)]))
+    edges_to_update = _keyed(g, (em[t.id] for t in g.target[begin : (end + 1)]))
+    new_edges = g.edges.copy()
+    token_edges = em.copy()
+    for k, old in edges_to_update.items():
+        e = new_edges[k] = merge_edges(old, edge([], [], manual=True))
+        for tok_id in e.ids:
+            token_edges[tok_id] = e
+    target = lists.rearrange(list(g.target), begin, end, dest)
     return g.copy_with_updated_side_and_edges(
-        Side.target, lists.rearrange(g.target, begin, end, dest), new_edges
+        Side.target,
+        text_token.TokenSequence.from_tokens(target)
+        if isinstance(g.target, text_token.TokenSequence)
+        else target,
+        new_edges,
+        token_edges=token_edges,
     )
@@ -0,0 +1,301 @@
+"""Undo and redo for graph edits, stored as compact deltas."""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from parallel_corpus import shared
+from parallel_corpus.graph import (
+    Edge,
+    Edges,
+    Graph,
+    edge_index,
+    edit_steps,
+    next_id,
+    with_derived,
+)
+from parallel_corpus.source_target import Side
+from parallel_corpus.text_token import Token, TokenSequence
+
+__all__ = ["Delta", "History", "Splice"]
+
+# default number of edits that can be undone
+MAX_UNDO = 1000
+# default number of edits between the full graphs kept by `History`
+CHECKPOINT_EVERY = 50
+
+
+@dataclass(frozen=True, **shared.DATACLASS_SLOTS)
+class Splice:
+    """Replace `removed` at `start` of a token list with `inserted`."""
+
+    start: int
+    removed: tuple[Token, ...]
+    inserted: tuple[Token, ...]
+
+    def apply(self, tokens: Sequence[Token]) -> Sequence[Token]:  # noqa: D102
+        if not self.removed and not self.inserted:
+            return tokens
+        if isinstance(tokens, TokenSequence):
+            return tokens.splice(self.start, len(self.removed), self.inserted)[0]
+        out = list(tokens[: self.start])
+        out.extend(self.inserted)
+        out.extend(tokens[self.start + len(self.removed) :])
+        return out
+
+    def inverse(self) -> "Splice":  # noqa: D102
+        return Splice(self.start, self.inserted, self.removed)
+
+
+@dataclass(frozen=True, **shared.DATACLASS_SLOTS)
+class Delta:
+    """The difference between two versions of a graph.
+
+    Only the changed tokens and edges are kept, the tokens and edges themselves
+    are shared with the graphs. Each side is changed by its splices one after the
+    other, and the edges are by their keys in `Graph.edges`.
+    """
+
+    source: tuple[Splice, ...]
+    target: tuple[Splice, ...]
+    edges_removed: Edges
+    edges_added: Edges
+    comment: tuple[Optional[str], Optional[str]]
+    next_free_id: tuple[int, int]
+    approximate: tuple[bool, bool]
+
+    @classmethod
+    def between(cls, before: Graph, after: Graph) -> "Delta":
+        """Find the delta that turns `before` into `after`.
+
+        When `after` was made from `before` by the edits in `graph`, the delta is
+        put together from what they changed, see `graph.edit_steps`, in time
+        proportional to the size of the edits. Otherwise all tokens and edges are
+        compared, by value, so realigning a graph only records the edges that
+        actually changed.
+
+        >>> from parallel_corpus import graph
+        >>> g = graph.init('a b c')
+        >>> d = Delta.between(g, graph.modify(g, 2, 3, 'x'))
+        >>> [([t.text for t in s.removed], [t.text for t in s.inserted]) for s in d.target]
+        [(['b '], ['x '])]
+        >>> sorted(d.edges_removed), sorted(d.edges_added)
+        (['e-s1-t1'], ['e-s1', 'e-t3'])
+        """
+        steps = edit_steps(after, before)
+        if steps is None:
+            source = _splices(before.source, after.source)
+            target = _splices(before.target, after.target)
+            edges_removed = {
+                k: e for k, e in before.edges.items() if not _same(e, after.edges.get(k))
+            }
+            edges_added = {
+                k: e for k, e in after.edges.items() if not _same(e, before.edges.get(k))
+            }
+        else:
+            splices: dict[Side, list[Splice]] = {Side.source: [], Side.target: []}
+            edges_removed, edges_added = {}, {}
+            for step in steps:
+                if step.removed or step.inserted:
+                    splices[step.side].append(Splice(step.start, step.removed, step.inserted))
+                for k, e in step.edges_removed.items():
+                    # an edge that this delta added is simply not added
+                    if edges_added.pop(k, None) is None:
+                        edges_removed[k] = e
+                for k, e in step.edges_added.items():
+                    if k in edges_removed and _same(edges_removed[k], e):
+                        del edges_removed[k]
+                    else:
+                        edges_added[k] = e
+            source, target = tuple(splices[Side.source]), tuple(splices[Side.target])
+        return cls(
+            source=source,
+            target=target,
+            edges_removed=edges_removed,
+            edges_added=edges_added,
+            comment=(before.comment, after.comment),
+            next_free_id=(next_id(before), next_id(after)),
+            approximate=(before.approximate, after.approximate),
+        )
+
+    def apply(self, g: Graph) -> Graph:
+        """Turn the `before` graph of this delta into the `after` graph.
+
+        Copies the token lists and the edges of `g`, and otherwise takes time in
+        proportion to the size of the delta.
+        """
+        edges = dict(g.edges)
+        token_edges = None if g.token_edges is None else dict(edge_index(g))
+        for k, e in self.edges_removed.items():
+            del edges[k]
+            if token_edges is not None:
+                for id_ in e.ids:
+                    token_edges.pop(id_, None)
+        for k, e in self.edges_added.items():
+            edges[k] = e
+            if token_edges is not None:
+                for id_ in e.ids:
+                    token_edges[id_] = e
+        source, target = g.source, g.target
+        for splice in self.source:
+            source = splice.apply(source)
+        for splice in self.target:
+            target = splice.apply(target)
+        return with_derived(
+            Graph(
+                source=source,
+                target=target,
+                edges=edges,
+                comment=self.comment[1],
+                approximate=self.approximate[1],
+            ),
+            next_free_id=self.next_free_id[1],
+            token_edges=token_edges,
+        )
+
+    def inverse(self) -> "Delta":  # noqa: D102
+        return Delta(
+            source=tuple(s.inverse() for s in reversed(self.source)),
+            target=tuple(s.inverse() for s in reversed(self.target)),
+            edges_removed=self.edges_added,
+            edges_added=self.edges_removed,
+            comment=self.comment[::-1],
+            next_free_id=self.next_free_id[::-1],
+            approximate=self.approximate[::-1],
+        )
+
+
+def _same(a: Union[Edge, Token], b: Union[Edge, Token, None]) -> bool:
+    return a is b or a == b
+
+
+def _splices(before: Sequence[Token], after: Sequence[Token]) -> tuple[Splice, ...]:
+    if before is after:
+        return ()
+    n = min(len(before), len(after))
+    start = 0
+    while start < n and _same(before[start], after[start]):
+        start += 1
+    end = 0
+    while end < n - start and _same(before[-1 - end], after[-1 - end]):
+        end += 1
+    if start == len(before) == len(after):
+        return ()
+    return (
+        Splice(
+            start,
+            tuple(before[start : len(before) - end]),
+            tuple(after[start : len(after) - end]),
+        ),
+    )
+
+
+class History:
+    """Undo and redo for a graph that is edited.
+
+    Every version of the graph after the first is stored as the `Delta` from the
+    version before it, which takes memory in proportion to the size of the edit.
+    Pushing a graph that was made from the current version by the edits in `graph`
+    takes time in proportion to the size of the edit as well, other graphs are
+    compared token by token and edge by edge, see `Delta.between`. Undo and redo
+    copy the token lists and edges of the graph, see `Delta.apply`. Every
+    `checkpoint_every` versions the full graph is kept as well, which bounds the
+    number of deltas `goto` has to replay. At most `max_undo` edits are kept, the
+    oldest ones are forgotten first.
+
+    >>> from parallel_corpus import graph
+    >>> h = History(graph.init('a b'))
+    >>> g = h.push(graph.modify(h.graph, 0, 1, 'x'))
+    >>> graph.target_text(h.undo()), graph.target_text(h.redo())
+    ('a b ', 'x b ')
+    """
+
+    def __init__(  # noqa: D107
+        self,
+        g: Graph,
+        *,
+        max_undo: int = MAX_UNDO,
+        checkpoint_every: int = CHECKPOINT_EVERY,
+    ) -> None:
+        if max_undo < 0:
+            raise ValueError(f"max_undo must be at least 0, got {max_undo}")
+        if checkpoint_every < 1:
+            raise ValueError(f"checkpoint_every must be at least 1, got {checkpoint_every}")
+        self.max_undo = max_undo
+        self.checkpoint_every = checkpoint_every
+        self._graph = g
+        # _deltas[i] turns version _first + i into version _first + i + 1
+        self._deltas: list[Delta] = []
+        self._first = 0
+        self._version = 0
+        self._checkpoints: dict[int, Graph] = {0: g}
+
+    @property
+    def graph(self) -> Graph:
+        """The current version of the graph."""
+        return self._graph
+
+    @property
+    def version(self) -> int:
+        """The number of the current version, the first graph is version 0."""
+        return self._version
+
+    @property
+    def versions(self) -> range:
+        """The versions that can be reached with `goto`."""
+        return range(self._first, self._first + len(self._deltas) + 1)
+
+    @property
+    def can_undo(self) -> bool:  # noqa: D102
+        return self._version > self._first
+
+    @property
+    def can_redo(self) -> bool:  # noqa: D102
+        return self._version < self.versions.stop - 1
+
+    def push(self, g: Graph) -> Graph:
+        """Make `g` the current version, forgetting the versions that could be redone."""
+        del self._deltas[self._version - self._first :]
+        self._checkpoints = {v: c for v, c in self._checkpoints.items() if v <= self._version}
+        self._deltas.append(Delta.between(self._graph, g))
+        self._version += 1
+        self._graph = g
+        if self._version % self.checkpoint_every == 0:
+            self._checkpoints[self._version] = g
+        excess = len(self._deltas) - self.max_undo
+        if excess > 0:
+            del self._deltas[:excess]
+            self._first += excess
+            self._checkpoints = {v: c for v, c in self._checkpoints.items() if v >= self._first}
+        return g
+
+    def undo(self) -> Graph:
+        """Go back to the previous version."""
+        if not self.can_undo:
+            raise ValueError("Nothing to undo")
+        return self.goto(self._version - 1)
+
+    def redo(self) -> Graph:
+        """Go forward to the version that was undone last."""
+        if not self.can_redo:
+            raise ValueError("Nothing to redo")
+        return self.goto(self._version + 1)
+
+    def goto(self, version: int) -> Graph:
+        """Go to any version in `versions`.
+
+        Starts from the current version or from the nearest checkpoint, whichever
+        is closer, and replays the deltas from there.
+        """
+        if version not in self.versions:
+            raise ValueError(f"Version {version} not in {self.versions}")
+        start, g = self._version, self._graph
+        for v, checkpoint in self._checkpoints.items():
+            if abs(version - v) < abs(version - start):
+                start, g = v, checkpoint
+        for v in range(start, version):
+            g = self._deltas[v - self._first].apply(g)
+        for v in range(start, version, -1):
+            g = self._deltas[v - 1 - self._first].inverse().apply(g)
+        self._version, self._graph = version, g
+        return g
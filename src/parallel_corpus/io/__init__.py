@@ -0,0 +1,6 @@
+"""Reading and writing corpora of graphs."""
+
+from parallel_corpus.io.binary import BinaryCorpus, write_binary
+from parallel_corpus.io.jsonl import dumps, iter_graphs, loads, write_graphs
+
+__all__ = ["BinaryCorpus", "dumps", "iter_graphs", "loads", "write_binary", "write_graphs"]
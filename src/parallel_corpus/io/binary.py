@@ -0,0 +1,358 @@
+"""Compact binary corpus of graphs with random access.
+
+Layout, all integers little-endian:
+
+- the magic bytes `MAGIC`,
+- one block per graph, see `_encode_graph`,
+- the footer: the offsets of the blocks, the interned strings and the keys,
+- the offset of the footer (u64) and `MAGIC` again.
+
+Token texts are stored per graph as one UTF-8 blob with offsets. Token ids,
+labels, comments and keys are interned in one vocabulary for the whole corpus.
+Edges refer to tokens by their index in the graph. A reader maps the file into
+memory and only decodes the graphs that are asked for.
+"""
+
+import array
+import mmap
+import struct
+import sys
+from collections.abc import Iterable, Iterator, Sequence
+from pathlib import Path
+from types import TracebackType
+from typing import Optional, Union, overload
+
+from typing_extensions import Self
+
+from parallel_corpus.graph import Edge, Graph
+from parallel_corpus.io.jsonl import PathLike
+from parallel_corpus.text_token import Token
+
+MAGIC = b"PCGRAPH1"
+
+_GRAPH_HEADER = struct.Struct("<IIIIIB")
+_FOOTER_HEADER = struct.Struct("<QB")
+_TRAILER = struct.Struct(f"<Q{len(MAGIC)}s")
+
+_GRAPH_HAS_COMMENT = 1
+_GRAPH_APPROXIMATE = 2
+_EDGE_MANUAL = 1
+_EDGE_HAS_COMMENT = 2
+_EDGE_CUSTOM_ID = 4
+
+
+def _u32(xs: Iterable[int]) -> bytes:
+    return _to_bytes(array.array("I", xs))
+
+
+def _to_bytes(a: array.array) -> bytes:
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a.tobytes()
+
+
+def _from_bytes(typecode: str, data: Union[bytes, memoryview]) -> array.array:
+    a = array.array(typecode)
+    a.frombytes(data)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a
+
+
+class _Vocabulary:
+    def __init__(self) -> None:
+        self.index: dict[str, int] = {}
+
+    def __call__(self, s: str) -> int:
+        i = self.index.get(s)
+        if i is None:
+            i = self.index[s] = len(self.index)
+        return i
+
+    def encode(self) -> bytes:
+        blobs = [s.encode("utf-8") for s in self.index]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        return struct.pack("<Q", len(blobs)) + _u32(offsets) + b"".join(blobs)
+
+
+def _encode_graph(g: Graph, intern: _Vocabulary) -> bytes:
+    """Encode a graph as a block.
+
+    - header: number of source tokens, target tokens and edges, length of the
+      text blob, `next_free_id` plus one (0 if unknown) and flags (has comment,
+      approximate), followed by
+      the comment if the graph has one,
+    - token text offsets in characters (u32, one more than the tokens) and token ids (u32),
+    - edge flags (u8), edge token offsets (u32) and edge tokens (u32): an index
+      of a token, or if an id is not a token in the graph, the number of
+      tokens plus the interned id,
+    - edge label offsets (u32) and labels (u32),
+    - extras (u32) for the edges with flags: key and id if they are not
+      `e-` followed by the token ids, and then the comment,
+    - the text blob.
+    """
+    tokens = [*g.source, *g.target]
+    positions = {t.id: i for i, t in enumerate(tokens)}
+    text_offsets = [0]
+    for t in tokens:
+        text_offsets.append(text_offsets[-1] + len(t.text))
+    edge_flags = bytearray()
+    ids_offsets, ids = [0], array.array("I")
+    labels_offsets, labels = [0], array.array("I")
+    extras = array.array("I")
+    for key, e in g.edges.items():
+        flags = _EDGE_MANUAL if e.manual else 0
+        ids.extend(positions.get(id_, len(tokens) + intern(id_)) for id_ in e.ids)
+        ids_offsets.append(len(ids))
+        labels.extend(map(intern, e.labels))
+        labels_offsets.append(len(labels))
+        if key != e.id or e.id != f"e-{'-'.join(e.ids)}":
+            flags |= _EDGE_CUSTOM_ID
+            extras.extend((intern(key), intern(e.id)))
+        if e.comment is not None:
+            flags |= _EDGE_HAS_COMMENT
+            extras.append(intern(e.comment))
+        edge_flags.append(flags)
+    text_blob = "".join(t.text for t in tokens).encode("utf-8")
+    header = _GRAPH_HEADER.pack(
+        len(g.source),
+        len(g.target),
+        len(g.edges),
+        len(text_blob),
+        0 if g.next_free_id is None else g.next_free_id + 1,
+        (_GRAPH_HAS_COMMENT if g.comment is not None else 0)
+        | (_GRAPH_APPROXIMATE if g.approximate else 0),
+    )
+    return b"".join(
+        (
+            header,
+            b"" if g.comment is None else _u32([intern(g.comment)]),
+            _u32(text_offsets),
+            _u32(intern(t.id) for t in tokens),
+            bytes(edge_flags),
+            _u32(ids_offsets),
+            _u32(ids),
+            _u32(labels_offsets),
+            _u32(labels),
+            _u32(extras),
+            text_blob,
+        )
+    )
+
+
+def write_binary(
+    path: PathLike, graphs: Iterable[Graph], *, keys: Optional[Iterable[str]] = None
+) -> int:
+    """Write graphs to a binary corpus file, consuming `graphs` lazily.
+
+    Args:
+        path: the file to write, it is overwritten.
+        graphs: the graphs to write.
+        keys: optional unique keys for the graphs, to look them up by with `BinaryCorpus.get`.
+
+    Returns:
+        int: the number of graphs written.
+    """
+    intern = _Vocabulary()
+    offsets = []
+    key_ids = []
+    keys_iter = iter(keys) if keys is not None else None
+    with Path(path).open("wb") as fp:
+        fp.write(MAGIC)
+        offset = len(MAGIC)
+        for g in graphs:
+            if keys_iter is not None:
+                key = next(keys_iter, None)
+                if key is None:
+                    raise ValueError("fewer keys than graphs")
+                key_ids.append(intern(key))
+            block = _encode_graph(g, intern)
+            offsets.append(offset)
+            fp.write(block)
+            offset += len(block)
+        if keys_iter is not None and next(keys_iter, None) is not None:
+            raise ValueError("more keys than graphs")
+        offsets.append(offset)
+        fp.write(_FOOTER_HEADER.pack(len(offsets) - 1, keys is not None))
+        fp.write(_to_bytes(array.array("Q", offsets)))
+        fp.write(_u32(key_ids))
+        fp.write(intern.encode())
+        fp.write(_TRAILER.pack(offset, MAGIC))
+    return len(offsets) - 1
+
+
+class BinaryCorpus(Sequence[Graph]):
+    """Read-only random access to a corpus written by `write_binary`.
+
+    The file is memory-mapped, indexing decodes a single graph.
+
+    >>> import tempfile, os
+    >>> from parallel_corpus import graph
+    >>> path = os.path.join(tempfile.mkdtemp(), 'corpus.bin')
+    >>> write_binary(path, [graph.init('a'), graph.init('b c')], keys=['first', 'second'])
+    2
+    >>> with BinaryCorpus(path) as corpus:
+    ...     len(corpus), corpus[1] == graph.init('b c'), corpus.get('first') == graph.init('a')
+    (2, True, True)
+    """
+
+    def __init__(self, path: PathLike) -> None:  # noqa: D107
+        with Path(path).open("rb") as fp:
+            self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._mmap)
+        if self._buf[: len(MAGIC)] != MAGIC or len(self._buf) < len(MAGIC) + _TRAILER.size:
+            self.close()
+            raise ValueError(f"not a binary corpus: {path}")
+        footer, magic = _TRAILER.unpack_from(self._buf, len(self._buf) - _TRAILER.size)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"truncated binary corpus: {path}")
+        n, has_keys = _FOOTER_HEADER.unpack_from(self._buf, footer)
+        pos = footer + _FOOTER_HEADER.size
+        self._offsets = _from_bytes("Q", self._buf[pos : pos + 8 * (n + 1)])
+        pos += 8 * (n + 1)
+        n_keys = n if has_keys else 0
+        self._keys = _from_bytes("I", self._buf[pos : pos + 4 * n_keys])
+        pos += 4 * n_keys
+        (n_strings,) = struct.unpack_from("<Q", self._buf, pos)
+        pos += 8
+        self._string_offsets = _from_bytes("I", self._buf[pos : pos + 4 * (n_strings + 1)])
+        self._strings_start = pos + 4 * (n_strings + 1)
+        self._strings: list[Optional[str]] = [None] * n_strings
+        self._key_index: Optional[dict[str, int]] = None
+        self._has_keys = bool(has_keys)
+
+    def close(self) -> None:
+        """Close the memory map."""
+        self._buf.release()
+        self._mmap.close()
+
+    def __enter__(self) -> Self:  # noqa: D105
+        return self
+
+    def __exit__(  # noqa: D105
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._offsets) - 1
+
+    @overload
+    def __getitem__(self, i: int) -> Graph: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[Graph]: ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Graph, list[Graph]]:  # noqa: D105
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"graph index out of range: {i}")
+        return self._decode_graph(self._offsets[i])
+
+    def __iter__(self) -> Iterator[Graph]:  # noqa: D105
+        for i in range(len(self)):
+            yield self._decode_graph(self._offsets[i])
+
+    def keys(self) -> list[str]:
+        """Return the keys of the graphs in order, empty if written without keys."""
+        return [self._string(k) for k in self._keys]
+
+    def index_of(self, key: str) -> int:
+        """Return the position of the graph with the given key."""
+        if self._key_index is None:
+            self._key_index = {k: i for i, k in enumerate(self.keys())}
+        if key not in self._key_index:
+            raise KeyError(key)
+        return self._key_index[key]
+
+    def get(self, key: str) -> Graph:
+        """Return the graph with the given key."""
+        return self[self.index_of(key)]
+
+    def _string(self, i: int) -> str:
+        s = self._strings[i]
+        if s is None:
+            start = self._strings_start + self._string_offsets[i]
+            end = self._strings_start + self._string_offsets[i + 1]
+            s = self._strings[i] = str(self._buf[start:end], "utf-8")
+        return s
+
+    def _decode_graph(self, pos: int) -> Graph:
+        buf = self._buf
+        n_source, n_target, n_edges, text_len, next_free_id, flags = _GRAPH_HEADER.unpack_from(
+            buf, pos
+        )
+        pos += _GRAPH_HEADER.size
+        n_tokens = n_source + n_target
+
+        def u32s(n: int) -> array.array:
+            nonlocal pos
+            a = _from_bytes("I", buf[pos : pos + 4 * n])
+            pos += 4 * n
+            return a
+
+        comment = self._string(u32s(1)[0]) if flags & _GRAPH_HAS_COMMENT else None
+        text_offsets = u32s(n_tokens + 1)
+        token_ids = u32s(n_tokens)
+        edge_flags = bytes(buf[pos : pos + n_edges])
+        pos += n_edges
+        ids_offsets = u32s(n_edges + 1)
+        ids = u32s(ids_offsets[-1])
+        labels_offsets = u32s(n_edges + 1)
+        labels = u32s(labels_offsets[-1])
+        n_extras = sum(
+            2 * bool(f & _EDGE_CUSTOM_ID) + bool(f & _EDGE_HAS_COMMENT) for f in edge_flags
+        )
+        extras = u32s(n_extras)
+        text = str(buf[pos : pos + text_len], "utf-8")
+        string = self._string
+        tok_ids = [string(i) for i in token_ids]
+        tokens = [
+            Token(text=text[text_offsets[i] : text_offsets[i + 1]], id=tok_ids[i])
+            for i in range(n_tokens)
+        ]
+
+        edges = {}
+        extra = 0
+        for k in range(n_edges):
+            f = edge_flags[k]
+            e_ids = [
+                tok_ids[x] if x < n_tokens else string(x - n_tokens)
+                for x in ids[ids_offsets[k] : ids_offsets[k + 1]]
+            ]
+            if f & _EDGE_CUSTOM_ID:
+                key, id_ = string(extras[extra]), string(extras[extra + 1])
+                extra += 2
+            else:
+                key = id_ = f"e-{'-'.join(e_ids)}"
+            e_comment = None
+            if f & _EDGE_HAS_COMMENT:
+                e_comment = string(extras[extra])
+                extra += 1
+            label_start, label_end = labels_offsets[k], labels_offsets[k + 1]
+            edges[key] = Edge(
+                id=id_,
+                ids=e_ids,
+                labels=[string(x) for x in labels[label_start:label_end]]
+                if label_start < label_end
+                else [],
+                manual=bool(f & _EDGE_MANUAL),
+                comment=e_comment,
+            )
+        return Graph(
+            source=tokens[:n_source],
+            target=tokens[n_source:],
+            edges=edges,
+            comment=comment,
+            next_free_id=next_free_id - 1 if next_free_id else None,
+            approximate=bool(flags & _GRAPH_APPROXIMATE),
+        )
@@ -0,0 +1,188 @@
+"""Graphs as JSON Lines, one graph per line."""
+
+import contextlib
+import gzip
+import json
+import os
+import sys
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import IO, Any, Optional, Union
+
+from parallel_corpus.graph import Edge, Graph
+from parallel_corpus.text_token import Token
+
+PathLike = Union[str, "os.PathLike[str]"]
+
+# number of lines written at a time
+WRITE_BATCH = 1024
+
+
+def graph_to_dict(g: Graph) -> dict[str, Any]:
+    """Convert a graph to a JSON-compatible dict, in the shape of `dataclasses.asdict`.
+
+    `approximate` is only included when it is set.
+
+    >>> from parallel_corpus import graph
+    >>> graph_to_dict(graph.init('a'))
+    {'source': [{'text': 'a ', 'id': 's0'}], 'target': [{'text': 'a ', 'id': 't0'}], \
+'edges': {'e-s0-t0': {'id': 'e-s0-t0', 'ids': ['s0', 't0'], 'labels': [], 'manual': False, \
+'comment': None}}, 'comment': None, 'next_free_id': 1}
+    """
+    d = {
+        "source": [{"text": t.text, "id": t.id} for t in g.source],
+        "target": [{"text": t.text, "id": t.id} for t in g.target],
+        "edges": {
+            k: {
+                "id": e.id,
+                "ids": e.ids,
+                "labels": e.labels,
+                "manual": e.manual,
+                "comment": e.comment,
+            }
+            for k, e in g.edges.items()
+        },
+        "comment": g.comment,
+        "next_free_id": g.next_free_id,
+    }
+    if g.approximate:
+        d["approximate"] = True
+    return d
+
+
+def graph_from_dict(d: dict[str, Any]) -> Graph:
+    """Convert a dict made by `graph_to_dict` back to a graph.
+
+    Raises:
+        ValueError: if `d` is not in the shape that `graph_to_dict` makes.
+
+    >>> graph_from_dict({'x': 1})
+    Traceback (most recent call last):
+    ...
+    ValueError: not a graph, missing 'source'
+    """
+    if not isinstance(d, dict):
+        raise ValueError(f"not a graph, expected an object, got {type(d).__name__}")
+    try:
+        return _graph_from_dict(d)
+    except KeyError as e:
+        raise ValueError(f"not a graph, missing {e}") from e
+    except (AttributeError, TypeError) as e:
+        raise ValueError(f"not a graph, {e}") from e
+
+
+def _graph_from_dict(d: dict[str, Any]) -> Graph:
+    return Graph(
+        source=[Token(text=t["text"], id=sys.intern(t["id"])) for t in d["source"]],
+        target=[Token(text=t["text"], id=sys.intern(t["id"])) for t in d["target"]],
+        edges={
+            k: Edge(
+                id=e["id"],
+                ids=[sys.intern(id_) for id_ in e["ids"]],
+                labels=[sys.intern(label) for label in e["labels"]],
+                manual=e["manual"],
+                comment=e.get("comment"),
+            )
+            for k, e in d["edges"].items()
+        },
+        comment=d.get("comment"),
+        next_free_id=d.get("next_free_id"),
+        approximate=d.get("approximate", False),
+    )
+
+
+def dumps(g: Graph) -> str:
+    """Serialize a graph to one line of JSON, without the line break."""
+    return json.dumps(graph_to_dict(g), ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(line: str) -> Graph:
+    """Deserialize a graph from a line of JSON.
+
+    Raises:
+        ValueError: if the line is not JSON or not a graph.
+    """
+    return graph_from_dict(json.loads(line))
+
+
+def iter_graphs(path: PathLike, *, compress: Optional[bool] = None) -> Iterator[Graph]:
+    """Read the graphs in a JSON Lines file one at a time.
+
+    Blank lines are skipped.
+
+    Args:
+        path: the file to read.
+        compress: if the file is gzipped, by default if the name ends with `.gz`.
+    """
+    with open_text(path, "r", compress=compress) as fp:
+        yield from read_lines(fp)
+
+
+def read_lines(lines: Iterable[str]) -> Iterator[Graph]:
+    """Read graphs from lines of JSON, skipping blank lines.
+
+    Raises:
+        ValueError: if a line is not a graph, with the number of the line.
+    """
+    for i, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            g = loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {i}: {e}") from e
+        yield g
+
+
+def write_graphs(
+    path: PathLike, graphs: Iterable[Graph], *, compress: Optional[bool] = None
+) -> int:
+    """Write graphs to a JSON Lines file, consuming `graphs` lazily.
+
+    Args:
+        path: the file to write, it is overwritten.
+        graphs: the graphs to write.
+        compress: if the file should be gzipped, by default if the name ends with `.gz`.
+
+    Returns:
+        int: the number of graphs written.
+    """
+    with open_text(path, "w", compress=compress) as fp:
+        return write_lines(fp, graphs)
+
+
+def write_lines(fp: IO[str], graphs: Iterable[Graph]) -> int:
+    """Write graphs to an open text file, one line each, `WRITE_BATCH` lines at a time.
+
+    Returns:
+        int: the number of graphs written.
+    """
+    n = 0
+    batch = []
+    for g in graphs:
+        batch.append(dumps(g) + "\n")
+        if len(batch) == WRITE_BATCH:
+            fp.writelines(batch)
+            n += len(batch)
+            batch.clear()
+    fp.writelines(batch)
+    return n + len(batch)
+
+
+@contextlib.contextmanager
+def open_text(
+    path: PathLike, mode: str, *, compress: Optional[bool] = None
+) -> Iterator[IO[str]]:
+    """Open a file for reading (`"r"`) or writing (`"w"`) text as UTF-8.
+
+    The file is gzipped if `compress`, by default if the name ends with `.gz`.
+    """
+    path = Path(path)
+    if compress is None:
+        compress = path.suffix == ".gz"
+    if compress:
+        with gzip.open(path, f"{mode}t", encoding="utf-8") as fp:
+            yield fp  # type: ignore [misc]
+    else:
+        with path.open(mode, encoding="utf-8") as fp:
+            yield fp
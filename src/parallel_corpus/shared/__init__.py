@@ -1,6 +1,7 @@
 """Utilities."""
 
 import re
+import sys
 from typing import TypeVar
 
 from . import diffs
@@ -10,6 +11,9 @@ __all__ = ["diffs"]
 
 ENDING_WHITESPACE = re.compile(r"\s$")
 
+# keyword arguments to `dataclass` for instances without `__dict__`, `slots` needs python 3.10
+DATACLASS_SLOTS: dict[str, bool] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
 
 def end_with_space(s: str) -> str:
     if not s:
@@ -1,17 +1,23 @@
 """Diffs."""
 
+import bisect
+import difflib
 import enum
-from collections.abc import Generator
-from itertools import starmap
-from typing import Any, Callable, Generic, Optional, TypeVar, Union
+import sys
+import time
+from collections.abc import Generator, Hashable, Sequence
+from typing import Any, Callable, Generic, NamedTuple, Optional, TypeVar, Union
 
 import diff_match_patch as dmp_module
 from typing_extensions import Self
 
-from parallel_corpus.shared.str_map import str_map
-
 dmp = dmp_module.diff_match_patch()
 
+SURROGATES_START = 0xD800
+SURROGATES_COUNT = 0x800
+# number of unique elements that can be diffed through diff-match-patch
+MAX_SYMBOLS = sys.maxunicode + 1 - SURROGATES_COUNT
+
 A = TypeVar("A")
 B = TypeVar("B")
 C = TypeVar("C")
@@ -24,6 +30,8 @@ class ChangeType(enum.IntEnum):  # noqa: D101
 
 
 class Change(Generic[A, B]):  # noqa: D101
+    __slots__ = ("a", "b", "change")
+
     def __init__(self, change: ChangeType, a: Optional[A] = None, b: Optional[B] = None) -> None:  # noqa: D107
         if change == ChangeType.DELETED and a is None:
             raise ValueError("`a` must be given for DELETED")
@@ -72,14 +80,27 @@ class Change(Generic[A, B]):  # noqa: D101
         return f"Change(change={self.change},a={self.a},b={self.b})"
 
 
+class Opcode(NamedTuple):
+    """A run of changes between `xs[a_start:a_end]` and `ys[b_start:b_end]`.
+
+    For CONSTANT both runs have the same length, for DELETED the run in `ys`
+    is empty and for INSERTED the run in `xs` is empty.
+    """
+
+    change: ChangeType
+    a_start: int
+    a_end: int
+    b_start: int
+    b_end: int
+
+
 def char_stream() -> Generator[str, None, None]:
-    """Make a stream of all unicode characters.
+    """Make a stream of all unicode characters, skipping the surrogates.
 
     We need this because the diff-match-patch library is hard-coded to work on characters.
 
     To make a polymorphic diff each unique element is assigned a unique character.
-    We translate them back to the opaque type after diffing via the characters.
-    This is used in `hdiff`.
+    This is used in `int_diff`.
 
     >>> chars = char_stream()
     >>> assert ord(next(chars)) == 0
@@ -89,66 +110,212 @@ def char_stream() -> Generator[str, None, None]:
 
     """
     i = 0
-    while True:
-        yield chr(int(str(i), base=16))
+    while i < MAX_SYMBOLS:
+        yield symbol(i)
         i += 1
 
 
+def symbol(i: int) -> str:
+    """Return the character for the `i`th unique element.
+
+    >>> hex(ord(symbol(0xD7FF))), hex(ord(symbol(0xD800)))
+    ('0xd7ff', '0xe000')
+    """
+    return chr(i if i < SURROGATES_START else i + SURROGATES_COUNT)
+
+
+def int_diff(
+    xs: Sequence[Hashable], ys: Sequence[Hashable], *, deadline: Optional[float] = None
+) -> list[Opcode]:
+    """Diff two sequences of integers, or of any other hashable elements.
+
+    The `deadline` is as for `char_diff`. Falls back to `difflib`, which has no
+    deadline, when there are more than `MAX_SYMBOLS` unique elements.
+
+    >>> for op in int_diff([1, 2, 3, 3, 1], [2, 1, 3, 3]):
+    ...     print(op.change.name, op[1:])
+    DELETED (0, 1, 0, 0)
+    CONSTANT (1, 2, 0, 1)
+    INSERTED (2, 2, 1, 2)
+    CONSTANT (2, 4, 2, 4)
+    DELETED (4, 5, 4, 4)
+    """
+    codes: dict[Hashable, str] = {}
+
+    def encode(zs: Sequence[Hashable]) -> Optional[str]:
+        out = []
+        for z in zs:
+            c = codes.get(z)
+            if c is None:
+                if len(codes) == MAX_SYMBOLS:
+                    return None
+                c = codes[z] = symbol(len(codes))
+            out.append(c)
+        return "".join(out)
+
+    s1 = encode(xs)
+    s2 = None if s1 is None else encode(ys)
+    if s1 is None or s2 is None:
+        return _difflib_diff(xs, ys)
+    return char_diff(s1, s2, deadline=deadline)
+
+
+def char_diff(s1: str, s2: str, *, deadline: Optional[float] = None) -> list[Opcode]:
+    """Diff two strings character by character.
+
+    If `deadline` (in the sense of `time.time`) passes during the diff, the parts
+    that are not done yet are reported as deleted and inserted as a whole. Without
+    a `deadline` the timeout of diff-match-patch applies, one second by default.
+
+    >>> s1, s2 = 'abcca', 'bacc'
+    >>> for op in char_diff(s1, s2):
+    ...     print(op.change.name, repr(s1[op.a_start:op.a_end]), repr(s2[op.b_start:op.b_end]))
+    DELETED 'a' ''
+    CONSTANT 'b' 'b'
+    INSERTED '' 'a'
+    CONSTANT 'cc' 'cc'
+    DELETED 'a' ''
+    """
+    return opcodes(dmp.diff_main(s1, s2, False, deadline))
+
+
+def timed_char_diff(
+    s1: str, s2: str, *, deadline: Optional[float] = None
+) -> tuple[list[Opcode], bool]:
+    """Diff two strings as `char_diff` does, and tell whether the deadline cut the diff short.
+
+    A diff that finishes in time is not reported as cut short, even if the
+    deadline has passed when it returns.
+
+    >>> timed_char_diff('ab', 'axb', deadline=0)[1]
+    False
+    >>> timed_char_diff('abc', 'bca', deadline=0)[1]
+    True
+    """
+    timed = _TimedDiffMatchPatch()
+    return opcodes(timed.diff_main(s1, s2, False, deadline)), timed.cut_off
+
+
+class _TimedDiffMatchPatch(dmp_module.diff_match_patch):
+    """Notes when the bisection of diff-match-patch gives up at the deadline."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.cut_off = False
+
+    def diff_bisect(self, text1: str, text2: str, deadline: float) -> list[tuple[int, str]]:
+        d = super().diff_bisect(text1, text2, deadline)
+        # giving up deletes and inserts everything, otherwise only done for texts
+        # that have no characters in common, where nothing is lost
+        if time.time() > deadline and d == [(dmp.DIFF_DELETE, text1), (dmp.DIFF_INSERT, text2)]:
+            self.cut_off = True
+        return d
+
+
+def opcodes(d: list[tuple[int, str]]) -> list[Opcode]:
+    """Convert a diff from diff-match-patch to opcodes."""
+    out = []
+    i = j = 0
+    for change, chars in d:
+        n = len(chars)
+        if change == ChangeType.CONSTANT:
+            out.append(Opcode(ChangeType.CONSTANT, i, i + n, j, j + n))
+            i += n
+            j += n
+        elif change == ChangeType.DELETED:
+            out.append(Opcode(ChangeType.DELETED, i, i + n, j, j))
+            i += n
+        elif change == ChangeType.INSERTED:
+            out.append(Opcode(ChangeType.INSERTED, i, i, j, j + n))
+            j += n
+        else:
+            raise RuntimeError("diff-match-patch change not in range [-1,1]")
+    return out
+
+
+def unique_anchors(xs: Sequence[Hashable], ys: Sequence[Hashable]) -> list[tuple[int, int]]:
+    """Pair the elements that occur exactly once in both sequences, in the same order.
+
+    Of the elements that are unique in both, a longest subsequence that is in the
+    same order in both is kept, as in patience diff. Takes O(n log n) time.
+
+    >>> unique_anchors('abcxd', 'bacdx')
+    [(0, 1), (2, 2), (3, 4)]
+    """
+    counts: dict[Hashable, list[int]] = {}
+    for i, x in enumerate(xs):
+        # occurrences in xs, occurrences in ys and the first position in xs
+        counts.setdefault(x, [0, 0, i])[0] += 1
+    candidates = []
+    for j, y in enumerate(ys):
+        c = counts.get(y)
+        if c is not None:
+            c[1] += 1
+            if c[1] == 1:
+                candidates.append((c[2], j))
+    pairs = [(i, j) for i, j in candidates if counts[xs[i]][0] == 1 and counts[xs[i]][1] == 1]
+    # longest increasing subsequence of the positions in xs, pairs are sorted on ys
+    tails: list[int] = []
+    tail_pairs: list[int] = []
+    previous = [-1] * len(pairs)
+    for k, (i, _) in enumerate(pairs):
+        n = bisect.bisect_left(tails, i)
+        if n == len(tails):
+            tails.append(i)
+            tail_pairs.append(k)
+        else:
+            tails[n] = i
+            tail_pairs[n] = k
+        previous[k] = tail_pairs[n - 1] if n > 0 else -1
+    out = []
+    k = tail_pairs[-1] if tail_pairs else -1
+    while k >= 0:
+        out.append(pairs[k])
+        k = previous[k]
+    return out[::-1]
+
+
+def _difflib_diff(xs: Sequence[Hashable], ys: Sequence[Hashable]) -> list[Opcode]:
+    out = []
+    matcher = difflib.SequenceMatcher(None, xs, ys, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            out.append(Opcode(ChangeType.CONSTANT, i1, i2, j1, j2))
+            continue
+        if i1 < i2:
+            out.append(Opcode(ChangeType.DELETED, i1, i2, j1, j1))
+        if j1 < j2:
+            out.append(Opcode(ChangeType.INSERTED, i2, i2, j1, j2))
+    return out
+
+
 def hdiff(  # noqa: D103
     xs: list[A],
     ys: list[B],
     a_cmp: Callable[[A], str] = str,
     b_cmp: Callable[[B], str] = str,
 ) -> list[Change[A, B]]:
-    to: dict[str, str] = {}
-    a_from: dict[str, list[A]] = {}
-    b_from: dict[str, list[B]] = {}
-    chars = char_stream()
-
-    def assign(c: C, c_cmp: Callable[[C], str], c_from: dict[str, list[C]]) -> str:
-        s = c_cmp(c)
-        u = to.get(s)
-        if u is None:
-            u = next(chars)
-            to[s] = u
-        arr = c_from.get(u)
-        if not arr:
-            arr = []
-            c_from[u] = arr
-        arr.append(c)
-        return u
-
-    s1 = "".join(assign(a, a_cmp, a_from) for a in xs)
-    s2 = "".join(assign(b, b_cmp, b_from) for b in ys)
-    d = dmp.diff_main(s1, s2)
-
-    def str_map_change(change: int) -> Callable[[str, int], Change]:
-        def inner(c: str, _: int) -> Change:
-            if change == 0:
-                a = a_from.get(c, []).pop(0)
-                b = b_from.get(c, []).pop(0)
-                return Change.constant(a, b)
-            if change == -1:
-                a = a_from.get(c, []).pop(0)
-                return Change.deleted(a)
-            if change == 1:
-                b = b_from.get(c, []).pop(0)
-                return Change.inserted(b)
-            raise RuntimeError("diff-match-patch change not in range [-1,1]")
-
-        return inner
-
-    def map_change(change: int, cs):  # noqa: ANN001, ANN202
-        return str_map(cs, str_map_change(change))
-
-    out = []
-    for changes in starmap(map_change, d):
-        # print(f"{changes=}")
-        out.extend(changes)
+    keys: dict[str, int] = {}
+    a_keys = [keys.setdefault(a_cmp(a), len(keys)) for a in xs]
+    b_keys = [keys.setdefault(b_cmp(b), len(keys)) for b in ys]
+    out: list[Change[A, B]] = []
+    for op in int_diff(a_keys, b_keys):
+        if op.change == ChangeType.CONSTANT:
+            out.extend(
+                map(Change.constant, xs[op.a_start : op.a_end], ys[op.b_start : op.b_end])
+            )
+        elif op.change == ChangeType.DELETED:
+            out.extend(map(Change.deleted, xs[op.a_start : op.a_end]))
+        else:
+            out.extend(map(Change.inserted, ys[op.b_start : op.b_end]))
     return out
 
 
-def token_diff(s1: str, s2: str) -> list[tuple[int, str]]:  # noqa: D103
-    d = dmp.diff_main(s1, s2)
+def token_diff(s1: str, s2: str, *, deadline: Optional[float] = None) -> list[tuple[int, str]]:
+    """Diff two strings with diff-match-patch and clean the diff up for humans.
+
+    The `deadline` is as for `char_diff`.
+    """
+    d = dmp.diff_main(s1, s2, True, deadline)
     dmp.diff_cleanupSemantic(d)
     return d
@@ -1,6 +1,6 @@
 """list."""
 
-import copy
+from collections.abc import Sequence
 from typing import TypeVar
 
 A = TypeVar("A")
@@ -23,8 +23,15 @@ def rearrange(xs: list[A], begin: int, end: int, dest: int) -> list[A]:
     return pre + mid + post
 
 
-def splice(xs: list[A], start: int, count: int, *insert) -> tuple[list[A], list[A]]:  # noqa: ANN002, D103
-    ys = copy.deepcopy(xs)
+def splice(xs: Sequence[A], start: int, count: int, *insert) -> tuple[list[A], list[A]]:  # noqa: ANN002
+    """Replace `count` items from `start` with `insert`, in a copy of `xs`.
+
+    The items are shared with `xs`, not copied.
+
+    Returns:
+        tuple[list[A], list[A]]: the new list and the removed items.
+    """
+    ys = list(xs)
     zs = ys[start : (start + count)]
     ys[start : (start + count)] = insert
     return ys, zs
@@ -0,0 +1,64 @@
+"""A mapping of bounded size that forgets the least recently used entries."""
+
+import collections
+import threading
+from typing import Generic, Optional, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+DEFAULT_MAXSIZE = 1024
+
+
+class LRUCache(Generic[K, V]):
+    """Keep at most `maxsize` entries, dropping the least recently used first.
+
+    Counts hits and misses of `get`. Safe to use from several threads.
+
+    >>> cache = LRUCache(maxsize=2)
+    >>> cache.put('a', 1)
+    >>> cache.put('b', 2)
+    >>> cache.get('a')
+    1
+    >>> cache.put('c', 3)
+    >>> cache.get('b') is None, cache.get('c')
+    (True, 3)
+    >>> cache.hits, cache.misses
+    (2, 1)
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE) -> None:  # noqa: D107
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be positive, got {maxsize}")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: collections.OrderedDict[K, V] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._entries)
+
+    def get(self, key: K) -> Optional[V]:
+        """Return the value of `key` and mark it as used, or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: K, value: V) -> None:  # noqa: D102
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forget all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
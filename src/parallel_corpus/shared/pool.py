@@ -0,0 +1,65 @@
+"""Mapping over a pool of processes."""
+
+import collections
+import concurrent.futures
+import os
+from collections.abc import Iterable, Iterator
+from typing import Callable, Optional, TypeVar
+
+import more_itertools
+
+A = TypeVar("A")
+B = TypeVar("B")
+
+DEFAULT_CHUNKSIZE = 64
+
+
+def ordered_map(
+    f: Callable[[A], B],
+    xs: Iterable[A],
+    *,
+    max_workers: Optional[int] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> Iterator[B]:
+    """Map `f` over `xs` in chunks on a pool of processes, yielding the results in order.
+
+    At most two chunks per worker are in flight at a time, so `xs` is consumed
+    lazily and memory stays bounded for long inputs. `f` must be picklable,
+    i.e. a module-level function or a `functools.partial` of one.
+
+    Args:
+        f: the function to apply.
+        xs: the items to apply it to.
+        max_workers: number of processes, defaults to the number of CPUs.
+            With 1 (and no `executor`) the items are mapped in this process.
+        chunksize: number of items sent to a worker at a time.
+        executor: use this executor instead of creating a process pool.
+
+    >>> list(ordered_map(abs, [-1, 2, -3], max_workers=1))
+    [1, 2, 3]
+    """
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be positive, got {chunksize}")
+    if executor is None and max_workers == 1:
+        yield from map(f, xs)
+        return
+    workers = max_workers or os.cpu_count() or 1
+    pool = executor or concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    pending: collections.deque[concurrent.futures.Future[list[B]]] = collections.deque()
+    try:
+        for chunk in more_itertools.chunked(xs, chunksize):
+            pending.append(pool.submit(_map_chunk, f, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if executor is None:
+            pool.shutdown(wait=True)
+
+
+def _map_chunk(f: Callable[[A], B], chunk: list[A]) -> list[B]:
+    return [f(x) for x in chunk]
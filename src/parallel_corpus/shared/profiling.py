@@ -0,0 +1,119 @@
+"""Opt-in timing of the stages of alignment and editing.
+
+Instrumented code wraps each stage in `stage`, which does nothing unless a hook
+is registered with `add_hook` or a `profile` block is active. Each hook is
+called with a `StageStats` when a stage ends.
+
+>>> from parallel_corpus import graph
+>>> with profile() as stats:
+...     _ = graph.init('a b c')
+>>> [s.name for s in stats]
+['align.chars', 'align.diff', 'align.pairs', 'align.union', 'align.edges']
+>>> stats[-1].counts
+{'edges': 3}
+"""
+
+import contextlib
+import sys
+import time
+from collections.abc import Generator
+from dataclasses import dataclass
+from typing import Callable, Optional, Union
+
+__all__ = ["StageStats", "add_hook", "profile", "remove_hook", "stage"]
+
+
+@dataclass(frozen=True)
+class StageStats:
+    """What happened during one run of a stage."""
+
+    name: str
+    # wall time
+    seconds: float
+    # number of elements handled, by kind
+    counts: dict[str, int]
+    # change in the number of memory blocks allocated by the interpreter
+    allocated_blocks: int
+
+
+Hook = Callable[[StageStats], None]
+
+_hooks: list[Hook] = []
+
+
+def add_hook(hook: Hook) -> None:
+    """Call `hook` at the end of every stage from now on."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:  # noqa: D103
+    _hooks.remove(hook)
+
+
+@contextlib.contextmanager
+def profile() -> Generator[list[StageStats], None, None]:
+    """Collect the stats of the stages that run inside the block."""
+    stats: list[StageStats] = []
+    add_hook(stats.append)
+    try:
+        yield stats
+    finally:
+        remove_hook(stats.append)
+
+
+class Stage:
+    """A running stage, use as a context manager."""
+
+    __slots__ = ("_blocks", "_start", "counts", "name")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.counts: dict[str, int] = {}
+        self._start = 0.0
+        self._blocks = 0
+
+    def count(self, kind: str, n: int) -> None:
+        """Add `n` elements of `kind`."""
+        self.counts[kind] = self.counts.get(kind, 0) + n
+
+    def __enter__(self) -> "Stage":
+        self._blocks = sys.getallocatedblocks()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Optional[type], *_exc: object) -> None:
+        seconds = time.perf_counter() - self._start
+        if exc_type is not None:
+            return
+        stats = StageStats(
+            name=self.name,
+            seconds=seconds,
+            counts=self.counts,
+            allocated_blocks=sys.getallocatedblocks() - self._blocks,
+        )
+        # a hook may remove itself
+        for hook in _hooks.copy():
+            hook(stats)
+
+
+class _NoStage:
+    """Stands in for `Stage` when nobody is listening."""
+
+    __slots__ = ()
+
+    def count(self, kind: str, n: int) -> None:
+        pass
+
+    def __enter__(self) -> "_NoStage":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str) -> Union[Stage, _NoStage]:
+    """Time the stage `name` if any hook is registered, otherwise do nothing."""
+    return Stage(name) if _hooks else _NO_STAGE
@@ -1,17 +1,21 @@
 """Ranges."""
 
 import itertools
-from typing import TypedDict
+from typing import Optional, TypedDict
 
+from parallel_corpus.shared import profiling
 from parallel_corpus.shared.diffs import token_diff
 from parallel_corpus.shared.functional import take_last_while
 
 EditRange = TypedDict("EditRange", {"from": int, "to": int, "insert": str})
 
 
-def edit_range(s0: str, s: str) -> EditRange:
+def edit_range(s0: str, s: str, *, deadline: Optional[float] = None) -> EditRange:
     """Create an EditRange.
 
+    If `deadline` (in the sense of `time.time`) passes during the diff, the range
+    covers the parts that the diff had not resolved, see `diffs.char_diff`.
+
     >>> edit_range('0123456789', '0189')
     {'from': 2, 'to': 8, 'insert': ''}
 
@@ -39,11 +43,13 @@ def edit_range(s0: str, s: str) -> EditRange:
     >>> edit_range('', '01')
     {'from': 0, 'to': 0, 'insert': '01'}
     """
-    patches = token_diff(s0, s)
-    pre = list(itertools.takewhile(lambda i: i[0] == 0, patches))
-    post = take_last_while(lambda i: i[0] == 0, patches)
-    from_ = len("".join(i[1] for i in pre))
-    postlen = len("".join(i[1] for i in post))
-    to = len(s0) - postlen
-    insert = s[from_ : (len(s) - (len(s0) - to))]
+    with profiling.stage("edit_range") as stage:
+        patches = token_diff(s0, s, deadline=deadline)
+        pre = list(itertools.takewhile(lambda i: i[0] == 0, patches))
+        post = take_last_while(lambda i: i[0] == 0, patches)
+        from_ = len("".join(i[1] for i in pre))
+        postlen = len("".join(i[1] for i in post))
+        to = len(s0) - postlen
+        insert = s[from_ : (len(s) - (len(s0) - to))]
+        stage.count("characters", len(s0) + len(s))
     return {"from": from_, "to": to, "insert": insert}
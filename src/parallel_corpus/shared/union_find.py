@@ -1,9 +1,12 @@
 """UnionFind."""
 
 import abc
+import array
 import functools
+import itertools
 import json
-from dataclasses import dataclass
+from collections.abc import Iterable
+from dataclasses import dataclass, field
 from typing import Callable, Generic, Optional, TypeVar
 
 from typing_extensions import Self
@@ -27,28 +30,87 @@ class UnionFindOperations(abc.ABC, Generic[A]):
         """Make these belong to the same group."""
 
 
-class UnionFind(UnionFindOperations[int]):  # noqa: D101
-    def __init__(self, *, rev: Optional[list[Optional[int]]] = None) -> None:  # noqa: D107
-        self._rev: list[Optional[int]] = rev or []
+class UnionFind(UnionFindOperations[int]):
+    """Union-find over the integers `0, 1, 2, ...`, backed by arrays.
+
+    Uses union by rank and path halving, so `find` is iterative and the trees stay
+    shallow. The arrays grow on demand when larger integers are used, `size`
+    preallocates them.
+
+    >>> uf = UnionFind(size=4)
+    >>> uf.unions_from_pairs([0, 1], [2, 3])
+    >>> uf.find(0) == uf.find(2), uf.find(0) == uf.find(1)
+    (True, False)
+    >>> list(uf.components())
+    [0, 1, 0, 1]
+    """
+
+    def __init__(self, *, rev: Optional[list[Optional[int]]] = None, size: int = 0) -> None:  # noqa: D107
+        self._parent = array.array("l", range(size))
+        # upper bound of the height of the tree of each root
+        self._rank = bytearray(size)
+        if rev:
+            self._grow(len(rev) - 1)
+            for x, y in enumerate(rev):
+                if y is not None and y != x:
+                    self.union(y, x)
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._parent)
+
+    def _grow(self, x: int) -> None:
+        n = len(self._parent)
+        if x >= n:
+            self._parent.extend(range(n, x + 1))
+            self._rank.extend(bytes(x + 1 - n))
 
     def find(self, x: int) -> int:  # noqa: D102
-        while x >= len(self._rev):
-            self._rev.append(None)  # type: ignore [arg-type]
-        if self._rev[x] is None:
-            self._rev[x] = x
-        elif self._rev[x] != x:
-            self._rev[x] = self.find(self._rev[x])  # type: ignore [arg-type]
-        return self._rev[x]  # type: ignore [return-value]
+        parent = self._parent
+        if x >= len(parent):
+            self._grow(x)
+            return x
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
 
     def union(self, x: int, y: int) -> int:  # noqa: D102
         find_x = self.find(x)
         find_y = self.find(y)
-        if find_x != find_y:
-            self._rev[find_y] = find_x
+        if find_x == find_y:
+            return find_x
+        rank = self._rank
+        if rank[find_x] < rank[find_y]:
+            find_x, find_y = find_y, find_x
+        elif rank[find_x] == rank[find_y]:
+            rank[find_x] += 1
+        self._parent[find_y] = find_x
         return find_x
 
     def unions(self, xs: list[int]) -> None:  # noqa: D102
-        functools.reduce(self.union, xs, xs[0])
+        if xs:
+            functools.reduce(self.union, xs, xs[0])
+
+    def unions_from_pairs(self, a_idx: Iterable[int], b_idx: Iterable[int]) -> None:
+        """Union `a_idx[k]` with `b_idx[k]` for every `k`."""
+        for a, b in zip(a_idx, b_idx):
+            self.union(a, b)
+
+    def components(self) -> array.array:
+        """Label every element with the number of its group.
+
+        Groups are numbered from 0 in the order of their first element.
+        """
+        labels = array.array("l", itertools.repeat(-1, len(self._parent)))
+        n = 0
+        for x in range(len(self._parent)):
+            root = self.find(x)
+            label = labels[root]
+            if label < 0:
+                label = labels[root] = n
+                n += 1
+            labels[x] = label
+        return labels
 
 
 @dataclass
@@ -57,14 +119,28 @@ class Renumber(Generic[A]):  # noqa: D101
     fw: dict[int, A]
     i = 0
     serialize: Callable[[A], str]
+    # numbers of the strings that have been seen, to skip `serialize`; other types are
+    # left out since equal values such as 1, 1.0 and True may serialize differently
+    seen: dict[str, int] = field(default_factory=dict)
 
     def num(self, a: A) -> int:  # noqa: D102
+        key = a
+        if type(key) is str:
+            n = self.seen.get(key)
+            if n is None:
+                n = self.seen[key] = self._num(a)
+            return n
+        return self._num(a)
+
+    def _num(self, a: A) -> int:
         s = self.serialize(a)
-        if s not in self.bw:
-            self.fw[self.i] = a
-            self.bw[s] = self.i
+        n = self.bw.get(s)
+        if n is None:
+            n = self.i
+            self.fw[n] = a
+            self.bw[s] = n
             self.i += 1
-        return self.bw[s]
+        return n
 
     def un(self, n: int) -> Optional[A]:  # noqa: D102
         return self.fw.get(n)
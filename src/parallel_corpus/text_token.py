@@ -1,24 +1,28 @@
 """Token."""
 
+import array
+import bisect
+import itertools
 import re
-from collections.abc import Sequence
+import sys
+from collections.abc import Iterable, Iterator, Sequence
 from dataclasses import dataclass
-from typing import TypedDict
+from typing import Optional, TypedDict, Union, overload
 
 from parallel_corpus import shared
 
 
-@dataclass
+@dataclass(frozen=True, **shared.DATACLASS_SLOTS)
 class Text:  # noqa: D101
     text: str
 
 
-@dataclass
+@dataclass(frozen=True, **shared.DATACLASS_SLOTS)
 class Token(Text):  # noqa: D101
     id: str
 
 
-@dataclass
+@dataclass(**shared.DATACLASS_SLOTS)
 class Span:  # noqa: D101
     begin: int
     end: int
@@ -31,6 +35,8 @@ def text(ts: Sequence[Text]) -> str:
     'apa bepa cepa '
 
     """
+    if isinstance(ts, TokenSequence):
+        return ts.text
     return "".join(texts(ts))
 
 
@@ -40,21 +46,184 @@ def texts(ts: Sequence[Text]) -> list[str]:
     >>> texts(identify(tokenize('apa bepa cepa '), '#'))
     ['apa ', 'bepa ', 'cepa ']
     """
+    if isinstance(ts, TokenSequence):
+        return ts.texts()
     return [t.text for t in ts]
 
 
+# a word with the whitespace after it, the first word also takes the whitespace
+# before it, and text that is only whitespace is one token
+TOKEN = re.compile(r"\s*\S+\s*|^\s+$")
+
+
 def tokenize(s: str) -> list[str]:
-    """Tokenizes text on whitespace, prefers to have trailing whitespace."""
-    return list(
-        map(
-            shared.end_with_space,
-            re.findall(r"\s*\S+\s*", s) or re.findall(r"^\s+$", s) or [],
+    """Tokenizes text on whitespace, prefers to have trailing whitespace.
+
+    Only the last token can lack trailing whitespace, and gets a space added.
+
+    >>> tokenize('  apa  bepa')
+    ['  apa  ', 'bepa ']
+    """
+    toks = TOKEN.findall(s)
+    if toks:
+        toks[-1] = shared.end_with_space(toks[-1])
+    return toks
+
+
+def token_spans(s: str) -> list[Span]:
+    """Return the spans of the tokens of `tokenize` in `s`.
+
+    The spans cover `s` without gaps, the space that `tokenize` may add to the
+    last token is not part of `s`.
+
+    >>> token_spans('  apa bepa')
+    [Span(begin=0, end=6), Span(begin=6, end=10)]
+    """
+    return [Span(m.start(), m.end()) for m in TOKEN.finditer(s)]
+
+
+def identify(toks: list[str], prefix: str) -> list[Token]:
+    """Make tokens with the ids `prefix0`, `prefix1`, ...
+
+    The ids are interned, so graphs share them.
+    """
+    return [Token(text=text, id=sys.intern(f"{prefix}{i}")) for i, text in enumerate(toks)]
+
+
+class TokenSequence(Sequence[Token]):
+    """Tokens stored as one string with the length and id of each token.
+
+    Can be used instead of a list of tokens. The tokens are made when they are
+    accessed, while the text of all tokens, their count and their offsets are at
+    hand without visiting them.
+
+    >>> ts = TokenSequence.from_text('apa bepa cepa', 's')
+    >>> ts.text, len(ts), ts[1]
+    ('apa bepa cepa ', 3, Token(text='bepa ', id='s1'))
+    >>> ts == identify(tokenize('apa bepa cepa'), 's')
+    True
+    >>> ts[1:]
+    TokenSequence([Token(text='bepa ', id='s1'), Token(text='cepa ', id='s2')])
+    """
+
+    __slots__ = ("_ids", "_lengths", "_offsets", "_text")
+
+    def __init__(self, text: str, lengths: array.array, ids: list[str]) -> None:  # noqa: D107
+        if len(lengths) != len(ids):
+            raise ValueError(f"{len(lengths)} token lengths but {len(ids)} ids")
+        if sum(lengths) != len(text):
+            raise ValueError(f"token lengths add up to {sum(lengths)}, not {len(text)}")
+        self._text = text
+        self._lengths = lengths
+        self._ids = ids
+        self._offsets: Optional[array.array] = None
+
+    @classmethod
+    def from_tokens(cls, tokens: Iterable[Token]) -> "TokenSequence":  # noqa: D102
+        if isinstance(tokens, TokenSequence):
+            return tokens
+        ts = list(tokens)
+        texts_ = [t.text for t in ts]
+        return cls("".join(texts_), array.array("l", map(len, texts_)), [t.id for t in ts])
+
+    @classmethod
+    def from_text(cls, s: str, prefix: str, *, start: int = 0) -> "TokenSequence":
+        """Tokenize `s` like `tokenize` with ids like `identify`, numbered from `start`."""
+        toks = tokenize(s)
+        return cls(
+            "".join(toks),
+            array.array("l", map(len, toks)),
+            [sys.intern(f"{prefix}{i}") for i in range(start, start + len(toks))],
         )
-    )
 
+    @property
+    def text(self) -> str:
+        """The text of all tokens."""
+        return self._text
+
+    @property
+    def ids(self) -> Sequence[str]:  # noqa: D102
+        return tuple(self._ids)
 
-def identify(toks: list[str], prefix: str) -> list[Token]:  # noqa: D103
-    return [Token(text=text, id=f"{prefix}{i}") for i, text in enumerate(toks)]
+    @property
+    def offsets(self) -> array.array:
+        """The offset of each token in `text` followed by the length of `text`."""
+        if self._offsets is None:
+            self._offsets = offsets_from_lengths(self._lengths)
+        return self._offsets
+
+    def texts(self) -> list[str]:  # noqa: D102
+        text, offsets = self._text, self.offsets
+        return [text[offsets[i] : offsets[i + 1]] for i in range(len(self._ids))]
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._ids)
+
+    @overload
+    def __getitem__(self, i: int) -> Token: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> "TokenSequence": ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Token, "TokenSequence"]:  # noqa: D105
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self._ids))
+            if step != 1:
+                return TokenSequence.from_tokens([self[k] for k in range(start, stop, step)])
+            stop = max(start, stop)
+            offsets = self.offsets
+            return TokenSequence(
+                self._text[offsets[start] : offsets[stop]],
+                self._lengths[start:stop],
+                self._ids[start:stop],
+            )
+        offsets = self.offsets
+        if i < 0:
+            i += len(self._ids)
+        if not 0 <= i < len(self._ids):
+            raise IndexError("TokenSequence index out of range")
+        return Token(text=self._text[offsets[i] : offsets[i + 1]], id=self._ids[i])
+
+    def __iter__(self) -> Iterator[Token]:  # noqa: D105
+        return map(Token, self.texts(), self._ids)
+
+    def __eq__(self, other: object) -> bool:  # noqa: D105
+        if isinstance(other, TokenSequence):
+            return (
+                self._text == other._text
+                and self._lengths == other._lengths
+                and self._ids == other._ids
+            )
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None  # type: ignore [assignment]
+
+    def __repr__(self) -> str:  # noqa: D105
+        return f"TokenSequence({list(self)!r})"
+
+    def splice(
+        self, start: int, count: int, insert: Sequence[Token]
+    ) -> tuple["TokenSequence", list[Token]]:
+        """Replace `count` tokens from `start` with `insert`, like `shared.lists.splice`.
+
+        Returns:
+            tuple[TokenSequence, list[Token]]: the new tokens and the removed tokens.
+        """
+        stop = min(start + count, len(self._ids))
+        offsets = self.offsets
+        removed = list(self[start:stop])
+        inserted = [t.text for t in insert]
+        lengths = self._lengths[:start]
+        lengths.extend(map(len, inserted))
+        lengths.extend(self._lengths[stop:])
+        spliced = TokenSequence(
+            "".join([self._text[: offsets[start]], *inserted, self._text[offsets[stop] :]]),
+            lengths,
+            [*self._ids[:start], *(t.id for t in insert), *self._ids[stop:]],
+        )
+        return spliced, removed
 
 
 class TokenAt(TypedDict):  # noqa: D101
@@ -62,6 +231,39 @@ class TokenAt(TypedDict):  # noqa: D101
     offset: int
 
 
+def offsets(texts: Iterable[str]) -> array.array:
+    """Return the offset where each text starts when joined, followed by the total length.
+
+    >>> offsets(['012', '3456', '789'])
+    array('l', [0, 3, 7, 10])
+    """
+    return offsets_from_lengths(map(len, texts))
+
+
+def offsets_from_lengths(lengths: Iterable[int]) -> array.array:  # noqa: D103
+    out = array.array("l", [0])
+    out.extend(itertools.accumulate(lengths))
+    return out
+
+
+def locate(offsets: Sequence[int], character_offset: int) -> TokenAt:
+    """Return the token at the given offset, given the `offsets` of the tokens.
+
+    The offset at the end of the text is at the start of a token after the last one.
+
+    >>> locate(offsets(['012', '3456', '789']), 7)
+    {'token': 2, 'offset': 0}
+    >>> locate(offsets(['012', '3456', '789']), 10)
+    {'token': 3, 'offset': 0}
+    """
+    if not 0 <= character_offset <= offsets[-1]:
+        raise IndexError(
+            f"Out of bounds: offsets={offsets}, character_offset={character_offset}"
+        )
+    i = bisect.bisect_right(offsets, character_offset) - 1
+    return {"token": i, "offset": character_offset - offsets[i]}
+
+
 def token_at(tokens: list[str], character_offset: int) -> TokenAt:
     """Return token at the given offset.
 
@@ -79,12 +281,9 @@ def token_at(tokens: list[str], character_offset: int) -> TokenAt:
     token_at(abc, 10) // => {token: 3, offset: 0}
     Utils.throws(() => token_at(abc, 11)) // => true
     """
-    passed = 0
-    for i in range(len(tokens)):
-        w = len(tokens[i])
-        passed += w
-        if passed > character_offset:
-            return {"token": i, "offset": character_offset - passed + w}
-    if character_offset == len("".join(tokens)):
-        return {"token": len(tokens), "offset": 0}
-    raise IndexError(f"Out of bounds: tokens={tokens}, character_offset={character_offset}")
+    try:
+        return locate(offsets(tokens), character_offset)
+    except IndexError:
+        raise IndexError(
+            f"Out of bounds: tokens={tokens}, character_offset={character_offset}"
+        ) from None
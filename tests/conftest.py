@@ -0,0 +1,51 @@
+import threading
+from collections.abc import Iterator
+from typing import Optional
+
+import pytest
+
+from parallel_corpus import graph
+
+
+class FakeAlign:
+    """Stands in for `graph.align`, recording the graphs it aligns.
+
+    If `gated`, each call waits for `gate` to be set before aligning, and sets
+    `started` when it begins.
+    """
+
+    def __init__(self, *, gated: bool = False) -> None:  # noqa: D107
+        self.align = graph.align
+        self.calls: list[graph.Graph] = []
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        if not gated:
+            self.gate.set()
+
+    def __call__(
+        self,
+        g: graph.Graph,
+        *,
+        timeout: Optional[float] = None,
+        cache: Optional[graph.AlignmentCache] = None,
+        token_diff: bool = False,
+    ) -> graph.Graph:
+        self.calls.append(g)
+        self.started.set()
+        self.gate.wait()
+        return self.align(g, timeout=timeout, cache=cache, token_diff=token_diff)
+
+
+@pytest.fixture
+def fake_align(
+    request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[FakeAlign]:
+    """Replace `graph.align` by a `FakeAlign`.
+
+    Parametrize it indirectly to pass arguments to `FakeAlign`, such as `{"gated": True}`.
+    """
+    fake = FakeAlign(**getattr(request, "param", {}))
+    monkeypatch.setattr(graph, "align", fake)
+    yield fake
+    # let the calls that still wait finish
+    fake.gate.set()
@@ -0,0 +1,144 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Optional
+
+import pytest
+
+from parallel_corpus import aio, graph
+
+from .conftest import FakeAlign
+
+
+def test_set_target() -> None:
+    g = graph.init("a bc d")
+    assert asyncio.run(aio.set_target(g, "a b c d")) == graph.set_target(g, "a b c d")
+
+
+def test_modify_on_process_pool() -> None:
+    g = graph.init("a bc d")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+        result = asyncio.run(aio.modify(g, 0, 4, "ab c", executor=executor))
+    assert result == graph.modify(g, 0, 4, "ab c")
+
+
+# made before `fake_align` replaces `graph.align`
+ABC = graph.init("a b c")
+
+
+def edited(g: graph.Graph, n: int) -> graph.Graph:
+    e = graph.edit(g)
+    for i in range(n):
+        e.modify(0, 0, f"w{i} ")
+    return e.graph
+
+
+def test_session_cancels_alignment_that_has_not_started(fake_align: FakeAlign) -> None:
+    g = ABC
+    gate = threading.Event()
+
+    async def main(executor: concurrent.futures.Executor) -> list[graph.Graph]:
+        executor.submit(gate.wait)
+        s = aio.Session(g, executor=executor)
+        tasks = [asyncio.ensure_future(s.modify(0, 0, f"w{i} ")) for i in range(5)]
+        await asyncio.sleep(0)
+        assert s.pending
+        gate.set()
+        return await asyncio.gather(*tasks)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        results = asyncio.run(main(executor))
+    assert len(fake_align.calls) == 1
+    assert results == [edited(g, 5)] * 5
+
+
+@pytest.mark.parametrize("fake_align", [{"gated": True}], indirect=True)
+def test_session_drops_stale_alignment(fake_align: FakeAlign) -> None:
+    g = ABC
+
+    async def main() -> list[graph.Graph]:
+        with aio.Session(g) as s:
+            first = asyncio.ensure_future(s.modify(0, 0, "w0 "))
+            while not fake_align.started.is_set():
+                await asyncio.sleep(0.001)
+            rest = [asyncio.ensure_future(s.modify(0, 0, f"w{i} ")) for i in range(1, 5)]
+            await asyncio.sleep(0)
+            fake_align.gate.set()
+            return await asyncio.gather(first, *rest)
+
+    results = asyncio.run(main())
+    assert len(fake_align.calls) == 2
+    assert results == [edited(g, 5)] * 5
+
+
+def test_session_rearrange_aligns_pending_edits_first() -> None:
+    g = graph.init("a b c")
+
+    async def main() -> graph.Graph:
+        with aio.Session(g) as s:
+            task = asyncio.ensure_future(s.modify(0, 1, "x"))
+            await asyncio.sleep(0)
+            result = await s.rearrange(0, 0, 2)
+            assert await task == graph.modify(g, 0, 1, "x")
+            assert not s.pending
+            return result
+
+    assert asyncio.run(main()) == graph.rearrange(graph.modify(g, 0, 1, "x"), 0, 0, 2)
+
+
+def test_session_edit_error_leaves_state() -> None:
+    g = graph.init("a b c")
+
+    async def main() -> None:
+        with aio.Session(g) as s:
+            with pytest.raises(IndexError):
+                await s.modify(0, 100, "x")
+            assert s.graph is g
+            assert await s.aligned() is g
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("fake_align", [{"gated": True}], indirect=True)
+def test_session_close_cancels_waiters(fake_align: FakeAlign) -> None:
+    g = ABC
+
+    async def main() -> None:
+        s = aio.Session(g)
+        task = asyncio.ensure_future(s.modify(0, 1, "x"))
+        while not fake_align.started.is_set():
+            await asyncio.sleep(0.001)
+        s.close()
+        assert s.closed
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(task, 2)
+        with pytest.raises(RuntimeError, match="closed"):
+            await s.modify(0, 1, "y")
+
+    try:
+        asyncio.run(main())
+    finally:
+        fake_align.gate.set()
+
+
+def test_session_set_target_diffs_off_the_event_loop(monkeypatch: pytest.MonkeyPatch) -> None:
+    g = graph.init("a b c")
+    expected = graph.modify(graph.set_target(g, "a x c"), 0, 1, "y")
+    threads = []
+    changed_range = graph.changed_range
+
+    def recording_changed_range(
+        text0: str, text: str, *, timeout: Optional[float] = None
+    ) -> tuple[int, int, str]:
+        threads.append(threading.current_thread())
+        return changed_range(text0, text, timeout=timeout)
+
+    monkeypatch.setattr(graph, "changed_range", recording_changed_range)
+
+    async def main() -> list[graph.Graph]:
+        with aio.Session(g) as s:
+            return list(await asyncio.gather(s.set_target("a x c"), s.modify(0, 1, "y")))
+
+    assert asyncio.run(main()) == [expected] * 2
+    assert threads
+    assert threading.main_thread() not in threads
@@ -0,0 +1,69 @@
+import gzip
+import itertools
+from pathlib import Path
+
+import pytest
+
+from parallel_corpus import graph, io
+from parallel_corpus.cli import main
+
+PAIRS = [("a bc d", "a b c d"), ("Jonathan saknades .", "Jonat han saknades ."), ("x", "y")]
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_align(tmp_path: Path, jobs: str) -> None:
+    tsv = tmp_path / "pairs.tsv"
+    tsv.write_text("".join(f"{s}\t{t}\n" for s, t in PAIRS * 10) + "\n")
+    out = tmp_path / "graphs.jsonl.gz"
+    assert main(["align", str(tsv), "-o", str(out), "-j", jobs, "--chunk-size", "4", "-q"]) == 0
+    expected = list(itertools.starmap(graph.init_with_source_and_target, PAIRS * 10))
+    assert list(io.iter_graphs(out)) == expected
+
+
+def test_realign(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    unaligned = [graph.unaligned_set_side(graph.init(s), graph.Side.target, t) for s, t in PAIRS]
+    source = tmp_path / "graphs.jsonl"
+    io.write_graphs(source, unaligned)
+    out = tmp_path / "aligned.jsonl"
+    assert main(["realign", str(source), "--output", str(out), "--jobs", "1"]) == 0
+    assert list(io.iter_graphs(out)) == [graph.align(g) for g in unaligned]
+    assert "3 graphs in" in capsys.readouterr().err
+
+
+def test_align_reports_bad_lines(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    tsv = tmp_path / "pairs.tsv"
+    tsv.write_text("a\tb\nno tab\n")
+    assert main(["align", str(tsv), "-o", str(tmp_path / "out.jsonl"), "-j", "1"]) == 1
+    assert "line 2" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("command", ["realign", "connect-isolated"])
+@pytest.mark.parametrize("jobs", ["1", "2"])
+@pytest.mark.parametrize("line", ['{"x":1}', '{"source":1}', "[]", "{"])
+def test_jsonl_commands_report_bad_lines(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str], command: str, jobs: str, line: str
+) -> None:
+    source = tmp_path / "graphs.jsonl"
+    source.write_text(io.dumps(graph.init("a b")) + "\n" + line + "\n")
+    assert main([command, str(source), "-o", str(tmp_path / "out.jsonl"), "-j", jobs, "-q"]) == 1
+    assert "error: line 2: " in capsys.readouterr().err
+
+
+def test_gzipped_input(tmp_path: Path) -> None:
+    tsv = tmp_path / "pairs.tsv.gz"
+    with gzip.open(tsv, "wt", encoding="utf-8") as fp:
+        fp.write("a b\ta c\n")
+    out = tmp_path / "out.jsonl"
+    assert main(["align", str(tsv), "-o", str(out), "-j", "1", "-q"]) == 0
+    assert list(io.iter_graphs(out)) == [graph.init_with_source_and_target("a b", "a c")]
+
+
+def test_connect_isolated(tmp_path: Path) -> None:
+    graphs = list(itertools.starmap(graph.init_with_source_and_target, PAIRS))
+    source = tmp_path / "graphs.jsonl"
+    io.write_graphs(source, graphs)
+    out = tmp_path / "connected.jsonl"
+    assert main(["connect-isolated", str(source), "-o", str(out), "-j", "1", "-q"]) == 0
+    assert list(io.iter_graphs(out)) == [
+        graph.connect_isolated_tokens_based_on_index(g) for g in graphs
+    ]
@@ -1,8 +1,19 @@
+import concurrent.futures
+import dataclasses
+import itertools
+import random
+import time
+from collections.abc import Hashable, Sequence
+from typing import Callable, Optional
+
 import pytest
 
 from parallel_corpus import graph, text_token
+from parallel_corpus.shared import diffs, profiling
 from parallel_corpus.source_target import Side, SourceTarget
 
+from .conftest import FakeAlign
+
 
 def test_graph_init() -> None:
     g = graph.init("w1 w2")
@@ -313,3 +324,551 @@ def test_connecting_token_based_on_index() -> None:
     print(f"{g=}")
     g_new = graph.connect_isolated_tokens_based_on_index(g)
     assert "e-s3-t3" in g_new.edges
+
+
+def test_alignment_window_is_closed_under_edges() -> None:
+    g0 = graph.init(" ".join(f"w{i}" for i in range(40)))
+    g = graph.unaligned_modify(g0, 60, 62, "xyz")
+    new_ids = [i for k in g.edges.keys() - g0.edges.keys() for i in g.edges[k].ids]
+    window = graph.alignment_window(g, new_ids, context=3)
+    assert window is not None
+    assert len(window.source) < len(g.source)
+    in_window = {t.id for t in g.source[window.source.start : window.source.stop]} | {
+        t.id for t in g.target[window.target.start : window.target.stop]
+    }
+    for e in g.edges.values():
+        assert all(i in in_window for i in e.ids) or not any(i in in_window for i in e.ids)
+
+
+@pytest.mark.parametrize(
+    ("first", "second"),
+    [
+        (
+            "Jonathan saknades , emedan han , med sin vapendragare , redan på annat håll sökt och anträffat fienden .",  # noqa: E501
+            "Jonat han saknades , emedan han , med sin vapendragare , redan på annat håll sökt och anträffat fienden .",  # noqa: E501
+        ),
+        (
+            "Jonat han saknades , emedan han , med sin vapendragare , redan på annat håll sökt och anträffat fienden .",  # noqa: E501
+            "Jonathan saknaes , emedan han , med sin vapendragare , redan på annat håll sökt och anträffat fienden .",  # noqa: E501
+        ),
+        ("a bc d", "ab c d"),
+        ("apa bepa cepa depa", "apa bepa cepa"),
+        ("apa bepa cepa depa", ""),
+    ],
+)
+def test_set_target_incremental(first: str, second: str) -> None:
+    g = graph.init(first)
+    assert graph.set_target(g, second, incremental=True) == graph.set_target(g, second)
+    assert graph.set_source(g, second, incremental=True) == graph.set_source(g, second)
+
+
+def test_modify_incremental_in_long_document() -> None:
+    text = " ".join(f"ord{i} och mer text ." for i in range(200))
+    g = graph.init_with_source_and_target(text, text.replace("ord5 ", "ordet5 "))
+    for from_, to, word in [(0, 0, "Nu "), (500, 505, "xy"), (2000, 2000, " ny mening .")]:
+        expected = graph.modify(g, from_, to, word)
+        g = graph.modify(g, from_, to, word, incremental=True)
+        assert g == expected
+
+
+WORDS = ["a", "ab", "abc", "b", "ba", "och", "en", "."]
+
+
+def random_edit(rng: random.Random, g: graph.Graph) -> tuple[int, int, str]:
+    length = len(graph.get_side_text(g, Side.target))
+    from_ = rng.randrange(length + 1)
+    to = min(length, from_ + rng.randrange(6))
+    return from_, to, rng.choice(["", "x", "ab ", " b", "ny ord "])
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_modify_incremental_is_align_where_the_sides_are_equal(seed: int) -> None:
+    rng = random.Random(seed)
+    g = graph.init(" ".join(rng.choice(WORDS) for _ in range(300)))
+    for _ in range(50):
+        from_, to, text = random_edit(rng, g)
+        expected = graph.modify(g, from_, to, text)
+        assert graph.modify(g, from_, to, text, incremental=True) == expected
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_align_incremental_aligns_the_window_like_align(seed: int) -> None:
+    rng = random.Random(seed)
+    source = [rng.choice(WORDS) for _ in range(300)]
+    target = [rng.choice(WORDS) if rng.random() < 0.1 else w for w in source]
+    g = graph.align(graph.init_with_source_and_target(" ".join(source), " ".join(target)))
+    for _ in range(50):
+        after = graph.unaligned_modify(g, *random_edit(rng, g))
+        ids = [i for k in after.edges.keys() - g.edges.keys() for i in after.edges[k].ids]
+        window = graph.alignment_window(after, ids)
+        g = graph.align_incremental(after, ids)
+        if window is None:
+            assert g == graph.align(after)
+            continue
+        part = SourceTarget(
+            source=after.source[window.source.start : window.source.stop],
+            target=after.target[window.target.start : window.target.stop],
+        )
+        in_window = {t.id for t in itertools.chain(part.source, part.target)}
+
+        def edges(g: graph.Graph, inside: bool) -> graph.Edges:
+            return {k: e for k, e in g.edges.items() if (e.ids[0] in in_window) == inside}  # noqa: B023
+
+        assert edges(g, inside=False) == edges(after, inside=False)
+        window_graph = graph.Graph(
+            source=part.source, target=part.target, edges=edges(after, inside=True)
+        )
+        assert edges(g, inside=True) == graph.align(window_graph).edges
+
+
+def test_init_many_and_align_many() -> None:
+    pairs = [("a bc d", "ab c d"), ("apa bepa", "apa"), ("", "x y"), ("w1 w2", "w1 w2")]
+    expected = list(itertools.starmap(graph.init_with_source_and_target, pairs))
+
+    assert list(graph.init_many(pairs, max_workers=1)) == expected
+    assert list(graph.init_many(pairs, max_workers=2, chunksize=1)) == expected
+    unaligned = [graph.unaligned_set_side(g, Side.target, "new text") for g in expected]
+    assert list(graph.align_many(unaligned, max_workers=2)) == [
+        graph.align(g) for g in unaligned
+    ]
+
+
+def test_tokens_and_edges_are_frozen() -> None:
+    g = graph.init("apa")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        g.source[0].text = "bepa"  # type: ignore [misc]
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        g.edges["e-s0-t0"].manual = True  # type: ignore [misc]
+
+
+def test_modify_shares_unchanged_tokens_and_edges() -> None:
+    g = graph.init("apa bepa cepa depa")
+    gm = graph.unaligned_modify(g, 4, 8, "BEPA")
+
+    assert gm.source is g.source
+    assert all(a is b for a, b in zip(gm.target[2:], g.target[2:]))
+    assert gm.edges["e-s3-t3"] is g.edges["e-s3-t3"]
+    assert graph.target_text(g) == "apa bepa cepa depa "  # type: ignore [arg-type]
+
+
+def test_connect_isolated_tokens_does_not_change_graph() -> None:
+    g = graph.init_with_source_and_target("a b c", "x y c")
+    edges = dict(g.edges)
+    g_new = graph.connect_isolated_tokens_based_on_index(g)
+
+    assert g.edges == edges
+    assert "e-s0-t0" in g_new.edges
+    assert g_new.edges["e-s2-t2"] is g.edges["e-s2-t2"]
+
+
+def test_connect_isolated_tokens_keeps_token_index() -> None:
+    g = graph.init_with_source_and_target("a b c d", "x b y z w")
+    graph.edge_index(g)
+    g_new = graph.connect_isolated_tokens_based_on_index(g)
+    assert sorted(g_new.edges) == ["e-s0-t0", "e-s1-t1", "e-s2-t2", "e-s3-t3", "e-t4"]
+    assert g_new.token_edges == graph.edge_map(g_new)
+    assert graph.connect_isolated_tokens_based_on_index(g_new) is g_new
+
+
+def test_connect_isolated_many() -> None:
+    graphs = [graph.init_with_source_and_target(f"a{i} b", f"x{i} b") for i in range(10)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        connected = list(graph.connect_isolated_many(graphs, chunksize=3, executor=executor))
+    assert connected == [graph.connect_isolated_tokens_based_on_index(g) for g in graphs]
+
+
+def test_next_id_is_kept_through_edits() -> None:
+    g = graph.init("test graph hello")
+    assert g.next_free_id == 3
+
+    g = graph.unaligned_modify_tokens(g, 2, 3, "bye ")
+    assert ids(g) == "t0 t1 t3"
+    g = graph.unaligned_modify_tokens(g, 2, 3, "")
+    assert graph.next_id(g) == 4
+    g = graph.unaligned_modify_tokens(g, 2, 2, "again ")
+    # t3 was removed, but its id is not reused
+    assert ids(g) == "t0 t4 t5"
+    assert graph.align(g).next_free_id == 6
+
+
+def test_next_id_falls_back_to_scanning_ids() -> None:
+    g = graph.Graph(
+        source=[text_token.Token("a ", "s5")], target=[text_token.Token("a ", "t9")], edges={}
+    )
+    assert g.next_free_id is None
+    assert ids(graph.unaligned_modify_tokens(g, 0, 0, "b ")) == "t10 t9"
+
+
+def test_edge_index_is_kept_up_to_date() -> None:
+    g = graph.init_with_source_and_target("a b c d e f g h i j", "a b c d e f g h i j")
+    index = graph.edge_index(g)
+    expected = graph.edge_map(g)
+    edits: list[Callable[[graph.Graph], graph.Graph]] = [
+        lambda g: graph.unaligned_modify(g, 2, 3, "x"),
+        lambda g: graph.align_incremental(g, ["t1", "t10"], context=2),
+        lambda g: graph.unaligned_rearrange(g, 1, 2, 5),
+        graph.align,
+        lambda g: graph.modify(g, 0, 4, "", graph.Side.source, incremental=True),
+    ]
+    for f in edits:
+        g = f(g)
+        assert graph.edge_index(g) == graph.edge_map(g)
+    # the index of the first graph is not touched by the edits
+    assert index == expected
+
+
+def test_edit_steps_are_bounded() -> None:
+    versions = [graph.init("a b c")]
+    for i in range(3 * graph.MAX_EDIT_STEPS):
+        versions.append(graph.unaligned_modify(versions[-1], 0, 0, f"w{i} "))
+        steps = graph.edit_steps(versions[-1], versions[-graph.MAX_EDIT_STEPS - 1 :][0])
+        assert steps is not None
+        assert len(steps) == min(i + 1, graph.MAX_EDIT_STEPS)
+    g = versions[-1]
+    assert graph.edit_steps(g, versions[-2 * graph.MAX_EDIT_STEPS - 2]) is None
+    assert graph.edit_steps(dataclasses.replace(g), versions[-2]) is None
+
+
+def test_edits_of_graphs_with_other_edge_keys() -> None:
+    g = graph.init_with_source_and_target("a b c", "a b c")
+    keyed = dataclasses.replace(g, edges={f"k{i}": e for i, e in enumerate(g.edges.values())})
+
+    def edge_ids(g: graph.Graph) -> list[str]:
+        return sorted(e.id for e in g.edges.values())
+
+    unaligned = graph.unaligned_modify(keyed, 0, 1, "x")
+    assert sorted(unaligned.edges) == ["e-s0-t3", "k1", "k2"]
+    assert edge_ids(unaligned) == edge_ids(graph.unaligned_modify(g, 0, 1, "x"))
+    assert graph.modify(keyed, 0, 1, "x") == graph.modify(g, 0, 1, "x")
+    incremental = graph.modify(keyed, 0, 1, "x", incremental=True)
+    assert edge_ids(incremental) == edge_ids(graph.modify(g, 0, 1, "x", incremental=True))
+    rearranged = graph.unaligned_rearrange(keyed, 0, 0, 2)
+    assert edge_ids(rearranged) == edge_ids(graph.unaligned_rearrange(g, 0, 0, 2))
+    unconnected = graph.init_with_source_and_target("a b", "x y")
+    unconnected.edges = {f"k{i}": e for i, e in enumerate(unconnected.edges.values())}
+    assert sorted(graph.connect_isolated_tokens_based_on_index(unconnected).edges) == [
+        "e-s0-t0",
+        "e-s1-t1",
+    ]
+
+
+@pytest.mark.parametrize(
+    "edit",
+    [
+        graph.align,
+        lambda g: graph.align_chunked(g, chunk_tokens=2),
+        lambda g: graph.modify(g, 4, 5, "y", incremental=True),
+        lambda g: graph.unaligned_modify(g, 2, 3, "y"),
+        lambda g: graph.unaligned_rearrange(g, 1, 1, 2),
+    ],
+)
+def test_edits_see_edges_replaced_in_place(edit: Callable[[graph.Graph], graph.Graph]) -> None:
+    g = graph.unaligned_modify(graph.init("a b c"), 0, 1, "x")
+    graph.edge_index(g)
+    old = g.edges.pop(next(k for k, e in g.edges.items() if "t1" in e.ids))
+    labeled = graph.edge(old.ids, ["LABEL"])
+    g.edges[labeled.id] = labeled
+    assert any("LABEL" in e.labels for e in edit(g).edges.values())
+
+
+def test_edge_index_is_built_for_graphs_without_one() -> None:
+    g = graph.Graph(
+        source=[text_token.Token("a ", "s0")],
+        target=[text_token.Token("a ", "t0")],
+        edges=graph.edge_record([graph.edge(["s0", "t0"], ["L"])]),
+    )
+    assert g.token_edges is None
+    assert graph.edge_index(g) == graph.edge_map(g)
+    assert graph.unaligned_modify_tokens(g, 0, 1, "b ").edges == graph.edge_record(
+        [graph.edge(["s0", "t1"], ["L"])]
+    )
+
+
+def test_derived_data_is_not_carried_over_by_replace() -> None:
+    g = graph.unaligned_modify(graph.init("a b c"), 4, 5, "x")
+    edges = dict(g.edges)
+    edges["e-s0-t0"] = dataclasses.replace(edges["e-s0-t0"], labels=["L"])
+    replaced = dataclasses.replace(g, edges=edges)
+    fresh = graph.Graph(source=g.source, target=g.target, edges=edges)
+    assert graph.align(replaced) == graph.align(fresh)
+    assert graph.edge_index(graph.align(replaced))["s0"].labels == ["L"]
+
+    # the ids of the new target are above the high-water mark of g
+    target = [text_token.Token("a ", "t7")]
+    h = dataclasses.replace(g, target=target, edges=graph.edge_record([graph.edge(["t7"], [])]))
+    assert graph.next_id(h) == 8
+    assert graph.side_offsets(g, Side.target) != graph.side_offsets(h, Side.target)
+    assert list(graph.side_offsets(h, Side.target)) == [0, 2]
+
+
+def apply_edits(e: graph.Edit) -> None:
+    e.modify(0, 2, "x ").set_target("b x c d e").modify(4, 4, "new words ", Side.source)
+    e.rearrange(1, 2, 4).modify(2, 3, "z").set_source("a b")
+
+
+def apply_edits_one_at_a_time(g: graph.Graph) -> graph.Graph:
+    g = graph.modify(g, 0, 2, "x ")
+    g = graph.set_target(g, "b x c d e")
+    g = graph.modify(g, 4, 4, "new words ", Side.source)
+    g = graph.rearrange(g, 1, 2, 4)
+    g = graph.modify(g, 2, 3, "z")
+    return graph.set_source(g, "a b")
+
+
+@pytest.mark.parametrize("labels", [[], ["L"]])
+def test_edit_matches_one_at_a_time(labels: list[str]) -> None:
+    g = graph.init_with_source_and_target("a b c d", "a b c d e")
+    e = graph.edge(["s1", "t1"], labels)
+    g = g.copy_with_edges({**g.edges, e.id: e})
+    with graph.edit(g) as batch:
+        apply_edits(batch)
+    assert batch.graph == apply_edits_one_at_a_time(g)
+
+
+def test_edit_aligns_once(fake_align: FakeAlign) -> None:
+    g = graph.init("a b c d")
+    fake_align.calls.clear()
+    e = graph.edit(g)
+    for i in range(5):
+        e.modify(i, i, f"w{i} ")
+    assert fake_align.calls == []
+    expected = e.commit()
+    assert len(fake_align.calls) == 1
+    assert e.graph is expected
+    for i in range(5):
+        g = graph.modify(g, i, i, f"w{i} ")
+    assert expected == g
+
+
+def test_edit_is_not_committed_on_error() -> None:
+    g = graph.init("a b")
+    e = graph.edit(g).modify(0, 1, "x")
+    with pytest.raises(IndexError, match="Out of bounds"), e:
+        e.modify(5, 5, "y")
+    # the first edit is left unaligned
+    assert e._pending
+
+
+def test_side_offsets_are_kept_for_unchanged_sides() -> None:
+    g = graph.init("apa bepa cepa")
+    offsets = graph.side_offsets(g, Side.source)
+    assert list(offsets) == [0, 4, 9, 14]
+    g = graph.modify(g, 0, 3, "x")
+    assert graph.side_offsets(g, Side.source) is offsets
+    assert list(graph.side_offsets(g, Side.target)) == [0, 2, 7, 12]
+
+
+def test_compact_graph_gives_the_same_results() -> None:
+    g = graph.init_with_source_and_target("apa bepa cepa depa", "apa bepa cepa")
+    c = graph.compact(g)
+    edits = [
+        lambda g: graph.modify(g, 0, 3, "x"),
+        lambda g: graph.set_target(g, "x bepa depa cepa", incremental=True),
+        lambda g: graph.rearrange(g, 0, 1, 3),
+        lambda g: graph.modify(g, 4, 4, "ny ", Side.source),
+    ]
+    for f in edits:
+        g, c = f(g), f(c)
+        assert c == g
+        assert isinstance(c.source, text_token.TokenSequence)
+        assert isinstance(c.target, text_token.TokenSequence)
+        assert graph.get_side_text(c, Side.target) == graph.get_side_text(g, Side.target)
+
+
+def test_align_with_timeout() -> None:
+    g = graph.unaligned_set_side(
+        graph.init("apa bepa cepa depa"), Side.target, "apa pabe cepa pade"
+    )
+    assert not graph.align(g, timeout=10).approximate
+    assert graph.align(g, timeout=10) == graph.align(g)
+
+    approximate = graph.align(g, timeout=0)
+    assert approximate.approximate
+    # the unique words are still aligned
+    em = graph.edge_index(approximate)
+    assert em["s0"] is em["t0"]
+    assert em["s2"] is em["t5"]
+    # edits keep the flag until the graph is aligned in full again
+    g = graph.unaligned_modify(approximate, 0, 0, "ny ")
+    assert g.approximate
+    assert not graph.align(g).approximate
+
+
+def test_align_after_the_deadline_is_exact_if_the_diff_finishes() -> None:
+    # diff-match-patch resolves these changes without the search that the deadline stops
+    g = graph.unaligned_set_side(
+        graph.init("apa bepa cepa depa"), Side.target, "apa xepa cepa yepa"
+    )
+    aligned = graph.align(g, timeout=0)
+    assert not aligned.approximate
+    assert aligned == graph.align(g)
+
+
+def test_set_target_with_timeout_on_long_text() -> None:
+    g = graph.init(" ".join(f"w{i}" for i in range(2000)))
+    target = " ".join(f"w{i}" for i in reversed(range(2000)))
+    g = graph.set_target(g, target, timeout=0.01)
+    assert g.approximate
+    assert graph.get_side_text(g, Side.target) == target + " "
+
+
+def test_set_target_timeout_bounds_the_edit_diff(monkeypatch: pytest.MonkeyPatch) -> None:
+    # unrelated texts, which diff-match-patch would take minutes for without a timeout
+    monkeypatch.setattr(diffs.dmp, "Diff_Timeout", 600.0)
+    rng = random.Random(0)
+    source, target = (
+        " ".join("".join(rng.choices("abcdefgh", k=rng.randint(1, 8))) for _ in range(2000))
+        for _ in range(2)
+    )
+    g = graph.init(source)
+    start = time.perf_counter()
+    g = graph.set_target(g, target, timeout=0.05)
+    assert g.approximate
+    assert time.perf_counter() - start < 10
+    assert graph.get_side_text(g, Side.target) == target + " "
+
+
+def test_align_with_cache() -> None:
+    cache = graph.AlignmentCache()
+    g = graph.init_with_source_and_target("a bc d e", "a b c d e", cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert graph.set_target(g, "a b c d e", cache=cache) == graph.set_target(g, "a b c d e")
+    assert (cache.hits, cache.misses) == (1, 1)
+    # the same texts with other ids, labels and an incremental window
+    h = graph.unaligned_modify(graph.init("x a bc d e"), 0, 2, "", Side.source)
+    h = graph.unaligned_set_side(h, Side.target, "a b c d e")
+    assert graph.align(h, cache=cache) == graph.align(h)
+    assert graph.modify(g, 2, 3, "x", cache=cache) == graph.modify(g, 2, 3, "x")
+    assert graph.modify(g, 2, 3, "x", incremental=True, cache=cache) == graph.modify(
+        g, 2, 3, "x", incremental=True
+    )
+
+
+def test_align_with_cache_and_manual_edges() -> None:
+    cache = graph.AlignmentCache()
+    g = graph.init_with_source_and_target("a bc d", "a b c d")
+    manual = graph.edge(["s1", "t1"], [], manual=True)
+    edges = {k: e for k, e in g.edges.items() if "s1" not in e.ids and "t1" not in e.ids}
+    edges[manual.id] = manual
+    edges.update(graph.edge_record(graph.edge([i], []) for i in ["t2"]))
+    g = g.copy_with_edges(edges)
+    assert graph.align(g, cache=cache) == graph.align(g)
+    assert graph.align(g, cache=cache) == graph.align(g)
+    assert (cache.hits, cache.misses) == (1, 1)
+    graph.align(graph.init_with_source_and_target("a bc d", "a b c d"), cache=cache)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_approximate_alignments_are_not_cached() -> None:
+    cache = graph.AlignmentCache()
+    g = graph.unaligned_set_side(
+        graph.init("apa bepa cepa depa"), Side.target, "apa pabe cepa pade"
+    )
+    assert graph.align(g, timeout=0, cache=cache).approximate
+    assert len(cache) == 0
+    assert not graph.align(g, cache=cache).approximate
+    assert len(cache) == 1
+
+
+def long_unaligned_graph(n: int) -> graph.Graph:
+    words = [f"w{i % 50}" if i % 7 else "." for i in range(n)]
+    target = [f"{w}x" if i % 11 == 0 else w for i, w in enumerate(words)]
+    target[40:43] = ["new", "w41w42"]
+    return graph.unaligned_set_side(graph.init(" ".join(words)), Side.target, " ".join(target))
+
+
+@pytest.mark.parametrize("chunk_tokens", [1, 10, 100, 10_000])
+def test_align_chunked(chunk_tokens: int) -> None:
+    g = long_unaligned_graph(500)
+    assert graph.align_chunked(g, chunk_tokens=chunk_tokens) == graph.align(g)
+
+
+def test_align_chunked_in_parallel_with_manual_edges() -> None:
+    g = graph.align(long_unaligned_graph(300))
+    em = graph.edge_index(g)
+    s, t = g.source[3].id, g.target[5].id
+    manual = graph.edge([s, t], [], manual=True)
+    edges = {k: e for k, e in g.edges.items() if k not in {em[s].id, em[t].id}}
+    edges[manual.id] = manual
+    edges.update(
+        graph.edge_record(graph.edge([i], []) for i in {*em[s].ids, *em[t].ids} - {s, t})
+    )
+    g = g.copy_with_edges(edges)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        chunked = graph.align_chunked(g, chunk_tokens=20, executor=executor)
+    assert chunked == graph.align(g)
+    assert graph.edge_index(chunked)[s].manual
+
+
+def test_align_chunked_with_timeout() -> None:
+    g = long_unaligned_graph(300)
+    assert graph.align_chunked(g, timeout=0).approximate
+    with pytest.raises(ValueError, match="chunk_tokens"):
+        graph.align_chunked(g, chunk_tokens=0)
+
+
+@pytest.mark.parametrize(
+    ("source", "target"),
+    [
+        ("a bc d", "a b c d"),
+        ("Jonathan saknades .", "Jonat han saknades ."),
+        ("a b c", "x y z"),
+        ("", "a"),
+        ("a b a b", "b a b a"),
+        ("there are many people here", "there are much many people here"),
+        ("he said many things", "he said things"),
+    ],
+)
+def test_align_with_token_diff(source: str, target: str) -> None:
+    g = graph.unaligned_set_side(graph.init(source), Side.target, target)
+    assert graph.align(g, token_diff=True) == graph.align(g)
+
+
+def test_token_diff_with_timeout(monkeypatch: pytest.MonkeyPatch) -> None:
+    g = long_unaligned_graph(300)
+    deadlines = []
+    int_diff = diffs.int_diff
+
+    def recording_int_diff(
+        xs: Sequence[Hashable], ys: Sequence[Hashable], *, deadline: Optional[float] = None
+    ) -> list[diffs.Opcode]:
+        deadlines.append(deadline)
+        return int_diff(xs, ys, deadline=deadline)
+
+    monkeypatch.setattr(diffs, "int_diff", recording_int_diff)
+    assert graph.align(g, timeout=0, token_diff=True).approximate
+    assert deadlines
+    assert None not in deadlines
+
+
+def test_token_diff_only_diffs_changed_tokens() -> None:
+    g = long_unaligned_graph(500)
+    assert graph.align(g, token_diff=True) == graph.align(g)
+    g = graph.unaligned_modify(
+        graph.init(" ".join(f"w{i}" for i in range(1000))), 0, 6, "v0 w 1"
+    )
+    with profiling.profile() as stats:
+        aligned = graph.align(g, token_diff=True)
+    assert aligned == graph.align(g)
+    assert sum(s.counts["characters"] for s in stats if s.name == "align.chars") < 50
+    assert graph.align_chunked(g, chunk_tokens=10, token_diff=True) == aligned
+
+
+def test_align_merges_labels_and_comments_like_merge_edges() -> None:
+    g = graph.unaligned_set_side(graph.init("a b c d"), Side.target, "abcd")
+    edges = {}
+    for i, e in enumerate(g.edges.values()):
+        labeled = graph.edge(e.ids, [f"L{i % 2}", "X"], comment=f"c{i}" if i % 2 else None)
+        edges[labeled.id] = labeled
+    g = g.copy_with_edges(edges)
+    aligned = graph.align(g)
+    assert len(aligned.edges) == 1
+    em = graph.edge_map(g)
+    tokens = [*g.source, *g.target]
+    first = {em[t.id].id: t.id for t in reversed(tokens)}
+    expected = graph.zero_edge
+    for t in tokens:
+        e = em[t.id]
+        labels = e.labels if first[e.id] == t.id else []
+        expected = graph.merge_edges(expected, graph.edge([t.id], labels, comment=e.comment))
+    assert next(iter(aligned.edges.values())) == expected
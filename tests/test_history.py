@@ -0,0 +1,128 @@
+import dataclasses
+import random
+
+import pytest
+
+from parallel_corpus import graph
+from parallel_corpus.history import Delta, History
+from parallel_corpus.source_target import Side
+from parallel_corpus.text_token import Token
+
+
+def edited_versions(n: int) -> list[graph.Graph]:
+    g = graph.init_with_source_and_target("a b c d e", "a b c d")
+    versions = [g]
+    for i in range(n):
+        if i % 3 == 0:
+            g = graph.modify(g, 0, 0, f"w{i} ")
+        elif i % 3 == 1:
+            g = graph.modify(g, 0, 2, "", Side.source)
+        else:
+            g = graph.rearrange(g, 0, 0, len(g.target) - 1)
+        versions.append(g)
+    return versions
+
+
+def test_undo_redo() -> None:
+    versions = edited_versions(10)
+    h = History(versions[0], checkpoint_every=4)
+    for g in versions[1:]:
+        graph.edge_index(g)
+        h.push(g)
+    for g in reversed(versions[:-1]):
+        assert h.undo() == g
+    assert not h.can_undo
+    with pytest.raises(ValueError, match="Nothing to undo"):
+        h.undo()
+    for g in versions[1:]:
+        assert h.redo() == g
+    assert not h.can_redo
+    for _ in versions[1:]:
+        g = h.undo()
+        assert g.token_edges == graph.edge_map(g)
+
+
+@pytest.mark.parametrize("version", [0, 3, 7, 10])
+def test_goto(version: int) -> None:
+    versions = edited_versions(10)
+    h = History(versions[0], checkpoint_every=3)
+    for g in versions[1:]:
+        h.push(g)
+    assert h.goto(version) == versions[version]
+    assert h.version == version
+    assert h.goto(10) == versions[10]
+
+
+def test_push_forgets_redo() -> None:
+    versions = edited_versions(3)
+    h = History(versions[0], checkpoint_every=1)
+    for g in versions[1:]:
+        h.push(g)
+    h.undo()
+    h.undo()
+    g = h.push(graph.modify(h.graph, 0, 0, "new "))
+    assert not h.can_redo
+    assert h.versions == range(3)
+    assert h.undo() == versions[1]
+    assert h.redo() == g
+
+
+def test_max_undo() -> None:
+    versions = edited_versions(10)
+    h = History(versions[0], max_undo=4, checkpoint_every=2)
+    for g in versions[1:]:
+        h.push(g)
+    assert h.versions == range(6, 11)
+    for _ in range(4):
+        h.undo()
+    assert h.graph == versions[6]
+    assert not h.can_undo
+    with pytest.raises(ValueError, match="not in"):
+        h.goto(5)
+
+
+def test_delta_is_small() -> None:
+    g = graph.init(" ".join(f"w{i}" for i in range(1000)))
+    d = Delta.between(g, graph.modify(g, 0, 2, "x"))
+    assert d.source == ()
+    assert [(len(s.removed), len(s.inserted)) for s in d.target] == [(1, 1)]
+    assert len(d.edges_removed) == 1
+    assert len(d.edges_added) == 2
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_delta_from_edits_is_the_same_as_comparing(incremental: bool) -> None:
+    rng = random.Random(0)
+    g = graph.init_with_source_and_target("a b c d e f g", "a b c d e f g")
+    for i in range(30):
+        text = graph.get_side_text(g, Side.target)
+        start = rng.randrange(len(text) + 1)
+        end = min(len(text), start + rng.randrange(4))
+        with graph.edit(g, incremental=incremental) as e:
+            e.modify(start, end, rng.choice(["", "x", "y ", " z"]))
+            if i % 2:
+                e.set_source(graph.get_side_text(g, Side.source) + f"w{i} ")
+        after = e.graph
+        assert graph.edit_steps(after, g) is not None
+        d = Delta.between(g, after)
+        compared = Delta.between(g, dataclasses.replace(after))
+        assert (d.edges_removed, d.edges_added) == (compared.edges_removed, compared.edges_added)
+        assert d.apply(g) == after
+        assert d.inverse().apply(after) == g
+        g = after
+
+
+def test_edge_keys_other_than_ids() -> None:
+    g = graph.Graph(
+        source=[Token("a ", "s0")],
+        target=[Token("a ", "t0"), Token("b ", "t1")],
+        edges={
+            "first": graph.edge(["s0", "t0"], []),
+            "second": graph.edge(["t1"], []),
+        },
+    )
+    edited = dataclasses.replace(g, edges={"first": g.edges["first"]}, target=g.target[:1])
+    h = History(g)
+    h.push(edited)
+    assert h.undo() == g
+    assert h.redo() == edited
@@ -0,0 +1,56 @@
+import dataclasses
+import gzip
+from pathlib import Path
+
+import pytest
+
+from parallel_corpus import graph, io
+
+
+def make_graphs() -> list[graph.Graph]:
+    g = graph.init_with_source_and_target("Jonat han saknades .", "Jonathan saknades .")
+    g = graph.unaligned_rearrange(g, 0, 0, 1)
+    e = next(iter(g.edges.values()))
+    edges = dict(g.edges)
+    edges[e.id] = dataclasses.replace(e, labels=["OBS", "ORT"], comment="a comment")
+    return [
+        dataclasses.replace(g, edges=edges, comment="graph comment"),
+        graph.init("apa bepa"),
+        graph.init(""),
+        graph.set_target(graph.init("a bc c de"), "a cb c ed", timeout=0),
+    ]
+
+
+@pytest.mark.parametrize("name", ["corpus.jsonl", "corpus.jsonl.gz"])
+def test_write_and_iter_graphs_round_trip(tmp_path: Path, name: str) -> None:
+    graphs = make_graphs()
+    path = tmp_path / name
+
+    assert io.write_graphs(path, iter(graphs)) == len(graphs)
+    assert list(io.iter_graphs(path)) == graphs
+    assert [g.next_free_id for g in io.iter_graphs(path)] == [g.next_free_id for g in graphs]
+    assert [g.approximate for g in io.iter_graphs(path)] == [False, False, False, True]
+    assert any(e.manual for e in graphs[0].edges.values())
+
+
+def test_gzip_is_detected_from_suffix(tmp_path: Path) -> None:
+    path = tmp_path / "corpus.jsonl.gz"
+    io.write_graphs(path, make_graphs())
+
+    with gzip.open(path, "rt", encoding="utf-8") as fp:
+        assert io.loads(fp.readline()) == make_graphs()[0]
+
+
+def test_dumps_is_one_line() -> None:
+    g = graph.init("rad ett\nrad två")
+    line = io.dumps(g)
+
+    assert "\n" not in line
+    assert io.loads(line) == g
+
+
+def test_iter_graphs_skips_blank_lines(tmp_path: Path) -> None:
+    path = tmp_path / "corpus.jsonl"
+    path.write_text("\n" + io.dumps(graph.init("a")) + "\n\n", encoding="utf-8")
+
+    assert list(io.iter_graphs(path)) == [graph.init("a")]
@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import pytest
+
+from parallel_corpus import graph, io
+from parallel_corpus.graph import Edge, Graph
+from parallel_corpus.text_token import Token
+from tests.test_io import make_graphs
+
+
+def test_write_binary_round_trip(tmp_path: Path) -> None:
+    graphs = make_graphs()
+    path = tmp_path / "corpus.bin"
+
+    assert io.write_binary(path, iter(graphs)) == len(graphs)
+    with io.BinaryCorpus(path) as corpus:
+        assert len(corpus) == len(graphs)
+        assert list(corpus) == graphs
+        assert [g.next_free_id for g in corpus] == [g.next_free_id for g in graphs]
+        assert [g.approximate for g in corpus] == [False, False, False, True]
+        assert corpus[-1] == graphs[-1]
+        assert corpus[1:] == graphs[1:]
+        assert corpus.keys() == []
+
+
+def test_binary_corpus_get_by_key(tmp_path: Path) -> None:
+    graphs = [graph.init_with_source_and_target(f"käll {i}", f"mål {i}") for i in range(50)]
+    path = tmp_path / "corpus.bin"
+    io.write_binary(path, graphs, keys=(f"doc-{i}" for i in range(50)))
+
+    with io.BinaryCorpus(path) as corpus:
+        assert corpus.get("doc-42") == graphs[42]
+        assert corpus.index_of("doc-7") == 7
+        with pytest.raises(KeyError):
+            corpus.get("missing")
+        with pytest.raises(IndexError):
+            corpus[50]
+
+
+def test_binary_keeps_unusual_edges(tmp_path: Path) -> None:
+    g = Graph(
+        source=[Token("å ", "s0")],
+        target=[Token("ä\n", "t0")],
+        edges={
+            "s0": Edge(id="e-s0", ids=["s0", "x9"], labels=["L"], manual=True),
+            "e-t0": Edge(id="e-t0", ids=["t0"], labels=[], manual=False, comment="c"),
+        },
+    )
+    path = tmp_path / "corpus.bin"
+    io.write_binary(path, [g])
+
+    with io.BinaryCorpus(path) as corpus:
+        assert corpus[0] == g
+        assert corpus[0].next_free_id is None
+
+
+def test_binary_rejects_other_files(tmp_path: Path) -> None:
+    path = tmp_path / "corpus.jsonl"
+    io.write_graphs(path, make_graphs())
+
+    with pytest.raises(ValueError, match="not a binary corpus"):
+        io.BinaryCorpus(path)
+
+
+def test_write_binary_checks_number_of_keys(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="keys"):
+        io.write_binary(tmp_path / "corpus.bin", make_graphs(), keys=["a"])
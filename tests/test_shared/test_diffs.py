@@ -1,3 +1,8 @@
+import time
+
+import pytest
+
+from parallel_corpus.shared import diffs
 from parallel_corpus.shared.diffs import Change, hdiff
 
 
@@ -15,3 +20,65 @@ def test_hdiff() -> None:
     ]
 
     assert hdiff(abcca, BACC, str.lower, str.lower) == expected  # type: ignore [has-type]
+
+
+def test_int_diff_gives_run_length_opcodes() -> None:
+    xs = list(range(10))
+    ys = [*xs[:3], 100, 101, *xs[5:]]
+
+    assert diffs.int_diff(xs, ys) == [
+        diffs.Opcode(diffs.ChangeType.CONSTANT, 0, 3, 0, 3),
+        diffs.Opcode(diffs.ChangeType.DELETED, 3, 5, 3, 3),
+        diffs.Opcode(diffs.ChangeType.INSERTED, 5, 5, 3, 5),
+        diffs.Opcode(diffs.ChangeType.CONSTANT, 5, 10, 5, 10),
+    ]
+
+
+def test_int_diff_handles_many_unique_elements() -> None:
+    xs = list(range(200_000))
+    ys = [*xs[:100_000], -1, *xs[100_000:]]
+
+    assert diffs.int_diff(xs, ys) == [
+        diffs.Opcode(diffs.ChangeType.CONSTANT, 0, 100_000, 0, 100_000),
+        diffs.Opcode(diffs.ChangeType.INSERTED, 100_000, 100_000, 100_000, 100_001),
+        diffs.Opcode(diffs.ChangeType.CONSTANT, 100_000, 200_000, 100_001, 200_001),
+    ]
+
+
+def test_int_diff_stops_at_the_deadline() -> None:
+    xs = [1, 2, 3, 1, 2]
+    ys = [2, 1, 3, 2, 1]
+
+    assert len(diffs.int_diff(xs, ys)) > 2
+    assert diffs.int_diff(xs, ys, deadline=time.time() - 1) == [
+        diffs.Opcode(diffs.ChangeType.DELETED, 0, 5, 0, 0),
+        diffs.Opcode(diffs.ChangeType.INSERTED, 5, 5, 0, 5),
+    ]
+
+
+def test_timed_char_diff_reports_only_diffs_that_are_cut_short() -> None:
+    s1, s2 = "apa bepa cepa depa", "apa pabe cepa pade"
+    ops, cut_off = diffs.timed_char_diff(s1, s2)
+    assert not cut_off
+    assert ops == diffs.char_diff(s1, s2)
+    # the deadline has passed, but these changes do not need the search it stops
+    assert diffs.timed_char_diff(s1, "apa xepa cepa yepa", deadline=0) == (
+        diffs.char_diff(s1, "apa xepa cepa yepa"),
+        False,
+    )
+    ops, cut_off = diffs.timed_char_diff(s1, s2, deadline=0)
+    assert cut_off
+    assert ops != diffs.char_diff(s1, s2)
+
+
+def test_int_diff_falls_back_to_difflib(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(diffs, "MAX_SYMBOLS", 3)
+    xs = [1, 2, 3, 4]
+    ys = [1, 5, 3, 4]
+
+    assert diffs.int_diff(xs, ys) == [
+        diffs.Opcode(diffs.ChangeType.CONSTANT, 0, 1, 0, 1),
+        diffs.Opcode(diffs.ChangeType.DELETED, 1, 2, 1, 1),
+        diffs.Opcode(diffs.ChangeType.INSERTED, 2, 2, 1, 2),
+        diffs.Opcode(diffs.ChangeType.CONSTANT, 2, 4, 2, 4),
+    ]
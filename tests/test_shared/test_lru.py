@@ -0,0 +1,23 @@
+import pytest
+
+from parallel_corpus.shared.lru import LRUCache
+
+
+def test_evicts_least_recently_used() -> None:
+    cache: LRUCache[int, str] = LRUCache(maxsize=3)
+    for i in range(3):
+        cache.put(i, str(i))
+    assert cache.get(0) == "0"
+    cache.put(3, "3")
+    assert len(cache) == 3
+    assert cache.get(1) is None
+    assert [cache.get(i) for i in (0, 2, 3)] == ["0", "2", "3"]
+    assert (cache.hits, cache.misses) == (4, 1)
+    cache.clear()
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_rejects_bad_maxsize() -> None:
+    with pytest.raises(ValueError, match="maxsize"):
+        LRUCache(maxsize=0)
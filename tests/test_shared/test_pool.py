@@ -0,0 +1,26 @@
+import concurrent.futures
+
+import pytest
+
+from parallel_corpus.shared.pool import ordered_map
+
+
+def test_ordered_map_serial() -> None:
+    assert list(ordered_map(str, range(5), max_workers=1)) == ["0", "1", "2", "3", "4"]
+
+
+def test_ordered_map_keeps_order_with_executor() -> None:
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+        result = list(ordered_map(str, range(100), chunksize=7, executor=executor))
+    assert result == [str(i) for i in range(100)]
+
+
+def test_ordered_map_with_processes() -> None:
+    assert list(ordered_map(abs, range(-10, 0), max_workers=2, chunksize=3)) == list(
+        range(10, 0, -1)
+    )
+
+
+def test_ordered_map_rejects_bad_chunksize() -> None:
+    with pytest.raises(ValueError, match="chunksize"):
+        list(ordered_map(str, range(5), chunksize=0))
@@ -0,0 +1,60 @@
+from parallel_corpus import graph
+from parallel_corpus.shared import profiling
+
+
+def test_profile_set_target() -> None:
+    g = graph.init("a bc d")
+    with profiling.profile() as stats:
+        graph.set_target(g, "a b c d")
+    assert [s.name for s in stats] == [
+        "edit_range",
+        "unaligned_modify_tokens",
+        "align.chars",
+        "align.diff",
+        "align.pairs",
+        "align.union",
+        "align.edges",
+    ]
+    by_name = {s.name: s for s in stats}
+    assert by_name["unaligned_modify_tokens"].counts == {
+        "tokens_removed": 2,
+        "tokens_inserted": 3,
+        "edges_removed": 2,
+    }
+    assert by_name["align.chars"].counts == {"characters": 15}
+    assert by_name["align.pairs"].counts == {"pairs": 4}
+    assert by_name["align.union"].counts == {"unions": 4}
+    assert by_name["align.edges"].counts == {"edges": 3}
+    assert all(s.seconds >= 0 for s in stats)
+
+
+def test_hooks() -> None:
+    names: list[str] = []
+
+    def hook(stats: profiling.StageStats) -> None:
+        names.append(stats.name)
+
+    profiling.add_hook(hook)
+    try:
+        graph.init("a")
+    finally:
+        profiling.remove_hook(hook)
+    graph.init("a")
+    assert names == ["align.chars", "align.diff", "align.pairs", "align.union", "align.edges"]
+
+
+def test_disabled_stage_does_nothing() -> None:
+    with profiling.stage("anything") as stage:
+        stage.count("things", 1)
+    assert not isinstance(stage, profiling.Stage)
+
+
+def test_profile_align_chunked_times_the_unions() -> None:
+    g = graph.unaligned_set_side(
+        graph.init("a bc d e fg h"), graph.Side.target, "a b c d e f g h"
+    )
+    with profiling.profile() as stats:
+        graph.align_chunked(g, chunk_tokens=4)
+    unions = [s for s in stats if s.name == "align.union"]
+    assert len(unions) == 1
+    assert unions[0].counts == {"unions": 8}
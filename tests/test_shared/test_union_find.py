@@ -13,6 +13,28 @@ def test_union_find() -> None:
     assert uf.find(20) == uf.find(50)
 
 
+def test_union_find_long_chain() -> None:
+    n = 100_000
+    uf = UnionFind()
+    uf.unions_from_pairs(range(1, n), range(n - 1))
+    assert len(uf) == n
+    assert uf.find(0) == uf.find(n - 1)
+    assert set(uf.components()) == {0}
+
+
+def test_union_find_components() -> None:
+    uf = UnionFind(size=6)
+    uf.unions_from_pairs([4, 1], [2, 5])
+    assert list(uf.components()) == [0, 1, 2, 3, 2, 1]
+
+
+def test_union_find_from_rev() -> None:
+    uf = UnionFind(rev=[0, 0, None, 2])
+    assert uf.find(1) == uf.find(0)
+    assert uf.find(3) == uf.find(2)
+    assert uf.find(0) != uf.find(2)
+
+
 def test_renumber_default() -> None:
     un, num = renumber()  # type: ignore [var-annotated]
     assert num("foo") == 0
@@ -23,6 +45,14 @@ def test_renumber_default() -> None:
     assert un(2) is None
 
 
+def test_renumber_unhashable() -> None:
+    un, num = renumber()  # type: ignore [var-annotated]
+    assert num(["foo"]) == 0
+    assert num(["bar"]) == 1
+    assert num(["foo"]) == 0
+    assert un(1) == ["bar"]
+
+
 def test_renumber_lowercase() -> None:
     un, num = renumber(str.lower)  # type: ignore [var-annotated]
 
@@ -40,3 +70,8 @@ def test_poly_union_find() -> None:
     assert uf.find("a") != uf.find("b")
     assert uf.union("A", "B")
     assert uf.find("a") == uf.find("b")
+
+
+def test_renumber_keeps_equal_values_of_other_types_apart() -> None:
+    _un, num = renumber()  # type: ignore [var-annotated]
+    assert [num(1), num(True), num(1.0), num(True)] == [0, 1, 2, 1]
@@ -1,6 +1,17 @@
+import array
+import sys
+
 import pytest
 
-from parallel_corpus.text_token import Token, identify, tokenize
+from parallel_corpus.text_token import (
+    Span,
+    Token,
+    TokenSequence,
+    identify,
+    token_at,
+    token_spans,
+    tokenize,
+)
 
 
 def test_can_create_token() -> None:
@@ -28,8 +39,90 @@ def test_tokenize(text: str, expected: list[str], snapshot) -> None:
     assert actual == snapshot
 
 
+@pytest.mark.parametrize(
+    "text", ["", " ", "apa", "  apa bepa\tcepa", "apa\n\nbepa  ", " \n ", "a  b c"]
+)
+def test_token_spans(text: str) -> None:
+    spans = token_spans(text)
+    assert [text[s.begin : s.end] for s in spans][:-1] == tokenize(text)[:-1]
+    if spans:
+        assert spans[0].begin == 0
+        assert spans[-1].end == len(text)
+        assert all(a.end == b.begin for a, b in zip(spans, spans[1:]))
+
+
+def test_token_spans_of_whitespace() -> None:
+    assert token_spans("  ") == [Span(0, 2)]
+
+
+@pytest.mark.parametrize(
+    ("character_offset", "expected"),
+    [(0, (0, 0)), (2, (0, 2)), (3, (1, 0)), (6, (1, 3)), (7, (2, 0)), (9, (2, 2)), (10, (3, 0))],
+)
+def test_token_at(character_offset: int, expected: tuple[int, int]) -> None:
+    at = token_at(["012", "3456", "789"], character_offset)
+    assert (at["token"], at["offset"]) == expected
+
+
+@pytest.mark.parametrize("character_offset", [-1, 11])
+def test_token_at_out_of_bounds(character_offset: int) -> None:
+    with pytest.raises(IndexError, match="Out of bounds"):
+        token_at(["012", "3456", "789"], character_offset)
+
+
 def test_identify() -> None:
     assert identify(["apa", "bepa"], "#") == [
         Token(text="apa", id="#0"),
         Token(text="bepa", id="#1"),
     ]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 10), reason="dataclass slots need python 3.10")
+def test_token_has_no_dict() -> None:
+    token = Token(text="a text", id="s0")
+
+    assert not hasattr(token, "__dict__")
+
+
+def test_identify_interns_ids() -> None:
+    a = identify(["apa"], "s")
+    b = identify(["bepa"], "s")
+
+    assert a[0].id is b[0].id
+
+
+def test_token_sequence() -> None:
+    tokens = identify(tokenize("  apa bepa cepa"), "t")
+    ts = TokenSequence.from_tokens(tokens)
+    assert ts == tokens
+    assert tokens == ts
+    assert list(ts) == tokens
+    assert ts.text == "  apa bepa cepa "
+    assert list(ts.offsets) == [0, 6, 11, 16]
+    assert ts[-1] == tokens[-1]
+    assert ts[1:] == tokens[1:]
+    assert ts[::2] == tokens[::2]
+    assert ts[2:1] == []
+    assert TokenSequence.from_text("  apa bepa cepa", "t") == ts
+
+
+def test_token_sequence_splice() -> None:
+    ts = TokenSequence.from_text("apa bepa cepa", "t")
+    new, removed = ts.splice(1, 1, [Token("x ", "t3"), Token("y ", "t4")])
+    assert isinstance(new, TokenSequence)
+    assert new.text == "apa x y cepa "
+    assert new.ids == ("t0", "t3", "t4", "t2")
+    assert removed == [Token("bepa ", "t1")]
+    assert ts.text == "apa bepa cepa "
+
+
+def test_token_sequence_checks_lengths() -> None:
+    with pytest.raises(ValueError, match="add up to"):
+        TokenSequence("abc", array.array("l", [1, 1]), ["a", "b"])
+
+
+@pytest.mark.parametrize("i", [3, -4])
+def test_token_sequence_index_out_of_range(i: int) -> None:
+    ts = TokenSequence.from_text("apa bepa cepa", "s")
+    with pytest.raises(IndexError):
+        ts[i]